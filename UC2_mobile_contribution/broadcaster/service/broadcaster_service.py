@@ -5,10 +5,12 @@ import re
 from requests.exceptions import HTTPError
 import uuid
 import sys
+import time
 from gevent.wsgi import WSGIServer
 
 
 import thread
+import threading
 from kafka import KafkaConsumer, KafkaProducer
 from kafka.errors import KafkaError
 
@@ -33,6 +35,12 @@ KAFKA_SERVER = "{}:{}".format(os.environ.get("KAFKA_HOST", "192.158.1.175"),
 KAFKA_TOPIC = 'cno'
 KAFKA_CLIENT_ID = 'edge-selector'
 KAFKA_API_VERSION = (0, 10, 1)
+# producer batching delay, compression (empty for none), max time a send may
+# block on metadata, and period of the producer health check (in seconds)
+KAFKA_LINGER_MS = int(os.getenv('KAFKA_LINGER_MS', "5"))
+KAFKA_COMPRESSION = os.getenv('KAFKA_COMPRESSION', 'gzip') or None
+KAFKA_MAX_BLOCK_MS = int(os.getenv('KAFKA_MAX_BLOCK_MS', "5000"))
+KAFKA_HEALTH_INTERVAL = int(os.getenv('KAFKA_HEALTH_INTERVAL', "30"))
 
 SENDER_RECEIVER_EDGE = 'edge-selector'
 SENDER_RECEIVER_SSCNO = 'SS-CNO-UC2-MC'
@@ -53,6 +61,13 @@ GpsCoords = collections.namedtuple("GpsCoords",
 # Read by rest endpoint
 session_uuid_sscno = {}
 
+# Producer shared by edge-selection requests towards ss-cno
+# Replaced by the health check thread once a send failed
+producer = None
+producer_lock = threading.Lock()
+# failed producers, closed by the health check thread
+retired_producers = []
+
 
 def _is_near(g_input, g_pop):
     return abs(g_input.latitude - g_pop.latitude) < 1 and \
@@ -87,6 +102,72 @@ def getMessagePayload():
     return value;
 
 
+def _get_producer():
+    """
+    Return the shared producer, creating it if there is none
+    """
+    global producer
+    with producer_lock:
+        if producer is None:
+            print ('[kafka] Instantiating producer..')
+            p = KafkaProducer(
+                bootstrap_servers=KAFKA_SERVER,
+                api_version=KAFKA_API_VERSION,
+                linger_ms=KAFKA_LINGER_MS,
+                compression_type=KAFKA_COMPRESSION,
+                max_block_ms=KAFKA_MAX_BLOCK_MS,
+                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                key_serializer=lambda v: json.dumps(v).encode('utf-8'))
+            # fetch topic metadata now rather than on first send
+            try:
+                p.partitions_for(KAFKA_TOPIC)
+            except KafkaError:
+                p.close(timeout=0)
+                raise
+            producer = p
+            print ('[kafka] Instantiating producer. Done')
+        return producer
+
+
+def _on_send_success(session_uuid, metadata):
+    print ('[kafka] Message sent! session_uuid [%s] partition [%s] offset [%s]'
+           % (session_uuid, metadata.partition, metadata.offset))
+
+
+def _on_send_error(p, e):
+    """
+    Retire the given producer if it is still the shared one. Called from the
+    producer thread, hence it is closed later by the health check thread
+    """
+    print ('[kafka] [error] Failed to send message: %s' % str(e))
+    global producer
+    with producer_lock:
+        if producer is p:
+            producer = None
+            retired_producers.append(p)
+
+
+def _check_producer():
+    """
+    Separate health check thread: creates the shared producer at start-up and
+    replaces it after failures.
+    """
+    while True:
+        with producer_lock:
+            retired = list(retired_producers)
+            del retired_producers[:]
+        for p in retired:
+            try:
+                p.close(timeout=1)
+            except Exception as e:
+                print ('[kafka] Failed to close producer: %s' % str(e))
+        try:
+            _get_producer()
+        except Exception as e:
+            print ('[kafka] [error] Unable to create producer: %s' % str(e))
+        time.sleep(KAFKA_HEALTH_INTERVAL)
+
+
 def _get_pop_list_broadcaster(br_id):
     """
     Utility method to return list of pops related to the given
@@ -259,13 +340,7 @@ def broadcaster_edge_selection(br_id):
             '''
             Send to SS-CNO - begin
             '''
-            print ('[kafka] Instantiating producer..')
-            producer = KafkaProducer(
-                bootstrap_servers=KAFKA_SERVER,
-                api_version=KAFKA_API_VERSION,
-                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-                key_serializer=lambda v: json.dumps(v).encode('utf-8'))
-            print ('[kafka] Instantiating producer. Done')
+            kafka_producer = _get_producer()
             p = {
                 'sender': SENDER_RECEIVER_EDGE,
                 'receiver': SENDER_RECEIVER_SSCNO,
@@ -277,14 +352,13 @@ def broadcaster_edge_selection(br_id):
                 }
             }
             print ('[kafka] About to send message on Kafka..')
-            t = producer.send(KAFKA_TOPIC, value=p)
-            print ('[kafka] Message sent!')
             try:
-                t.get(timeout=5)
+                t = kafka_producer.send(KAFKA_TOPIC, value=p)
             except KafkaError as e:
-                logger.error(e)
-                pass
-            producer.close()
+                _on_send_error(kafka_producer, e)
+                raise
+            t.add_callback(lambda m: _on_send_success(session_uuid, m))
+            t.add_errback(lambda e: _on_send_error(kafka_producer, e))
             '''
             Send to SS-CNO - end
             '''
@@ -596,6 +670,7 @@ if __name__=="__main__":
     if SS_CNO:
         print ('** Start _consume_cno thread..')
         thread.start_new_thread(_consume_cno, ())
+        thread.start_new_thread(_check_producer, ())
     print ('starting tiny micro-service. '
            '\nlistening on port %s...' % conf_port)
     server = WSGIServer(('', int(conf_port)), proxy, log=None, keyfile='/server.key', certfile='/server.crt')
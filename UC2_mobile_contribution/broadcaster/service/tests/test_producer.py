@@ -0,0 +1,92 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import broadcaster_service as service
+
+
+class Producer(object):
+    created = []
+    # errors raised by partitions_for of the next producers
+    failures = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.closed = False
+        Producer.created.append(self)
+
+    def partitions_for(self, topic):
+        if Producer.failures:
+            raise Producer.failures.pop(0)
+        return set([0])
+
+    def close(self, timeout=None):
+        self.closed = True
+
+
+class Stop(Exception):
+    pass
+
+
+class Time(object):
+    @staticmethod
+    def sleep(seconds):
+        raise Stop()
+
+
+class ProducerTest(unittest.TestCase):
+
+    def setUp(self):
+        saved = dict((name, getattr(service, name)) for name in
+                     ('KafkaProducer', 'producer', 'time'))
+
+        def restore():
+            for name, value in saved.items():
+                setattr(service, name, value)
+            del service.retired_producers[:]
+        self.addCleanup(restore)
+        service.KafkaProducer = Producer
+        service.producer = None
+        Producer.created = []
+        Producer.failures = []
+
+    def test_shared(self):
+        p = service._get_producer()
+        self.assertIs(service._get_producer(), p)
+        self.assertEqual(len(Producer.created), 1)
+        self.assertEqual(p.kwargs['linger_ms'], service.KAFKA_LINGER_MS)
+
+    def test_metadata_failure(self):
+        Producer.failures = [service.KafkaError('no broker')]
+        self.assertRaises(service.KafkaError, service._get_producer)
+        self.assertTrue(Producer.created[0].closed)
+        self.assertIsNone(service.producer)
+        self.assertIs(service._get_producer(), Producer.created[1])
+
+    def test_recreated_after_send_error(self):
+        p = service._get_producer()
+        service._on_send_error(p, service.KafkaError('timeout'))
+        self.assertIsNone(service.producer)
+        self.assertEqual(service.retired_producers, [p])
+        # closed by the health check, which creates the next one
+        service.time = Time
+        self.assertRaises(Stop, service._check_producer)
+        self.assertTrue(p.closed)
+        self.assertEqual(service.retired_producers, [])
+        self.assertIsNot(service.producer, p)
+        self.assertIsNotNone(service.producer)
+
+    def test_late_error_of_retired_producer(self):
+        p = service._get_producer()
+        service._on_send_error(p, service.KafkaError('timeout'))
+        q = service._get_producer()
+        service._on_send_error(p, service.KafkaError('timeout'))
+        self.assertIs(service.producer, q)
+        self.assertEqual(service.retired_producers, [p])
+
+
+if __name__ == '__main__':
+    unittest.main()
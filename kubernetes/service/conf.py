@@ -1,5 +1,8 @@
 import os
+import shutil
 import sys
+import tempfile
+import threading
 
 from gevent.wsgi import WSGIServer
 
@@ -9,6 +12,98 @@ import flask
 proxy = flask.Flask(__name__)
 proxy.debug = False
 
+CONF_DIR = '/conf'
+# prefix of the parameter generation directories (and temporary links) of
+# applyParams
+TMP_PREFIX = '.conf-'
+# link of CONF_DIR to the current parameter generation directory
+CURRENT_LINK = '.current'
+# serializes the parameter updates
+conf_lock = threading.Lock()
+
+
+def applyParams(params):
+    """
+    Write the given parameters, one file per parameter under CONF_DIR.
+
+    Parameters live in a generation directory of CONF_DIR, CURRENT_LINK
+    links to the current one and every CONF_DIR/<name> links to
+    CURRENT_LINK/<name>. An update writes a whole new generation (the
+    unchanged parameters are carried over) and switches CURRENT_LINK to it
+    with a single rename, so the update is atomic: readers see either all
+    the parameters updated or none, and a failed write applies nothing.
+    A reader needing a consistent set across several reads resolves
+    CURRENT_LINK once (e.g. os.path.realpath) and reads from there; the
+    previous generation is kept for such readers.
+
+    :param params: parameter name to value
+    :type params: ``dict``
+    """
+    with conf_lock:
+        current = os.path.join(CONF_DIR, CURRENT_LINK)
+        previous = None
+        if os.path.islink(current):
+            previous = os.path.realpath(current)
+        gendir = tempfile.mkdtemp(prefix=TMP_PREFIX, dir=CONF_DIR)
+        try:
+            if previous and os.path.isdir(previous):
+                for name in os.listdir(previous):
+                    if name not in params:
+                        # files of a generation are never modified
+                        os.link(os.path.join(previous, name),
+                                os.path.join(gendir, name))
+            for name, value in params.items():
+                with open(os.path.join(gendir, name), 'w') as f:
+                    f.write(str(value))
+            # links of new parameters dangle until the switch
+            for name in params:
+                if not os.path.lexists(os.path.join(CONF_DIR, name)):
+                    _link(os.path.join(CURRENT_LINK, name), name)
+            sys.stdout.write('switch %s to %s\n' % (current, gendir))
+            _link(os.path.basename(gendir), CURRENT_LINK)
+        except Exception:
+            shutil.rmtree(gendir, ignore_errors=True)
+            raise
+        # parameter files written by older sidecars
+        for name in params:
+            if not os.path.islink(os.path.join(CONF_DIR, name)):
+                _link(os.path.join(CURRENT_LINK, name), name)
+        # older generations and leftovers of failed updates
+        keep = (os.path.basename(gendir), os.path.basename(previous or ''))
+        for name in os.listdir(CONF_DIR):
+            path = os.path.join(CONF_DIR, name)
+            if not name.startswith(TMP_PREFIX) or name in keep:
+                continue
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _link(target, name):
+    """
+    Atomically make CONF_DIR/<name> a symbolic link to target
+    """
+    tmp = tempfile.mktemp(prefix=TMP_PREFIX, dir=CONF_DIR)
+    os.symlink(target, tmp)
+    try:
+        os.rename(tmp, os.path.join(CONF_DIR, name))
+    except Exception:
+        os.remove(tmp)
+        raise
+
+
+def validName(name):
+    """
+    Whether name is a plain file name of CONF_DIR (dot files included, e.g.
+    those pushed to warm pods)
+    """
+    return bool(name) and name not in ('.', '..', CURRENT_LINK) and \
+        '/' not in name and '\0' not in name and not name.startswith(TMP_PREFIX)
+
 
 @proxy.route('/conf/<param_name>', methods=['POST'])
 def conf(param_name):
@@ -18,6 +113,10 @@ def conf(param_name):
         return response
 
     sys.stdout.write('Enter: /conf '+ param_name +'\n')
+    if not validName(param_name):
+        response = flask.jsonify({'error': 'Invalid parameter name: %s' % param_name})
+        response.status_code = 400
+        return response
     message = flask.request.get_json(force=True, silent=True)
     if message and not isinstance(message, dict):
         return error()
@@ -25,15 +124,8 @@ def conf(param_name):
         value = message.get('value', '') if message else ''
         sys.stdout.write('value: ' + str(value) +'\n')
         if value:
-            filename = '/conf/%s' % param_name
-            try:
-                sys.stdout.write('delete file: ' + filename +'\n')
-                os.remove(filename)
-            except:
-                pass
             try:
-                with open(filename, 'w+') as f:
-                    f.write(str(value))
+                applyParams({param_name: value})
                 return ('OK', 200)
             except Exception as e:
                 sys.stdout.write('Error: ' + str(e) +'\n')
@@ -42,6 +134,35 @@ def conf(param_name):
                 return response
 
 
+@proxy.route('/conf', methods=['POST'])
+def confAll():
+    """
+    Apply a whole parameter map, {'value': {<param_name>: <value>, ..}}, in
+    one go. Parameters with an empty value are skipped as in /conf/<param_name>
+    """
+    sys.stdout.write('Enter: /conf\n')
+    message = flask.request.get_json(force=True, silent=True)
+    params = message.get('value') if isinstance(message, dict) else None
+    if not isinstance(params, dict):
+        response = flask.jsonify({'error': '/conf did not receive a dictionary of parameters as an argument.'})
+        response.status_code = 400
+        return response
+    invalid = [k for k in params if not validName(k)]
+    if invalid:
+        response = flask.jsonify({'error': 'Invalid parameter names: %s' % invalid})
+        response.status_code = 400
+        return response
+
+    try:
+        applyParams(dict((k, v) for k, v in params.items() if v))
+        return ('OK', 200)
+    except Exception as e:
+        sys.stdout.write('Error: ' + str(e) +'\n')
+        response = flask.jsonify({'error': 'Internal error. {}'.format(e)})
+        response.status_code = 500
+        return response
+
+
 def main():
     port = int(os.getenv('CONF_PROXY_PORT', 8081))
     server = WSGIServer(('0.0.0.0', port), proxy, log=None)
@@ -36,19 +36,278 @@ import requests
 import time
 import timeit
 from datetime import datetime, timezone
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
+import random
+import socket
+import tempfile
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 
 
-def getValue(local, remote):
+# Node-local cache of values retrieved from the storage service, keyed by
+# their content hash (e.g. a hostPath volume shared by the invokers of a node).
+# Disabled when not set
+CACHE_DIR = os.getenv('OW_OFFLOAD_CACHE_DIR')
+# Size (in bytes) above which least recently used values get evicted
+CACHE_SIZE = int(os.getenv('OW_OFFLOAD_CACHE_SIZE', str(1024 * 1024 * 1024)))
+
+
+# Overall time (in seconds) given to the action container to accept /init
+INIT_DEADLINE = float(os.getenv('OW_OFFLOAD_INIT_DEADLINE', '60'))
+# Bounds (in seconds) of the jittered exponential backoff between probes
+INIT_BACKOFF_MIN = float(os.getenv('OW_OFFLOAD_INIT_BACKOFF_MIN', '0.05'))
+INIT_BACKOFF_MAX = float(os.getenv('OW_OFFLOAD_INIT_BACKOFF_MAX', '2'))
+# Explicit readiness signal of the action container: a file it creates
+# (e.g. on the shared /conf volume) or a unix socket it listens on. When
+# none is set, the action port accepting connections means ready
+READY_FILE = os.getenv('OW_OFFLOAD_READY_FILE')
+READY_SOCKET = os.getenv('OW_OFFLOAD_READY_SOCKET')
+
+
+# Log file the action proxy tees its output into (on a volume shared with
+# the action container). Logs are collected from it rather than through the
+# offload service when set
+ACTION_LOG_FILE = os.getenv('OW_OFFLOAD_ACTION_LOG_FILE')
+# Size (in bytes) of the action log tail kept
+MAX_LOG_SIZE = int(os.getenv('OW_OFFLOAD_MAX_LOG_SIZE', str(1024 * 1024)))
+# gzip (and base64) the collected action logs
+LOG_COMPRESS = os.getenv('OW_OFFLOAD_LOG_COMPRESS', 'false').lower() == 'true'
+# Time (in seconds) to wait for the action proxy to flush its log sentinels
+LOG_WAIT = float(os.getenv('OW_OFFLOAD_LOG_WAIT', '2'))
+LOG_SENTINEL = 'XXX_THE_END_OF_A_WHISK_ACTIVATION_XXX'
+
+
+def collectLogs():
+    """
+    Collect the action logs of the activation from ACTION_LOG_FILE, which
+    the action proxy truncates upon /run and ends with a log sentinel per
+    stream (stdout, stderr)
+    """
+    deadline = time.time() + LOG_WAIT
+    while True:
+        try:
+            with open(ACTION_LOG_FILE, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                f.seek(max(0, size - MAX_LOG_SIZE))
+                data = f.read(MAX_LOG_SIZE)
+        except (IOError, OSError):
+            size = 0
+            data = b''
+        if data.count(LOG_SENTINEL.encode()) >= 2 or time.time() > deadline:
+            break
+        time.sleep(0.05)
+    lines = [l for l in data.decode('utf-8', 'replace').splitlines()
+             if l != LOG_SENTINEL]
+    logs = {'invokerLogs': []}
+    if size > MAX_LOG_SIZE:
+        logs['truncated'] = True
+    if LOG_COMPRESS:
+        logs['actionLogsGzip'] = base64.b64encode(
+            gzip.compress('\n'.join(lines).encode())).decode()
+    else:
+        logs['actionLogs'] = lines
+    return logs
+
+
+# Number of attempts posting the result to a completion endpoint, and the
+# base (in seconds) of the jittered exponential backoff between them
+ENDPOINT_ATTEMPTS = int(os.getenv('OW_OFFLOAD_ENDPOINT_ATTEMPTS', '3'))
+ENDPOINT_BACKOFF = float(os.getenv('OW_OFFLOAD_ENDPOINT_BACKOFF', '0.5'))
+
+
+def postEndpoint(session, url, payload, headers):
+    """
+    Post payload to a completion endpoint, retrying on connection errors,
+    429 and 5xx responses.
+
+    :return: outcome dictionary (status ok/failed, attempts, error)
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            r = session.post(url, json=payload, headers=headers, verify=False)
+            if r:
+                return {'status': 'ok', 'attempts': attempt}
+            error = 'HTTP %d: %s' % (r.status_code, r.text)
+            if r.status_code != 429 and r.status_code < 500:
+                return {'status': 'failed', 'attempts': attempt, 'error': error}
+        except Exception as e:
+            error = e
+        if attempt >= ENDPOINT_ATTEMPTS:
+            return {'status': 'failed', 'attempts': attempt, 'error': str(error)}
+        delay = ENDPOINT_BACKOFF * 2 ** (attempt - 1)
+        time.sleep(random.uniform(delay / 2, delay))
+
+
+def postEndpoints(owAPIHost, endpoints, payload, headers):
+    """
+    Post payload to all the completion endpoints concurrently over a pooled
+    session; each endpoint succeeds or fails independently.
+
+    :return: dictionary of outcomes keyed by endpoint
+    """
+    if not endpoints:
+        return {}
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_maxsize=len(endpoints)))
+    session.mount('http://', HTTPAdapter(pool_maxsize=len(endpoints)))
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        futures = dict((endpoint, executor.submit(
+            postEndpoint, session, owAPIHost+'/api/v1/namespaces'+endpoint,
+            payload, headers)) for endpoint in endpoints)
+    outcomes = {}
+    for endpoint, future in futures.items():
+        outcomes[endpoint] = future.result()
+        sys.stdout.write('post to completionEndpoint %s: %s\n' %
+                         (endpoint, outcomes[endpoint]))
+    return outcomes
+
+
+def actionReady(host, port):
+    if READY_FILE or READY_SOCKET:
+        if READY_FILE and os.path.exists(READY_FILE):
+            return True
+        if READY_SOCKET:
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                s.connect(READY_SOCKET)
+                return True
+            except (IOError, OSError):
+                pass
+            finally:
+                s.close()
+        return False
+    try:
+        socket.create_connection((host, port), timeout=1).close()
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def initAction(action_url, init_payload, headers):
+    """
+    Post /init once the action container is ready, probing it with a
+    jittered exponential backoff until INIT_DEADLINE
+    """
+    url = urlparse(action_url)
+    deadline = time.time() + INIT_DEADLINE
+    attempt = 0
+    while True:
+        error = None
+        if actionReady(url.hostname, url.port or 80):
+            try:
+                r = requests.post(action_url+'/init', json={'value': init_payload}, headers=headers)
+                r.raise_for_status()
+                sys.stdout.write('post to /init completed successfully\n')
+                return
+            except Exception as e:
+                error = e
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise error or Exception('Action not ready after %d seconds' % INIT_DEADLINE)
+        delay = min(INIT_BACKOFF_MAX, INIT_BACKOFF_MIN * 2 ** attempt)
+        delay = min(remaining, random.uniform(delay / 2, delay))
+        attempt += 1
+        sys.stdout.write('Action not ready; waiting %0.3f seconds and retrying\n' % delay)
+        time.sleep(delay)
+
+
+def cacheGet(digest):
+    path = os.path.join(CACHE_DIR, digest)
+    try:
+        with open(path) as f:
+            value = f.read()
+    except (IOError, OSError):
+        return None
+    # last access time drives the eviction
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return value
+
+
+def cachePut(digest, value):
+    try:
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(value)
+        os.replace(tmp, os.path.join(CACHE_DIR, digest))
+        cacheEvict()
+    except Exception as e:
+        sys.stdout.write('failed to cache value %s: %s\n' % (digest, e))
+
+
+def cacheEvict():
+    entries = []
+    total = 0
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith('.tmp'):
+            continue
+        try:
+            st = os.stat(os.path.join(CACHE_DIR, name))
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, name))
+        total += st.st_size
+    for mtime, size, name in sorted(entries):
+        if total <= CACHE_SIZE:
+            break
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except OSError:
+            pass
+        total -= size
+
+
+class MissingValue(Exception):
+    """
+    The storage service no longer holds the value of the given content hash
+    (e.g. it was restarted), or holds another one under its key
+    """
+
+    def __init__(self, digest, reason):
+        Exception.__init__(self, 'value %s missing from the storage service: %s'
+                           % (digest, reason))
+        self.digest = digest
+
+
+def getValue(local, remote, digest=None, path=None):
+    if not path is None:
+        with open(path) as f:
+            return json.load(f)
     if not local is None:
         return json.loads(local)
     else:
+        cached = CACHE_DIR and digest
+        if cached:
+            value = cacheGet(digest)
+            if not value is None:
+                sys.stdout.write('value '+digest+' served from node cache\n')
+                return json.loads(value)
         storage_host = os.getenv('OW_STORAGESERVICE_SERVICE_HOST')
         storage_port = os.getenv('OW_STORAGESERVICE_SERVICE_PORT')
         r = requests.post('http://'+storage_host+':'+storage_port+'/retrieveValue',
                           json = {'key' : remote},
                           headers = {'Content-Type' : 'application/json'})
+        if digest and 400 <= r.status_code < 500:
+            raise MissingValue(digest, 'key %s: %s' % (remote, r.text))
         r.raise_for_status()
-        return json.loads(r.json()['value'])
+        value = r.json().get('value')
+        if digest and value is None:
+            raise MissingValue(digest, 'key %s not found' % remote)
+        if digest:
+            # the offload server reuses uploads by content hash
+            if hashlib.sha256(value.encode()).hexdigest() != digest:
+                raise MissingValue(digest, 'key %s holds another value' % remote)
+            if cached:
+                cachePut(digest, value)
+        return json.loads(value)
 
 
 def executeAction():
@@ -60,10 +319,14 @@ def executeAction():
     endpoints = json.loads(os.getenv('OW_OFFLOAD_ENDPOINTS'))
     code_env = os.getenv('OW_OFFLOAD_CODE')
     code_file_env = os.getenv('OW_OFFLOAD_CODE_FILE')
+    code_hash_env = os.getenv('OW_OFFLOAD_CODE_HASH')
+    code_path_env = os.getenv('OW_OFFLOAD_CODE_PATH')
     binary_env = os.getenv('OW_OFFLOAD_BINARY_CODE')
     main_env = os.getenv('OW_OFFLOAD_MAIN')
     args_env = os.getenv('OW_OFFLOAD_ARGS')
     args_file_env = os.getenv('OW_OFFLOAD_ARGS_FILE')
+    args_hash_env = os.getenv('OW_OFFLOAD_ARGS_HASH')
+    args_path_env = os.getenv('OW_OFFLOAD_ARGS_PATH')
     activationId = os.getenv('OW_OFFLOAD_ACTIVATION_ID')
     flowId = os.getenv('OW_OFFLOAD_FLOW_ID')
 
@@ -76,86 +339,77 @@ def executeAction():
     sys.stdout.write('initiating offload of job '+flowId+'\n')
     try:
         init_payload = {}
-        if not (code_env is None and code_file_env is None):
+        if not (code_env is None and code_file_env is None and code_path_env is None):
             init_payload['binary'] = json.loads(binary_env)
-            init_payload['code'] = getValue(code_env, code_file_env)
+            init_payload['code'] = getValue(code_env, code_file_env, code_hash_env, code_path_env)
         if not main_env is None:
             init_payload['main'] = json.loads(main_env)
 
         # /init
-        initAttempts = 0
-        while True:
-            try:
-                r = requests.post(action_url+'/init', json={'value': init_payload}, headers=headers)
-                r.raise_for_status()
-                sys.stdout.write('post to /init completed successfully\n')
-                break
-            except Exception as e:
-                initAttempts += 1
-                if initAttempts > 10:
-                    raise e
-                sys.stdout.write('Action not ready; waiting %d seconds and retrying\n' % initAttempts)
-                time.sleep(initAttempts)
+        initAction(action_url, init_payload, headers)
 
         # /run
-        args = getValue(args_env, args_file_env)
+        args = getValue(args_env, args_file_env, args_hash_env, args_path_env)
         r = requests.post(action_url+'/run', json={'value': args}, headers=headers)
         r.raise_for_status()
         sys.stdout.write('post to /run completed successfully\n')
         actionResult = r.json()
 
-        # request logs from offload service (encapsulate k8s in server)
         start = timeit.default_timer()
-        r = requests.post('http://'+offload_host+':'+offload_port+'/getLogs',
-                          json = {'value': {'flowId' : flowId }},
-                          headers = headers)
         logs = ''
-        if r:
-            logs = r.json()
+        if ACTION_LOG_FILE:
+            logs = collectLogs()
+        else:
+            # request logs from offload service (encapsulate k8s in server)
+            r = requests.post('http://'+offload_host+':'+offload_port+'/getLogs',
+                              json = {'value': {'flowId' : flowId }},
+                              headers = headers)
+            if r:
+                logs = r.json()
+        if logs:
             ts = datetime.now(timezone.utc).astimezone().isoformat();
             end = timeit.default_timer()
             logtime = end - start
             logs.setdefault('invokerLogs',[]).append(ts+' spent %0.3f seconds collecting logs' % logtime)
 
         # return result to OpenWhisk via specified endpoint(s)
-        for endpoint in endpoints:
-            sys.stdout.write('attempting to post result to completionEndpoint '+endpoint+'\n')
-            r = requests.post(owAPIHost+'/api/v1/namespaces'+endpoint,
-                              json={'result': actionResult,
-                                    'offloadingActivationId': activationId,
-                                    'activationId' : flowId,
-                                    'logs': logs },
-                              headers=ow_headers, verify=False)
-            r.raise_for_status()
-            sys.stdout.write('successful post to completionEndpoint '+endpoint+'\n')
+        outcomes = postEndpoints(owAPIHost, endpoints,
+                                 {'result': actionResult,
+                                  'offloadingActivationId': activationId,
+                                  'activationId' : flowId,
+                                  'logs': logs },
+                                 ow_headers)
 
         # Notify offload service that the job has completed successfully.
         sys.stdout.write('notifying offload service of successfulJob '+flowId+'\n')
         r = requests.post('http://'+offload_host+':'+offload_port+'/successfulJob',
-                          json= {'value': {'flowId' : flowId }}, headers = headers)
+                          json= {'value': {'flowId' : flowId,
+                                           'endpoints' : outcomes }},
+                          headers = headers)
         if not r:
             sys.stdout.write('internal error notifying offload service\n')
             print(r)
 
     except Exception as e:
         print(e)
+        failed = {'flowId' : flowId, 'activationId' : activationId }
+        if isinstance(e, MissingValue):
+            # for the offload server to upload it again next time
+            failed['missingValue'] = e.digest
         try:
             sys.stdout.write('attempting to post error to completionEndpoint\n')
-            for endpoint in endpoints:
-                r = requests.post(owAPIHost+'/api/v1/namespaces'+endpoint,
-                                  json={'error': str(e),
-                                        'offloadingActivationId': activationId,
-                                        'activationId' : flowId},
-                                  headers=ow_headers, verify=False)
-                r.raise_for_status()
-                sys.stdout.write('successfully posted error to '+endpoint+'\n')
+            postEndpoints(owAPIHost, endpoints,
+                          {'error': str(e),
+                           'offloadingActivationId': activationId,
+                           'activationId' : flowId},
+                          ow_headers)
         except Exception as e:
             print(e)
 
         try:
             sys.stdout.write('notifying offload service of failedJob '+flowId+'\n')
             r = requests.post('http://'+offload_host+':'+offload_port+'/failedJob',
-                              json= {'value': {'flowId' : flowId, 'activationId' : activationId }},
+                              json= {'value': failed},
                               headers = headers)
             r.raise_for_status()
         except Exception as e:
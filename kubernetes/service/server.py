@@ -28,6 +28,11 @@ The service is designed to be run as a service in a kubernetes cluster
  */
 """
 import base64
+import collections
+import copy
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import hashlib
 
 import logging
 
@@ -39,6 +44,7 @@ import time
 import uuid
 import re
 import sys
+import threading
 
 import flask
 from gevent.wsgi import WSGIServer
@@ -46,14 +52,22 @@ from werkzeug.exceptions import HTTPException
 
 import kubernetes
 from kubernetes import client,config
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
 
+from kubernetes.client import V1ConfigMap
+from kubernetes.client import V1ConfigMapVolumeSource
 from kubernetes.client import V1Container
 from kubernetes.client import V1ContainerPort
 from kubernetes.client import V1EnvVar
 from kubernetes.client import V1EnvVarSource
 from kubernetes.client import V1Job
+from kubernetes.client import V1beta1DaemonSet
+from kubernetes.client import V1beta1DaemonSetSpec
+from kubernetes.client import V1Pod
 from kubernetes.client import V1JobSpec
 from kubernetes.client import V1ObjectMeta
+from kubernetes.client import V1OwnerReference
 from kubernetes.client import V1PodSpec
 from kubernetes.client import V1PodTemplateSpec
 from kubernetes.client import V1Secret
@@ -81,6 +95,9 @@ FAAS_VERSION = "0.2.7"
 
 
 ANNOTATION_PLACEMENT = 'placement'
+ANNOTATION_IMAGE_PULL_POLICY = 'image-pull-policy'
+
+IMAGE_PULL_POLICIES = ('Always', 'IfNotPresent', 'Never')
 
 
 # Linux has at least 128k for the entire environment;
@@ -117,6 +134,104 @@ logger.addHandler(f_handler)
 
 PORT_UDP_REGEX = re.compile('([0-9]+)/(udp|UDP)')
 
+# Serve pod/job/service reads from a watch-driven local cache instead of
+# querying the kubernetes API on every request
+WATCH_CACHE = os.getenv('OW_OFFLOAD_WATCH_CACHE', 'true').lower() == 'true'
+# Period after which a watch is re-established (server side timeout)
+WATCH_TIMEOUT = int(os.getenv('OW_OFFLOAD_WATCH_TIMEOUT', '300'))
+
+# Deadline (in seconds) for the shadow POD to become running on reconfigure
+RECONFIGURE_TIMEOUT = int(os.getenv('OW_OFFLOAD_RECONFIGURE_TIMEOUT', '60'))
+
+OFFLOAD_JOB_SELECTOR = 'job-type=ow-offload-job'
+
+# Number of parallel kubernetes delete calls / background cleanups
+CLEANUP_WORKERS = int(os.getenv('OW_OFFLOAD_CLEANUP_WORKERS', '8'))
+# Maximum number of flowIds put into a single set-based label selector
+CLEANUP_BATCH_SIZE = int(os.getenv('OW_OFFLOAD_CLEANUP_BATCH_SIZE', '50'))
+# Number of background cleanup statuses kept for /getCleanup
+MAX_CLEANUP_HANDLES = 1000
+
+# Number of asynchronous offloads creating kubernetes objects concurrently
+OFFLOAD_WORKERS = int(os.getenv('OW_OFFLOAD_WORKERS', '8'))
+# Maximum number of queued asynchronous offloads; further ones are rejected
+MAX_PENDING_OFFLOADS = int(os.getenv('OW_OFFLOAD_MAX_PENDING', '256'))
+# Number of asynchronous offload statuses kept for getPod
+MAX_OFFLOAD_HANDLES = 1000
+
+# Number of pre-created (warm) pods kept per action image and node selector
+# class. 0 disables the warm pool; can be overridden per action with the
+# 'warm-pool-size' key of the placement annotation
+WARM_POOL_SIZE = int(os.getenv('OW_OFFLOAD_WARM_POOL_SIZE', '0'))
+WARM_POOL_SELECTOR = 'job-type=ow-offload-warm'
+# Delay (in seconds) before a pool gets refilled after one of its idle pods
+# failed or was deleted
+WARM_POOL_REFILL_DELAY = int(os.getenv('OW_OFFLOAD_WARM_POOL_REFILL_DELAY', '5'))
+# Time (in seconds) after which idle warm pods get deleted and pools no longer
+# used (i.e. no offload of their action) stop being refilled. 0 keeps them
+# forever
+WARM_POOL_IDLE = int(os.getenv('OW_OFFLOAD_WARM_POOL_IDLE', '3600'))
+
+# Warm pods wait for these files (pushed through the ow-conf sidecar) and
+# then exec the action with the pushed parameters
+WARM_PARAMS_FILE = '.ow_params'
+WARM_ACTIVATION_FILE = '.ow_activation'
+WARM_START_FILE = '.ow_start'
+WARM_ACTION_SCRIPT = (
+    'while [ ! -f /conf/%(start)s ]; do sleep 0.1; done; '
+    'export __OW_ACTIVATION_ID=$(cat /conf/%(start)s); '
+    'export __OW_OFFLOADING_ACTIVATION_ID=$(cat /conf/%(activation)s); '
+    'exec /action/exec "$(cat /conf/%(params)s)"' %
+    {
+        'start': WARM_START_FILE,
+        'activation': WARM_ACTIVATION_FILE,
+        'params': WARM_PARAMS_FILE
+    })
+
+# Time (in seconds) an action definition retrieved from OpenWhisk is served
+# from the local cache before being revalidated. 0 disables the cache
+ACTION_CACHE_TTL = int(os.getenv('OW_OFFLOAD_ACTION_CACHE_TTL', '30'))
+# Maximum number of cached action definitions
+ACTION_CACHE_SIZE = int(os.getenv('OW_OFFLOAD_ACTION_CACHE_SIZE', '256'))
+
+# Number of large values (keyed by content hash) remembered as already
+# uploaded to the storage service
+MAX_STORED_VALUES = int(os.getenv('OW_OFFLOAD_STORED_VALUES', '1024'))
+
+# How action code and parameters reach the offloaded action: 'env' (env vars
+# and container args, large ones through the storage service) or 'volume'
+# (read-only ConfigMap volume named after their content hash, keeping Job
+# objects small)
+VALUE_DELIVERY = os.getenv('OW_OFFLOAD_VALUE_DELIVERY', 'env')
+VALUES_MOUNT_PATH = '/ow-values'
+# Size (in bytes) of the values above which they are delivered as with 'env'
+# instead: a ConfigMap, metadata included, is limited to 1MiB
+MAX_VALUES_SIZE = int(os.getenv('OW_OFFLOAD_MAX_VALUES_SIZE',
+                                str(1024 * 1024 - 16 * 1024)))
+VALUES_ACTION_SCRIPT = 'exec /action/exec "$(cat %s/args)"' % VALUES_MOUNT_PATH
+
+# Have the invoker collect the action logs from a file on the shared /conf
+# volume, teed by the action proxy, instead of through /getLogs
+LOCAL_LOGS = os.getenv('OW_OFFLOAD_LOCAL_LOGS', 'false').lower() == 'true'
+ACTION_LOG_FILE = '/conf/.ow_action.log'
+
+# Pull policy of the action container for actions without the
+# 'image-pull-policy' annotation
+IMAGE_PULL_POLICY = os.getenv('OW_OFFLOAD_IMAGE_PULL_POLICY', 'Always')
+
+# Action images kept resident (pre-pulled) on the labelled nodes through
+# DaemonSets: comma separated list of images to pre-pull at start-up, and
+# number of offloads after which an image gets pre-pulled (0 disables it)
+PREPULL_IMAGES = [i.strip() for i in
+                  os.getenv('OW_OFFLOAD_PREPULL_IMAGES', '').split(',')
+                  if i.strip()]
+PREPULL_THRESHOLD = int(os.getenv('OW_OFFLOAD_PREPULL_THRESHOLD', '0'))
+PREPULL_NODE_SELECTOR = json.loads(
+    os.getenv('OW_OFFLOAD_PREPULL_NODE_SELECTOR', '{"offload-prepull": "true"}'))
+PREPULL_PAUSE_IMAGE = os.getenv('OW_OFFLOAD_PREPULL_PAUSE_IMAGE',
+                                'k8s.gcr.io/pause:3.1')
+PREPULL_SELECTOR = 'job-type=ow-offload-prepull'
+
 
 def find(l, predicate):
     """
@@ -207,13 +322,24 @@ def _action_from_pod(pod):
         return None, False
 
 
-def _build_job(namespace, object_meta, node_selector, affinity,
-                    invoker_image, action_image, invokerEnv, actionEnv,
-                    params, action_timelimit, security_context):
+def _build_pod_spec(node_selector, affinity, invoker_image, action_image,
+                    actionEnv, command, args, action_timelimit,
+                    security_context, image_pull_policy=IMAGE_PULL_POLICY,
+                    values_config_map=None):
     """
-    Internal helper to build a Job spec out from the given parameters
+    Internal helper to build the offload Pod spec (action container and its
+    ow-conf sidecar) out from the given parameters
     """
-    pod_spec = V1PodSpec(
+    volume_mounts = [V1VolumeMount(name='conf-volume', mount_path='/conf')]
+    volumes = [V1Volume(name='conf-volume', empty_dir={})]
+    if values_config_map:
+        volume_mounts.append(V1VolumeMount(name='values-volume',
+                                           mount_path=VALUES_MOUNT_PATH,
+                                           read_only=True))
+        volumes.append(V1Volume(name='values-volume',
+                                config_map=V1ConfigMapVolumeSource(
+                                    name=values_config_map)))
+    return V1PodSpec(
         containers= [
 #             V1Container(
 #                 image_pull_policy="IfNotPresent",
@@ -224,14 +350,13 @@ def _build_job(namespace, object_meta, node_selector, affinity,
 #                 env=invokerEnv
 #             ),
             V1Container(
-                image_pull_policy="Always",
+                image_pull_policy=image_pull_policy,
                 image=action_image,
                 name='ow-action',
                 env=actionEnv,
-                command=["/action/exec"],
-                args=[json.dumps(params)],
-                volume_mounts=[V1VolumeMount(name='conf-volume',
-                                             mount_path='/conf')],
+                command=command,
+                args=args,
+                volume_mounts=volume_mounts,
                 security_context=security_context
             ),
             V1Container(
@@ -244,13 +369,40 @@ def _build_job(namespace, object_meta, node_selector, affinity,
                                              mount_path='/conf')]
             )
         ],
-        volumes=[V1Volume(name='conf-volume', empty_dir={})],
+        volumes=volumes,
         restart_policy="Never",
         active_deadline_seconds=action_timelimit,
         node_selector=node_selector,
         affinity=affinity,
         termination_grace_period_seconds=1
     )
+
+
+def _build_job(namespace, object_meta, node_selector, affinity,
+                    invoker_image, action_image, invokerEnv, actionEnv,
+                    params, action_timelimit, security_context,
+                    image_pull_policy=IMAGE_PULL_POLICY,
+                    values_config_map=None):
+    """
+    Internal helper to build a Job spec out from the given parameters.
+
+    With values_config_map, the action reads its parameters from the
+    mounted values volume rather than from the container args
+    """
+    if values_config_map:
+        command = ["/bin/bash", "-c"]
+        args = [VALUES_ACTION_SCRIPT]
+    else:
+        command = ["/action/exec"]
+        args = [json.dumps(params)]
+    pod_spec = _build_pod_spec(
+        node_selector=node_selector, affinity=affinity,
+        invoker_image=invoker_image, action_image=action_image,
+        actionEnv=actionEnv, command=command,
+        args=args, action_timelimit=action_timelimit,
+        security_context=security_context,
+        image_pull_policy=image_pull_policy,
+        values_config_map=values_config_map)
     job_spec = V1JobSpec(
         active_deadline_seconds=action_timelimit,
         completions=1,
@@ -287,6 +439,161 @@ def parseQName(qname, namespace):
     return (namespace, name)
 
 
+class ResourceCache:
+    """
+    Local cache of kubernetes objects of a single kind, kept current by a
+    list followed by a watch (i.e. informer). Objects are indexed by the
+    offload labels so that lookups do not hit the kubernetes API.
+    """
+    INDEXES = ('flowId', 'jobId', 'ro_vim_vm_name', 'event_uuid')
+
+    def __init__(self, kind, list_func, namespace, label_selector):
+        self.kind = kind
+        self.list_func = list_func
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self.lock = threading.Lock()
+        self.synced = threading.Event()
+        self.objects = {}
+        self.indexes = dict((i, {}) for i in self.INDEXES)
+        # callbacks invoked with (event_type, object) on every watch event
+        self.listeners = []
+
+    def start(self):
+        _thread.start_new_thread(self._run, ())
+
+    def subscribe(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self.lock:
+            self.listeners.remove(listener)
+
+    def _index(self, obj):
+        labels = obj.metadata.labels or {}
+        for i in self.INDEXES:
+            if i in labels:
+                self.indexes[i].setdefault(labels[i], set()).add(
+                    obj.metadata.name)
+
+    def _unindex(self, obj):
+        labels = obj.metadata.labels or {}
+        for i in self.INDEXES:
+            names = self.indexes[i].get(labels.get(i))
+            if names is not None:
+                names.discard(obj.metadata.name)
+                if not names:
+                    del self.indexes[i][labels[i]]
+
+    def _update(self, event_type, obj):
+        with self.lock:
+            old = self.objects.pop(obj.metadata.name, None)
+            if old is not None:
+                self._unindex(old)
+            if event_type != 'DELETED':
+                self.objects[obj.metadata.name] = obj
+                self._index(obj)
+            listeners = list(self.listeners)
+        for listener in listeners:
+            try:
+                listener(event_type, obj)
+            except Exception as e:
+                logger.error('%s cache listener failed: %s' % (self.kind, e))
+
+    def _replace(self, items):
+        with self.lock:
+            self.objects = {}
+            self.indexes = dict((i, {}) for i in self.INDEXES)
+            for obj in items:
+                self.objects[obj.metadata.name] = obj
+                self._index(obj)
+
+    def _run(self):
+        while True:
+            try:
+                objList = self.list_func(namespace=self.namespace,
+                                         label_selector=self.label_selector)
+                self._replace(objList.items)
+                self.synced.set()
+                resource_version = objList.metadata.resource_version
+                logger.debug('%s cache synced with %d objects' %
+                             (self.kind, len(objList.items)))
+                while True:
+                    w = watch.Watch()
+                    for event in w.stream(self.list_func,
+                                          namespace=self.namespace,
+                                          label_selector=self.label_selector,
+                                          resource_version=resource_version,
+                                          timeout_seconds=WATCH_TIMEOUT):
+                        if event['type'] == 'ERROR':
+                            # e.g. resource version too old; relist
+                            raise Exception(event['raw_object'])
+                        obj = event['object']
+                        resource_version = obj.metadata.resource_version
+                        self._update(event['type'], obj)
+            except Exception as e:
+                logger.error('%s cache watch failed, re-listing: %s' %
+                             (self.kind, e))
+                self.synced.clear()
+                time.sleep(1)
+
+    def get(self, label_name, label_value):
+        """
+        Return the cached objects labeled with label_name=label_value
+        """
+        with self.lock:
+            if label_name not in self.indexes:
+                return [o for o in self.objects.values()
+                        if (o.metadata.labels or {}).get(label_name) == label_value]
+            names = self.indexes[label_name].get(label_value, ())
+            return [self.objects[n] for n in names]
+
+    def list(self):
+        with self.lock:
+            return list(self.objects.values())
+
+
+class ActionCache:
+    """
+    LRU cache of decoded OpenWhisk action definitions keyed on action FQN and
+    API key.
+
+    Entries are served as is for ACTION_CACHE_TTL seconds, then revalidated
+    with a conditional (If-None-Match) request when OpenWhisk provided an
+    ETag for them.
+    """
+
+    def __init__(self, ttl, size):
+        self.ttl = ttl
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, etag, decoded):
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            self.entries[key] = {
+                'etag': etag,
+                'expires': time.time() + self.ttl,
+                'decoded': decoded
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+action_cache = ActionCache(ACTION_CACHE_TTL, ACTION_CACHE_SIZE)
+
+
 # Helper class to construct an offload request from an post to /offload
 # Iteracts with OpenWhisk to authenticate request and obtain the code to run.
 class OffloadRequest:
@@ -334,6 +641,8 @@ class OffloadRequest:
                                 'ClusterIP, NodePort')
 
         self.params = coe_action_params.get('action_params', {})
+        # return flowId/jobId at once and create the job in the background
+        self.async_offload = value.get('async', False)
         self.activationId = value.get('activationId', "42")
         self.ro_vim_vm_name = value.get('ro_vim_vm_name', "na")
         self.event_uuid = value.get('event_uuid', "na")
@@ -351,19 +660,47 @@ class OffloadRequest:
 
         self.actionDef = None
         self.image = None
+        self.image_pull_policy = IMAGE_PULL_POLICY
         self.code = None
         self.entry = None
         self.binary = None
 
 
+    # attributes set by decodeAction, kept in the action cache
+    DECODED_ATTRS = ('placement', 'image_pull_policy', 'image', 'code',
+                     'binary', 'entry')
+
     # Get action defintion from OpenWhisk (which also authenticates the request)
+    # and decode it. Served from the action cache while fresh, conditionally
+    # revalidated once expired
     def requestAction(self):
+        key = (self.actionFQN, self.owb64APIKey)
+        entry = action_cache.get(key)
+        if entry and entry['expires'] > time.time():
+            self._restoreAction(entry['decoded'])
+            return
+        headers = {'Authorization' : 'Basic %s' % self.owb64APIKey }
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
         r = requests.get(self.owAPIHost+'/api/v1/namespaces'+self.actionURL,
-                         headers={'Authorization' : 'Basic %s' % self.owb64APIKey }, verify=False)
+                         headers=headers, verify=False)
+        if entry and r.status_code == 304:
+            logger.debug('Action %s not modified' % self.actionFQN)
+            action_cache.put(key, entry['etag'], entry['decoded'])
+            self._restoreAction(entry['decoded'])
+            return
         if not r:
             flask.abort(r.status_code,
                         'Error while retrieving action %s' % self.actionFQN)
-        return r.json()
+        self.decodeAction(r.json())
+        action_cache.put(key, r.headers.get('ETag'),
+                         {a: getattr(self, a) for a in self.DECODED_ATTRS})
+
+    def _restoreAction(self, decoded):
+        for a in self.DECODED_ATTRS:
+            setattr(self, a, decoded[a])
+        # the only mutable one; do not share it between requests
+        self.placement = copy.deepcopy(self.placement)
 
 
     # Decode action definition and determine what we are being asked to do
@@ -375,6 +712,13 @@ class OffloadRequest:
             self.placement = {}
         else:
             self.placement = element['value']
+        element = find(annotations, lambda element: element['key']==ANNOTATION_IMAGE_PULL_POLICY)
+        if element:
+            if element['value'] not in IMAGE_PULL_POLICIES:
+                flask.abort(400, 'Illegal %s annotation. Supported values: %s' %
+                            (ANNOTATION_IMAGE_PULL_POLICY,
+                             ', '.join(IMAGE_PULL_POLICIES)))
+            self.image_pull_policy = element['value']
 
         # Use kind to determine image, code, binary and entry.
         kind = action.get('kind')
@@ -403,6 +747,458 @@ class OffloadRequest:
             flask.abort(400, 'Unable to determine docker image to use for action kind: \"%s\"' % kind)
 
 
+class WarmPool:
+    """
+    Pool of pre-scheduled, paused offload pods per action image and node
+    selector class.
+
+    A warm pod runs its action container in a wait loop until parameters
+    get pushed through its ow-conf sidecar. Offloading into a warm pod thus
+    only costs a relabel (binding the pod to the flowId) and a push of the
+    parameters, instead of a job creation, scheduling, image pull and
+    container start.
+
+    Only blackbox actions without anti-affinity or security context
+    requirements are served from the pool.
+
+    Warm pods have no active deadline while idle; the action time limit is
+    set upon claim. Instead, pods idle for WARM_POOL_IDLE are reaped, those
+    of pools unknown to this server (e.g. created before a restart)
+    included, and pools unused for as long are no longer refilled. The API
+    key secret of a pool is owned by its pods and thus garbage collected
+    along with the last of them.
+    """
+
+    def __init__(self, offloader):
+        self.offloader = offloader
+        self.cache = ResourceCache('warm pod',
+                                   offloader.core_api.list_namespaced_pod,
+                                   offloader.kube_namespace, WARM_POOL_SELECTOR)
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.lock = threading.Lock()
+        self.refilling = set()
+        # key -> (request, node selector) of the pools refilled so far
+        self.pools = {}
+        # key -> time of the last claim attempt of the pool
+        self.used = {}
+        self.cache_started = False
+        self.reaping = False
+
+    def start(self):
+        """
+        Start reaping, the pods left over by a former run included. The pod
+        cache is only started with the first pool
+        """
+        self._startReaper()
+
+    def _startCache(self):
+        with self.lock:
+            if not WATCH_CACHE or self.cache_started:
+                return
+            self.cache_started = True
+        self.cache.subscribe(self._podEvent)
+        self.cache.start()
+
+    def _startReaper(self):
+        with self.lock:
+            if WARM_POOL_IDLE <= 0 or self.reaping:
+                return
+            self.reaping = True
+        _thread.start_new_thread(self._reaper, ())
+
+    def _inUse(self, key):
+        return WARM_POOL_IDLE <= 0 or \
+            time.time() - self.used.get(key, 0) <= WARM_POOL_IDLE
+
+    def _podEvent(self, event_type, pod):
+        """
+        Refill the pool of an idle pod that failed or got deleted
+        """
+        key = (pod.metadata.labels or {}).get('warm-pool')
+        if not key or (event_type != 'DELETED' and
+                       pod.status.phase not in ('Failed', 'Succeeded')):
+            return
+        with self.lock:
+            pool = self.pools.get(key) if self._inUse(key) else None
+        if pool:
+            self.refill(pool[0], pool[1], delay=WARM_POOL_REFILL_DELAY)
+
+    def _reaper(self):
+        """
+        Reap periodically while there are warm pods or pools
+        """
+        while True:
+            time.sleep(min(WARM_POOL_IDLE, 60))
+            try:
+                pods = self._reap()
+            except Exception as e:
+                logger.error('Failed to reap warm pods: %s' % e)
+                pods = -1
+            with self.lock:
+                if not pods and not self.pools:
+                    self.reaping = False
+                    return
+
+    def _reap(self):
+        """
+        Delete the idle pods created more than WARM_POOL_IDLE ago and forget
+        the pools unused for as long. Pools still in use get refilled.
+
+        :return: number of idle pods found
+        """
+        core_api = self.offloader.core_api
+        namespace = self.offloader.kube_namespace
+        with self.lock:
+            for key in [k for k in self.pools if not self._inUse(k)]:
+                sys.stdout.write('Warm pool '+key+' unused. Dropping it\n')
+                del self.pools[key]
+                self.used.pop(key, None)
+            pools = dict(self.pools)
+        if self.cache.synced.is_set():
+            pods = self.cache.list()
+        else:
+            pods = core_api.list_namespaced_pod(
+                namespace=namespace, label_selector=WARM_POOL_SELECTOR).items
+        now = datetime.datetime.now(datetime.timezone.utc)
+        idle = [p for p in pods if (p.metadata.labels or {}).get('warm-pool')
+                and not p.metadata.deletion_timestamp]
+        reaped = set()
+        for pod in idle:
+            age = now - pod.metadata.creation_timestamp
+            if age.total_seconds() <= WARM_POOL_IDLE:
+                continue
+            # unlabel first, as claim does, so that it is not claimed while
+            # being deleted
+            patch = [{'op': 'test', 'path': '/metadata/resourceVersion',
+                      'value': pod.metadata.resource_version},
+                     {'op': 'remove', 'path': '/metadata/labels/warm-pool'}]
+            try:
+                core_api.patch_namespaced_pod(name=pod.metadata.name,
+                                              namespace=namespace, body=patch)
+                core_api.delete_namespaced_pod(name=pod.metadata.name,
+                                               namespace=namespace,
+                                               body=client.V1DeleteOptions())
+            except ApiException as e:
+                if e.status in (404, 409, 422):
+                    continue
+                raise
+            sys.stdout.write('Reaped idle warm pod '+pod.metadata.name+'\n')
+            reaped.add(pod.metadata.labels['warm-pool'])
+        for key in reaped:
+            if key in pools:
+                self.refill(pools[key][0], pools[key][1])
+        return len(idle)
+
+    @staticmethod
+    def size(req):
+        return int(req.placement.get('warm-pool-size', WARM_POOL_SIZE))
+
+    @staticmethod
+    def eligible(req):
+        return WarmPool.size(req) > 0 and req.code is None and \
+            req.placement.get('action-antiaffinity', 'false') != 'true' and \
+            req.placement.get('action-security_context', 'false') != 'true'
+
+    @staticmethod
+    def key(req, node_selector):
+        """
+        Pool key. The api key is part of it as it is baked into the pod
+        """
+        h = hashlib.sha1()
+        for part in (req.actionFQN, req.image, req.owAPIHost, req.owb64APIKey,
+                     json.dumps(node_selector, sort_keys=True)):
+            h.update(part.encode())
+        return h.hexdigest()[:16]
+
+    def _pods(self, key):
+        if self.cache.synced.is_set():
+            return self.cache.get('warm-pool', key)
+        return self.offloader.core_api.list_namespaced_pod(
+            namespace=self.offloader.kube_namespace,
+            label_selector='warm-pool='+key).items
+
+    def claim(self, req, node_selector, labels, params, jobId):
+        """
+        Bind a ready warm pod to the request: relabel it with the given
+        labels and push the parameters through its ow-conf sidecar.
+
+        :return: the bound pod name or None if no warm pod available
+        """
+        core_api = self.offloader.core_api
+        namespace = self.offloader.kube_namespace
+        key = self.key(req, node_selector)
+        with self.lock:
+            self.used[key] = time.time()
+        for pod in self._pods(key):
+            if pod.status.phase != 'Running' or pod.metadata.deletion_timestamp \
+                or not pod.status.pod_ip:
+                continue
+            # json patch; the test operation fails it if someone else claimed
+            # the pod meanwhile
+            patch = [{'op': 'test', 'path': '/metadata/resourceVersion',
+                      'value': pod.metadata.resource_version},
+                     {'op': 'remove', 'path': '/metadata/labels/warm-pool'}]
+            if self.offloader.action_timelimit:
+                # counts from the pod start; exclude the time it was idle
+                idle = datetime.datetime.now(datetime.timezone.utc) - \
+                    pod.status.start_time
+                patch.append({'op': 'add',
+                              'path': '/spec/activeDeadlineSeconds',
+                              'value': int(idle.total_seconds()) + 1 +
+                              int(self.offloader.action_timelimit)})
+            for k in labels:
+                patch.append({'op': 'add',
+                              'path': '/metadata/labels/' +
+                              k.replace('~', '~0').replace('/', '~1'),
+                              'value': labels[k]})
+            try:
+                core_api.patch_namespaced_pod(name=pod.metadata.name,
+                                              namespace=namespace, body=patch)
+            except ApiException as e:
+                if e.status in (409, 422):
+                    continue
+                raise
+            try:
+                url = 'http://%s:%s/conf/' % (pod.status.pod_ip, CONF_SERVICE_PORT)
+                for name, value in ((WARM_PARAMS_FILE, json.dumps(params)),
+                                    (WARM_ACTIVATION_FILE, req.activationId),
+                                    (WARM_START_FILE, jobId)):
+                    r = requests.post(url+name, json={'value': value},
+                                      headers={'Content-Type' : 'application/json'})
+                    r.raise_for_status()
+            except Exception as e:
+                logger.error('Failed to start warm pod %s: %s' %
+                             (pod.metadata.name, e))
+                core_api.delete_namespaced_pod(name=pod.metadata.name,
+                                               namespace=namespace,
+                                               body=client.V1DeleteOptions())
+                continue
+            logger.debug('Bound warm pod %s to jobId %s' %
+                         (pod.metadata.name, jobId))
+            return pod.metadata.name
+        return None
+
+    def refill(self, req, node_selector, delay=0):
+        """
+        Top up the pool of the given request in the background
+        """
+        key = self.key(req, node_selector)
+        self._startCache()
+        self._startReaper()
+        with self.lock:
+            self.pools[key] = (req, node_selector)
+            if key in self.refilling:
+                return
+            self.refilling.add(key)
+
+        def _work():
+            try:
+                time.sleep(delay)
+                self._refill(req, node_selector, key)
+            except Exception as e:
+                logger.error('Failed to refill warm pool %s: %s' % (key, e))
+            finally:
+                with self.lock:
+                    self.refilling.discard(key)
+
+        self.executor.submit(_work)
+
+    def _refill(self, req, node_selector, key):
+        core_api = self.offloader.core_api
+        namespace = self.offloader.kube_namespace
+        labels = {
+            'job-type': 'ow-offload-warm',
+            'warm-pool': key
+        }
+        # label pod with these selectors just like offloaded ones
+        for k in node_selector:
+            labels.update({'FAAS_%s' %k : node_selector[k]})
+        secretName = 'offload-warm-'+key
+        apiKeySecret = V1SecretKeySelector(key='ow-api-key', name=secretName)
+        actionEnv = [V1EnvVar(name="__OW_API_HOST", value=req.owAPIHost),
+                     V1EnvVar(name="__OW_API_KEY", value_from=V1EnvVarSource(secret_key_ref=apiKeySecret)),
+                     V1EnvVar(name="__OW_NAMESPACE", value="ow-offload"),
+                     V1EnvVar(name="__OW_ACTION_NAME", value=req.actionFQN)]
+
+        pods = []
+        for p in self._pods(key):
+            if p.metadata.deletion_timestamp:
+                continue
+            if p.status.phase in ('Failed', 'Succeeded'):
+                sys.stdout.write('Deleting warm pod '+p.metadata.name+'\n')
+                core_api.delete_namespaced_pod(name=p.metadata.name,
+                                               namespace=namespace,
+                                               body=client.V1DeleteOptions())
+                continue
+            pods.append(p)
+        for _ in range(self.size(req) - len(pods)):
+            name = 'offload-warm-%s' % str(uuid.uuid4()).replace('-','')
+            pod_spec = _build_pod_spec(
+                node_selector=node_selector, affinity=None,
+                invoker_image=self.offloader.invoker_image,
+                action_image=req.image, actionEnv=actionEnv,
+                command=["/bin/bash", "-c"], args=[WARM_ACTION_SCRIPT],
+                action_timelimit=None,
+                security_context=None,
+                image_pull_policy=req.image_pull_policy)
+            pod = core_api.create_namespaced_pod(
+                namespace=namespace,
+                body=V1Pod(metadata=V1ObjectMeta(name=name, labels=labels),
+                           spec=pod_spec))
+            sys.stdout.write('Created warm pod '+name+'\n')
+            # the pod waits for its secret to show up
+            self._storeSecret(secretName, labels, req.owb64APIKey, pod)
+
+    def _storeSecret(self, name, labels, apiKey, pod):
+        """
+        Store the API key into the pool secret of the given name, owned by
+        the given warm pod. If it already exists, the pod is added to its
+        owners: kubernetes garbage collects the secret along with the last
+        pod of the pool.
+        """
+        core_api = self.offloader.core_api
+        namespace = self.offloader.kube_namespace
+        owner = V1OwnerReference(api_version='v1', kind='Pod',
+                                 name=pod.metadata.name, uid=pod.metadata.uid)
+        secret = V1Secret(metadata=V1ObjectMeta(name=name, labels=labels,
+                                                owner_references=[owner]),
+                          string_data={'ow-api-key' : apiKey })
+        for _ in range(2):
+            try:
+                core_api.create_namespaced_secret(namespace=namespace,
+                                                  body=secret)
+                return
+            except ApiException as e:
+                if e.status != 409:
+                    raise
+            ref = {'apiVersion': owner.api_version, 'kind': owner.kind,
+                   'name': owner.name, 'uid': owner.uid}
+            try:
+                try:
+                    core_api.patch_namespaced_secret(
+                        name=name, namespace=namespace,
+                        body=[{'op': 'add',
+                               'path': '/metadata/ownerReferences/-',
+                               'value': ref}])
+                except ApiException as e:
+                    # no owners yet (created by an earlier version)
+                    if e.status != 422:
+                        raise
+                    core_api.patch_namespaced_secret(
+                        name=name, namespace=namespace,
+                        body=[{'op': 'add',
+                               'path': '/metadata/ownerReferences',
+                               'value': [ref]}])
+                return
+            except ApiException as e:
+                # garbage collected meanwhile; create it again
+                if e.status != 404:
+                    raise
+        raise Exception('Failed to store warm pool secret %s' % name)
+
+
+class ImagePrePuller:
+    """
+    Keeps frequently used action images resident on the nodes labelled with
+    PREPULL_NODE_SELECTOR.
+
+    Every pre-pulled image gets a DaemonSet whose init container pulls the
+    image (and exits right away) and whose only container is a pause one.
+    The kubelet does not garbage collect images of existing pods, so the
+    image stays on the node as long as the DaemonSet exists and actions
+    annotated with 'IfNotPresent' start without a registry round trip.
+    """
+
+    def __init__(self, offloader):
+        self.offloader = offloader
+        self.ext_api = kubernetes.client.ExtensionsV1beta1Api()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+        self.prepulled = set()
+
+    def start(self):
+        for image in PREPULL_IMAGES:
+            self._submit(image)
+
+    @staticmethod
+    def name(image):
+        return 'offload-prepull-' + hashlib.sha1(image.encode()).hexdigest()[:16]
+
+    def used(self, image):
+        """
+        Account an offload of the given image and pre-pull it once it
+        reached PREPULL_THRESHOLD offloads
+        """
+        if PREPULL_THRESHOLD <= 0:
+            return
+        with self.lock:
+            if image in self.prepulled:
+                return
+            self.counts[image] += 1
+            if self.counts[image] < PREPULL_THRESHOLD:
+                return
+        self._submit(image)
+
+    def _submit(self, image):
+        with self.lock:
+            if image in self.prepulled:
+                return
+            self.prepulled.add(image)
+            self.counts.pop(image, None)
+
+        def _work():
+            try:
+                self._ensure(image)
+            except Exception as e:
+                logger.error('Failed to pre-pull image %s: %s' % (image, e))
+                with self.lock:
+                    self.prepulled.discard(image)
+
+        self.executor.submit(_work)
+
+    def _ensure(self, image):
+        name = self.name(image)
+        labels = {
+            'job-type': 'ow-offload-prepull',
+            'prepull': name
+        }
+        object_meta = V1ObjectMeta(name=name, labels=labels)
+        pod_spec = V1PodSpec(
+            init_containers=[
+                V1Container(
+                    image_pull_policy="Always",
+                    image=image,
+                    name='ow-prepull',
+                    command=["/bin/sh", "-c", "true"]
+                )
+            ],
+            containers=[
+                V1Container(
+                    image_pull_policy="IfNotPresent",
+                    image=PREPULL_PAUSE_IMAGE,
+                    name='ow-pause'
+                )
+            ],
+            node_selector=PREPULL_NODE_SELECTOR,
+            termination_grace_period_seconds=1
+        )
+        daemon_set = V1beta1DaemonSet(
+            metadata=object_meta,
+            spec=V1beta1DaemonSetSpec(
+                selector=V1LabelSelector(match_labels=labels),
+                template=V1PodTemplateSpec(spec=pod_spec,
+                                           metadata=object_meta)))
+        try:
+            self.ext_api.create_namespaced_daemon_set(
+                namespace=self.offloader.kube_namespace, body=daemon_set)
+        except ApiException as e:
+            # already exists
+            if e.status != 409:
+                raise
+        sys.stdout.write('Pre-pulling image '+image+' with daemon set '+name+'\n')
+
+
 class Offloader:
     """Offloader."""
 
@@ -416,16 +1212,267 @@ class Offloader:
         self.kube_namespace = os.getenv('OW_OFFLOAD_KUBE_NAMESPACE', 'default')
         self.storage_host = os.getenv('OW_STORAGESERVICE_SERVICE_HOST')
         self.storage_port = os.getenv('OW_STORAGESERVICE_SERVICE_PORT')
+        # content hash -> storage service key of uploaded large values
+        self.stored_values = collections.OrderedDict()
+        self.stored_values_lock = threading.Lock()
+        self.pod_cache = ResourceCache('pod', self.core_api.list_namespaced_pod,
+                                       self.kube_namespace, OFFLOAD_JOB_SELECTOR)
+        self.job_cache = ResourceCache('job', self.batch_api.list_namespaced_job,
+                                       self.kube_namespace, OFFLOAD_JOB_SELECTOR)
+        # services created before they were labeled with job-type carry
+        # the flowId label only
+        self.service_cache = ResourceCache('service',
+                                           self.core_api.list_namespaced_service,
+                                           self.kube_namespace, 'flowId')
+        if WATCH_CACHE:
+            for cache in (self.pod_cache, self.job_cache, self.service_cache):
+                cache.start()
+        # delete_executor runs single API calls only; cleanup_executor runs
+        # background cleanups that fan out on the delete_executor
+        self.delete_executor = ThreadPoolExecutor(max_workers=CLEANUP_WORKERS)
+        self.cleanup_executor = ThreadPoolExecutor(max_workers=CLEANUP_WORKERS)
+        self.cleanups = collections.OrderedDict()
+        self.cleanups_lock = threading.Lock()
+        self.offload_executor = ThreadPoolExecutor(max_workers=OFFLOAD_WORKERS)
+        # flowId -> status of asynchronous offloads, until their POD shows up
+        self.offloads = collections.OrderedDict()
+        self.offloads_lock = threading.Lock()
+        self.pending_offloads = 0
+        # flowIds of pending asynchronous offloads deleted before their
+        # creation completed
+        self.cancelled_offloads = set()
+        self.warm_pool = WarmPool(self)
+        self.warm_pool.start()
+        self.prepuller = ImagePrePuller(self)
+        self.prepuller.start()
         sys.stdout.write('OpenWhisk offload server initialized\n')
 
+    def _listPods(self, label_name, label_value):
+        """
+        List offload pods labeled with label_name=label_value. Served from
+        the local cache once synced, from the kubernetes API otherwise.
+        """
+        if self.pod_cache.synced.is_set():
+            return self.pod_cache.get(label_name, label_value)
+        return self.core_api.list_namespaced_pod(
+            namespace=self.kube_namespace,
+            label_selector=label_name+'='+label_value).items
+
+    def _listJobs(self, label_name, label_value):
+        """
+        List offload jobs labeled with label_name=label_value
+        """
+        if self.job_cache.synced.is_set():
+            return self.job_cache.get(label_name, label_value)
+        return self.batch_api.list_namespaced_job(
+            namespace=self.kube_namespace,
+            label_selector=label_name+'='+label_value).items
+
+    def _listServices(self, flowId):
+        """
+        List services of the given flowId
+        """
+        if self.service_cache.synced.is_set():
+            return self.service_cache.get('flowId', flowId)
+        return self.core_api.list_namespaced_service(
+            namespace=self.kube_namespace,
+            label_selector='flowId='+flowId).items
+
     # store a large parameter to the storage service for later retrieval by the job
+    # values are content addressed: an identical value is uploaded only once
+    # @return tuple of storage key and content hash (sha256) of the value
     def storeValue(self, value):
+        """
+        Upload the given value to the storage service, unless a value of
+        the same content hash was uploaded already. The storage service may
+        lose it meanwhile: invokers then report it missing and forgetValue
+        gets it uploaded again next time.
+
+        :return: (storage key, content hash)
+        """
+        digest = hashlib.sha256(value.encode()).hexdigest()
+        with self.stored_values_lock:
+            key = self.stored_values.get(digest)
+            if key:
+                self.stored_values.move_to_end(digest)
+                return key, digest
         r = requests.post('http://'+self.storage_host+':'+self.storage_port+'/storeValue',
                           json = {'value' : value},
                           headers = {'Content-Type' : 'application/json'})
         r.raise_for_status()
-        return r.json()['key']
+        key = r.json()['key']
+        with self.stored_values_lock:
+            self.stored_values[digest] = key
+            while len(self.stored_values) > MAX_STORED_VALUES:
+                self.stored_values.popitem(last=False)
+        return key, digest
+
+    def forgetValue(self, digest):
+        """
+        Forget the upload of the given content hash, reported missing from
+        the storage service by an invoker
+        """
+        with self.stored_values_lock:
+            if self.stored_values.pop(digest, None):
+                sys.stdout.write('Stored value '+digest+' reported missing\n')
+
+    def _valueEnv(self, name, value):
+        """
+        Invoker env vars passing the given (json encoded) value: inline as
+        OW_OFFLOAD_<name> or, when too large, as a storage service key
+        (OW_OFFLOAD_<name>_FILE) along with its content hash
+        (OW_OFFLOAD_<name>_HASH) for the invoker node cache
+        """
+        if len(value) > MAX_LEN_ENVVAR and not self.storage_host is None:
+            key, digest = self.storeValue(value)
+            return [V1EnvVar(name="OW_OFFLOAD_%s_FILE" % name, value=key),
+                    V1EnvVar(name="OW_OFFLOAD_%s_HASH" % name, value=digest)]
+        return [V1EnvVar(name="OW_OFFLOAD_%s" % name, value=value)]
 
+    def _invokerValues(self, req, invokerEnv):
+        """
+        Add the action code and parameters to the invoker env. With 'volume'
+        value delivery, they are referenced as files of the values volume
+        instead, unless they exceed MAX_VALUES_SIZE.
+
+        :return: values ConfigMap data (file name -> content) or None
+        """
+        if VALUE_DELIVERY == 'volume':
+            values = {'args': json.dumps(req.params)}
+            if not req.code is None:
+                values['code'] = json.dumps(req.code)
+            size = sum(len(k) + len(v.encode()) for k, v in values.items())
+            if size <= MAX_VALUES_SIZE:
+                for k in values:
+                    invokerEnv.append(V1EnvVar(
+                        name="OW_OFFLOAD_%s_PATH" % k.upper(),
+                        value=VALUES_MOUNT_PATH+'/'+k))
+                if not req.code is None:
+                    invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_BINARY_CODE", value=json.dumps(req.binary)))
+                return values
+            sys.stdout.write('Values of %d bytes exceed the ConfigMap limit; '
+                             'passing them through env\n' % size)
+        invokerEnv.extend(self._valueEnv('ARGS', json.dumps(req.params)))
+        if not req.code is None:
+            invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_BINARY_CODE", value=json.dumps(req.binary)))
+            invokerEnv.extend(self._valueEnv('CODE', json.dumps(req.code)))
+        return None
+
+    @staticmethod
+    def _valuesName(values):
+        h = hashlib.sha256()
+        for k in sorted(values):
+            h.update(k.encode())
+            h.update(b'\0')
+            h.update(values[k].encode())
+            h.update(b'\0')
+        return 'offload-values-' + h.hexdigest()[:32]
+
+    def _storeValues(self, name, values, job):
+        """
+        Store values into the ConfigMap of the given (content hash) name,
+        owned by the given job. If it already exists (same values offloaded
+        by other jobs), the job is added to its owners: kubernetes garbage
+        collects the ConfigMap along with the last of its jobs.
+        """
+        owner = V1OwnerReference(api_version='batch/v1', kind='Job',
+                                 name=job.metadata.name, uid=job.metadata.uid)
+        config_map = V1ConfigMap(
+            metadata=V1ObjectMeta(name=name,
+                                  labels={'job-type': 'ow-offload-values'},
+                                  owner_references=[owner]),
+            data=values)
+        for _ in range(2):
+            try:
+                self.core_api.create_namespaced_config_map(
+                    namespace=self.kube_namespace, body=config_map)
+                return
+            except ApiException as e:
+                if e.status != 409:
+                    raise
+            try:
+                self.core_api.patch_namespaced_config_map(
+                    name=name, namespace=self.kube_namespace,
+                    body=[{'op': 'add', 'path': '/metadata/ownerReferences/-',
+                           'value': {'apiVersion': owner.api_version,
+                                     'kind': owner.kind,
+                                     'name': owner.name,
+                                     'uid': owner.uid}}])
+                return
+            except ApiException as e:
+                # garbage collected meanwhile; create it again
+                if e.status != 404:
+                    raise
+        raise Exception('Failed to store values into ConfigMap %s' % name)
+
+    def _sweepValues(self):
+        """
+        Delete the values ConfigMaps left without owner: jobs deleted with
+        the orphan propagation policy get removed from the owners of their
+        dependents instead of having them deleted.
+        """
+        for config_map in self.core_api.list_namespaced_config_map(
+            namespace=self.kube_namespace,
+            label_selector='job-type=ow-offload-values').items:
+            if not config_map.metadata.owner_references:
+                sys.stdout.write('Deleting values '+config_map.metadata.name+'\n')
+                self.core_api.delete_namespaced_config_map(
+                    name=config_map.metadata.name,
+                    namespace=self.kube_namespace,
+                    body=client.V1DeleteOptions())
+
+
+    def _createService(self, req, jobId, flowId):
+        """
+        Expose the requested service ports of the action under flowId.
+
+        :return: service dictionary (empty if no service requested)
+        """
+        service_dict = {}
+        if req.service_type and req.service_ports:
+            logger.debug('Creating %s service for action jobId: %s using '
+                         'flowId: %s as a selector' %
+                         (req.service_type, jobId, flowId))
+            sys.stdout.write('Creating %s service for action jobId: %s using '
+                         'flowId: %s as a selector' %
+                         (req.service_type, jobId, flowId))
+
+            service_object_meta = V1ObjectMeta(
+                name='offload-invoker-%s' % flowId,
+                labels={'flowId': flowId, 'job-type': 'ow-offload-job'})
+            # Wrap every port as a service
+            ports = []
+            for index, p in enumerate(req.service_ports):
+                if PORT_UDP_REGEX.match(str(p)):
+                    # udp port
+                    port = PORT_UDP_REGEX.match(p).group(1)
+                    protocol = 'UDP'
+                else:
+                    # default TCP
+                    port = p
+                    protocol = 'TCP'
+                ports.append(V1ServicePort(name='http-api-%d' % index,
+                                           port=int(port), protocol=protocol))
+
+            service_spec = V1ServiceSpec(
+                ports=ports,
+                type=req.service_type,
+                selector={'flowId': flowId})
+
+            service = self.core_api.create_namespaced_service(
+                namespace=self.kube_namespace,
+                body=V1Service(metadata=service_object_meta,
+                               spec=service_spec))
+            logger.debug('Successfully created %(service_type)s service '
+                            '%(service)s for job: %(jobId)s'
+                %
+                {
+                    'jobId': jobId,
+                    'service': service,
+                    'service_type': req.service_type
+                })
+            service_dict = _from_service(service)
+        return service_dict
 
     # execute an offloaded whisk action
     # @param req OffloadRequest instance containing details needed to run the offload action
@@ -433,159 +1480,217 @@ class Offloader:
         try:
             jobId = str(uuid.uuid4()).replace('-','')
             flowId = str(uuid.uuid4()).replace('-','')
-            node_selector = req.placement.get('invoker-selector', {})
-            labels = {
-                'flowId': flowId,
-                'jobId': jobId,
-                'job-type': 'ow-offload-job'
-            }
-            object_meta = V1ObjectMeta(name='offload-invoker-'+jobId,
-                                       labels=labels)
-            try:
-                parts = req.actionFQN.split('/')[1:]
-                l = {"ow_action": '_'.join(parts)}
-                labels.update(l)
-                l = {"vim_id": req.activationId}
-                labels.update(l)
-                l = {"ro_vim_vm_name": req.ro_vim_vm_name}
-                labels.update(l)
-                l = {"event_uuid": req.event_uuid}
-                labels.update(l)
-            except:
-                pass
-            # label pod with these selectors, prefix them so that
-            # we know how to retrieve them for anti-afinity
-            for k in node_selector:
-                labels.update({'FAAS_%s' %k : node_selector[k]})
-            # Put owb64APIKey into a secret
-            secret = V1Secret(metadata=object_meta, string_data={'ow-api-key' : req.owb64APIKey })
-            logger.debug('About to create the secret..')
-            self.core_api.create_namespaced_secret(namespace=self.kube_namespace, body=secret)
-            logger.debug('Done creating a secret')
-            apiKeySecret = V1SecretKeySelector(key='ow-api-key', name=object_meta.name)
-
-            # build environment for invoker container
-            invokerEnv = [V1EnvVar(name="OW_OFFLOAD_FLOW_ID", value=flowId),
-                        V1EnvVar(name="OW_OFFLOAD_ACTIVATION_ID", value=req.activationId),
-                        V1EnvVar(name="OW_OFFLOAD_OW_API_HOST", value=req.owAPIHost),
-                        V1EnvVar(name="OW_OFFLOAD_ENDPOINTS", value=json.dumps(req.endpoints)),
-                        V1EnvVar(name="OW_OFFLOAD_OW_API_KEY", value_from=V1EnvVarSource(secret_key_ref=apiKeySecret))]
-            paramStr = json.dumps(req.params)
-            if len(paramStr) > MAX_LEN_ENVVAR and not self.storage_host is None:
-                key = self.storeValue(paramStr)
-                invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_ARGS_FILE", value=key))
-            else:
-                invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_ARGS", value=paramStr))
-            if not req.code is None:
-                invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_BINARY_CODE", value=json.dumps(req.binary)))
-                codeStr = json.dumps(req.code)
-                if len(codeStr) > MAX_LEN_ENVVAR and not self.storage_host is None:
-                    key = self.storeValue(codeStr)
-                    invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_CODE_FILE", value=key))
-                else:
-                    invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_CODE", value=codeStr))
-            if not req.entry is None:
-                invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_MAIN", value=json.dumps(req.entry)))
-
-            # build environment for action container
-            actionEnv = [V1EnvVar(name="__OW_API_HOST", value=req.owAPIHost),
-                         V1EnvVar(name="__OW_API_KEY", value_from=V1EnvVarSource(secret_key_ref=apiKeySecret)),
-                         V1EnvVar(name="__OW_NAMESPACE", value="ow-offload"),
-                         V1EnvVar(name="__OW_ACTION_NAME", value=req.actionFQN),
-                         V1EnvVar(name="__OW_ACTIVATION_ID", value=jobId),
-                         V1EnvVar(name="__OW_OFFLOADING_ACTIVATION_ID", value=req.activationId)]
-
-            affinity = None
-            security_context = None
-            if req.placement.get('action-antiaffinity', 'false') == 'true':
-                # take the first one
-                k = find(labels, lambda k: k.startswith('FAAS')==True)
-                print ('*** k for find labels :%s' % k)
-                # if no placement related label then use the action name one
-                l = {k: labels[k]} if k else dict(ow_action=labels['ow_action'])
-                affinity = V1Affinity(pod_anti_affinity=_build_pod_antiaffinity(l))
-            if req.placement.get('action-security_context', 'false') == 'true':
-                security_context = V1SecurityContext(capabilities=V1Capabilities(add=['NET_ADMIN']))
-
-            #node_selector = {}
-            #for k in req.placement.get('invoker-selector', {}):
-            #    node_selector[k] = req.placement['invoker-selector'][k]
-            v1Job = _build_job(namespace=self.kube_namespace,
-                object_meta=object_meta, node_selector=node_selector,
-                affinity=affinity, invoker_image=self.invoker_image,
-                action_image=req.image, invokerEnv=invokerEnv, actionEnv=actionEnv,
-                params=req.params, action_timelimit=self.action_timelimit,
-                security_context=security_context)
+            return self._createAction(req, flowId, jobId)
+        except Exception as e:
+            print(e)
+            self._notifyError(req, e)
 
-            self.batch_api.create_namespaced_job(
-                namespace=self.kube_namespace, body=v1Job)
+    def submitAction(self, req):
+        """
+        Asynchronous version of executeAction: allocate flowId and jobId and
+        create the kubernetes objects in the background, with at most
+        OFFLOAD_WORKERS offloads in progress.
 
-            sys.stdout.write('Created job '+jobId+'\n')
-
-            #controller_uid = job.spec.selector.match_labels.get('controller-uid')
-
-            service_dict = {}
-            if req.service_type and req.service_ports:
-                logger.debug('Creating %s service for action jobId: %s using '
-                             'flowId: %s as a selector' %
-                             (req.service_type, jobId, flowId))
-                sys.stdout.write('Creating %s service for action jobId: %s using '
-                             'flowId: %s as a selector' %
-                             (req.service_type, jobId, flowId))
-
-                service_object_meta = V1ObjectMeta(
-                    name='offload-invoker-%s' % flowId,
-                    labels={'flowId': flowId})
-                # Wrap every port as a service
-                ports = []
-                for index, p in enumerate(req.service_ports):
-                    if PORT_UDP_REGEX.match(str(p)):
-                        # udp port
-                        port = PORT_UDP_REGEX.match(p).group(1)
-                        protocol = 'UDP'
-                    else:
-                        # default TCP
-                        port = p
-                        protocol = 'TCP'
-                    ports.append(V1ServicePort(name='http-api-%d' % index,
-                                               port=int(port), protocol=protocol))
-
-                service_spec = V1ServiceSpec(
-                    ports=ports,
-                    type=req.service_type,
-                    selector={'flowId': flowId})
-
-                service = self.core_api.create_namespaced_service(
-                    namespace=self.kube_namespace,
-                    body=V1Service(metadata=service_object_meta,
-                                   spec=service_spec))
-                logger.debug('Successfully created %(service_type)s service '
-                                '%(service)s for job: %(jobId)s'
-                    %
-                    {
-                        'jobId': jobId,
-                        'service': service,
-                        'service_type': req.service_type
-                    })
-                service_dict = _from_service(service)
+        Until its POD exists, getPod reports the offload as Pending (or
+        raises its creation error).
 
-            return {
-                'flowId': flowId,
-                'jobId': jobId,
-                'service': service_dict,
-            }
+        :return: dictionary with flowId and jobId
+        """
+        jobId = str(uuid.uuid4()).replace('-','')
+        flowId = str(uuid.uuid4()).replace('-','')
+        with self.offloads_lock:
+            if self.pending_offloads >= MAX_PENDING_OFFLOADS:
+                flask.abort(503, 'Too many pending offloads')
+            self.pending_offloads += 1
+            while len(self.offloads) >= MAX_OFFLOAD_HANDLES:
+                self.offloads.popitem(last=False)
+            self.offloads[flowId] = {'status': 'pending',
+                                     'vim-id': req.activationId}
+
+        def _work():
+            with self.offloads_lock:
+                cancelled = flowId in self.cancelled_offloads
+            status = None
+            if not cancelled:
+                try:
+                    self._createAction(req, flowId, jobId)
+                    status = {'status': 'created', 'vim-id': req.activationId}
+                except Exception as e:
+                    logger.error('Offload of flowId %s failed: %s' % (flowId, e))
+                    status = {'status': 'failed', 'error': str(e)}
+                    self._notifyError(req, e)
+            with self.offloads_lock:
+                self.pending_offloads -= 1
+                cancelled = flowId in self.cancelled_offloads
+                self.cancelled_offloads.discard(flowId)
+                if not cancelled and flowId in self.offloads:
+                    self.offloads[flowId] = status
+            if cancelled and status is not None:
+                # deleted while being created: delete what got created
+                sys.stdout.write('Offload of flowId '+flowId+' deleted while '
+                                 'created. Deleting its resources\n')
+                try:
+                    self._deleteResources('flowId', [flowId])
+                except Exception as e:
+                    logger.error('Deleting resources of flowId %s failed: %s'
+                                 % (flowId, e))
+
+        self.offload_executor.submit(_work)
+        sys.stdout.write('Queued job '+jobId+'\n')
+        return {
+            'flowId': flowId,
+            'jobId': jobId,
+            'service': {}
+        }
+
+    def _pendingRecord(self, flowId):
+        """
+        getPod record of an asynchronous offload whose POD does not exist
+        (yet). Raises if its creation failed.
 
+        :return: record or None if flowId is not a known asynchronous offload
+        """
+        with self.offloads_lock:
+            status = self.offloads.get(flowId)
+        if status is None:
+            return None
+        if status['status'] == 'failed':
+            raise Exception('Offload failed [flowId: %s]: %s' %
+                            (flowId, status['error']))
+        return {
+            'action': '',
+            'flowId': flowId,
+            'vim-id': status['vim-id'],
+            'pod_ip' : None,
+            'host_ip': None,
+            'phase' : 'Pending',
+            'service': {}
+        }
+
+    def _notifyError(self, req, e):
+        """
+        Report an offload failure to the completion endpoints of the request
+        """
+        try:
+            headers = {'Content-Type' : 'application/json',
+                       'Authorization' : 'Basic %s' % req.owb64APIKey }
+            for endpoint in req.endpoints:
+                requests.post(req.owAPIHost+'/api/v1/namespaces'+endpoint,
+                              json={'error': str(e)}, headers=headers,
+                              verify=False)
         except Exception as e:
             print(e)
-            try:
-                headers = {'Content-Type' : 'application/json',
-                           'Authorization' : 'Basic %s' % req.owb64APIKey }
-                for endpoint in req.endpoints:
-                    requests.post(req.owAPIHost+'/api/v1/namespaces'+endpoint,
-                                  json={'error': str(e)}, headers=headers,
-                                  verify=False)
-            except Exception as e:
-                print(e)
+
+    def _createAction(self, req, flowId, jobId):
+        """
+        Create the kubernetes objects (secret, job, service) of an offloaded
+        action under the given flowId and jobId
+        """
+        self.prepuller.used(req.image)
+        node_selector = req.placement.get('invoker-selector', {})
+        labels = {
+            'flowId': flowId,
+            'jobId': jobId,
+            'job-type': 'ow-offload-job'
+        }
+        object_meta = V1ObjectMeta(name='offload-invoker-'+jobId,
+                                   labels=labels)
+        try:
+            parts = req.actionFQN.split('/')[1:]
+            l = {"ow_action": '_'.join(parts)}
+            labels.update(l)
+            l = {"vim_id": req.activationId}
+            labels.update(l)
+            l = {"ro_vim_vm_name": req.ro_vim_vm_name}
+            labels.update(l)
+            l = {"event_uuid": req.event_uuid}
+            labels.update(l)
+        except:
+            pass
+        # label pod with these selectors, prefix them so that
+        # we know how to retrieve them for anti-afinity
+        for k in node_selector:
+            labels.update({'FAAS_%s' %k : node_selector[k]})
+        if WarmPool.eligible(req):
+            pod_name = self.warm_pool.claim(req, node_selector, labels,
+                                            req.params, jobId)
+            self.warm_pool.refill(req, node_selector)
+            if pod_name:
+                sys.stdout.write('Bound warm pod '+pod_name+' to job '+jobId+'\n')
+                return {
+                    'flowId': flowId,
+                    'jobId': jobId,
+                    'service': self._createService(req, jobId, flowId),
+                }
+        # Put owb64APIKey into a secret
+        secret = V1Secret(metadata=object_meta, string_data={'ow-api-key' : req.owb64APIKey })
+        logger.debug('About to create the secret..')
+        self.core_api.create_namespaced_secret(namespace=self.kube_namespace, body=secret)
+        logger.debug('Done creating a secret')
+        apiKeySecret = V1SecretKeySelector(key='ow-api-key', name=object_meta.name)
+
+        # build environment for invoker container
+        invokerEnv = [V1EnvVar(name="OW_OFFLOAD_FLOW_ID", value=flowId),
+                    V1EnvVar(name="OW_OFFLOAD_ACTIVATION_ID", value=req.activationId),
+                    V1EnvVar(name="OW_OFFLOAD_OW_API_HOST", value=req.owAPIHost),
+                    V1EnvVar(name="OW_OFFLOAD_ENDPOINTS", value=json.dumps(req.endpoints)),
+                    V1EnvVar(name="OW_OFFLOAD_OW_API_KEY", value_from=V1EnvVarSource(secret_key_ref=apiKeySecret))]
+        values = self._invokerValues(req, invokerEnv)
+        values_name = self._valuesName(values) if values else None
+        if not req.entry is None:
+            invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_MAIN", value=json.dumps(req.entry)))
+
+        # build environment for action container
+        actionEnv = [V1EnvVar(name="__OW_API_HOST", value=req.owAPIHost),
+                     V1EnvVar(name="__OW_API_KEY", value_from=V1EnvVarSource(secret_key_ref=apiKeySecret)),
+                     V1EnvVar(name="__OW_NAMESPACE", value="ow-offload"),
+                     V1EnvVar(name="__OW_ACTION_NAME", value=req.actionFQN),
+                     V1EnvVar(name="__OW_ACTIVATION_ID", value=jobId),
+                     V1EnvVar(name="__OW_OFFLOADING_ACTIVATION_ID", value=req.activationId)]
+        if LOCAL_LOGS:
+            actionEnv.append(V1EnvVar(name="OW_ACTION_LOG_FILE", value=ACTION_LOG_FILE))
+            invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_ACTION_LOG_FILE", value=ACTION_LOG_FILE))
+
+        affinity = None
+        security_context = None
+        if req.placement.get('action-antiaffinity', 'false') == 'true':
+            # take the first one
+            k = find(labels, lambda k: k.startswith('FAAS')==True)
+            print ('*** k for find labels :%s' % k)
+            # if no placement related label then use the action name one
+            l = {k: labels[k]} if k else dict(ow_action=labels['ow_action'])
+            affinity = V1Affinity(pod_anti_affinity=_build_pod_antiaffinity(l))
+        if req.placement.get('action-security_context', 'false') == 'true':
+            security_context = V1SecurityContext(capabilities=V1Capabilities(add=['NET_ADMIN']))
+
+        #node_selector = {}
+        #for k in req.placement.get('invoker-selector', {}):
+        #    node_selector[k] = req.placement['invoker-selector'][k]
+        v1Job = _build_job(namespace=self.kube_namespace,
+            object_meta=object_meta, node_selector=node_selector,
+            affinity=affinity, invoker_image=self.invoker_image,
+            action_image=req.image, invokerEnv=invokerEnv, actionEnv=actionEnv,
+            params=req.params, action_timelimit=self.action_timelimit,
+            security_context=security_context,
+            image_pull_policy=req.image_pull_policy,
+            values_config_map=values_name)
+
+        job = self.batch_api.create_namespaced_job(
+            namespace=self.kube_namespace, body=v1Job)
+        if values:
+            self._storeValues(values_name, values, job)
+
+        sys.stdout.write('Created job '+jobId+'\n')
+
+        #controller_uid = job.spec.selector.match_labels.get('controller-uid')
+
+        service_dict = self._createService(req, jobId, flowId)
+
+        return {
+            'flowId': flowId,
+            'jobId': jobId,
+            'service': service_dict,
+        }
 
     def reconfigureAction(self, req):
         """
@@ -613,47 +1718,64 @@ class Offloader:
 
             Return the running jobId, fail otherwise
             """
-            podList = self.core_api.list_namespaced_pod(
-                namespace=self.kube_namespace, label_selector='flowId='+flowId)
-            if podList and len(podList.items) == 1:
-                for i in podList.items:
-                    pod = self.core_api.read_namespaced_pod(
-                        namespace=self.kube_namespace,name=i.metadata.name)
+            pods = self._listPods('flowId', flowId)
+            if len(pods) == 1:
+                for pod in pods:
                     if pod.status.phase != 'Running':
                         raise Exception('Failed sanity check: '
                                         'POD under flowId %s in other state %s'
                                         % (flowId, pod.status.phase))
                     else:
-                        return i.metadata.labels['jobId']
+                        return pod.metadata.labels['jobId']
             else:
                 raise Exception('No POD or found more then one under flowId %s'
                                 % flowId)
 
         def _wait_until_running(jobId):
             """
-            Wait until POD under jobId is in running state
+            Wait until POD under jobId is in running state.
+
+            Driven by pod watch events, returns as soon as the POD is running
+            and fails as soon as it has failed or RECONFIGURE_TIMEOUT elapsed
             """
-            initAttempts = 0
-            while True:
-                podList = self.core_api.list_namespaced_pod(
-                    namespace=self.kube_namespace,
-                    label_selector='jobId='+jobId)
-                if podList:
-                    for i in podList.items:
-                        pod = self.core_api.read_namespaced_pod(
-                            namespace=self.kube_namespace,
-                            name=i.metadata.name)
-                        logger.info ('phase %s' % pod.status.phase)
-                        if pod.status.phase != 'Running':
-                            initAttempts += 1
-                            if initAttempts > 10:
-                                raise Exception('Timeout in POD readiness')
-                            sys.stdout.write(
-                                'POD not ready; waiting %d seconds and '
-                                'retrying\n' % initAttempts)
-                            time.sleep(initAttempts)
-                        else:
-                            return
+            done = threading.Event()
+            state = {}
+
+            def _on_pod(event_type, pod):
+                if (pod.metadata.labels or {}).get('jobId') != jobId or \
+                    event_type == 'DELETED':
+                    return
+                phase = pod.status.phase
+                logger.info ('phase %s' % phase)
+                if phase in ('Running', 'Failed', 'Succeeded'):
+                    state['phase'] = phase
+                    done.set()
+
+            if self.pod_cache.synced.is_set():
+                # subscribe before looking at the cache so no event is lost
+                self.pod_cache.subscribe(_on_pod)
+                try:
+                    for pod in self.pod_cache.get('jobId', jobId):
+                        _on_pod('ADDED', pod)
+                    done.wait(RECONFIGURE_TIMEOUT)
+                finally:
+                    self.pod_cache.unsubscribe(_on_pod)
+            else:
+                w = watch.Watch()
+                for event in w.stream(self.core_api.list_namespaced_pod,
+                                      namespace=self.kube_namespace,
+                                      label_selector='jobId='+jobId,
+                                      timeout_seconds=RECONFIGURE_TIMEOUT):
+                    _on_pod(event['type'], event['object'])
+                    if done.is_set():
+                        w.stop()
+                        break
+
+            if not done.is_set():
+                raise Exception('Timeout in POD readiness')
+            if state['phase'] != 'Running':
+                raise Exception('POD under jobId %s in %s phase' %
+                                (jobId, state['phase']))
 
         try:
             old_jobId = _sanity_check(req.flowId)
@@ -693,20 +1815,8 @@ class Offloader:
                 # endpoits are not relevant
                 V1EnvVar(name="OW_OFFLOAD_ENDPOINTS", value=json.dumps([]))
             ]
-            paramStr = json.dumps(req.params)
-            if len(paramStr) > MAX_LEN_ENVVAR and not self.storage_host is None:
-                key = self.storeValue(paramStr)
-                invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_ARGS_FILE", value=key))
-            else:
-                invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_ARGS", value=paramStr))
-            if not req.code is None:
-                invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_BINARY_CODE", value=json.dumps(req.binary)))
-                codeStr = json.dumps(req.code)
-                if len(codeStr) > MAX_LEN_ENVVAR and not self.storage_host is None:
-                    key = self.storeValue(codeStr)
-                    invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_CODE_FILE", value=key))
-                else:
-                    invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_CODE", value=codeStr))
+            values = self._invokerValues(req, invokerEnv)
+            values_name = self._valuesName(values) if values else None
             if not req.entry is None:
                 invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_MAIN", value=json.dumps(req.entry)))
 
@@ -716,6 +1826,9 @@ class Offloader:
                          V1EnvVar(name="__OW_ACTION_NAME", value=req.actionFQN),
                          V1EnvVar(name="__OW_ACTIVATION_ID", value=jobId),
                          V1EnvVar(name="__OW_OFFLOADING_ACTIVATION_ID", value=req.activationId)]
+            if LOCAL_LOGS:
+                actionEnv.append(V1EnvVar(name="OW_ACTION_LOG_FILE", value=ACTION_LOG_FILE))
+                invokerEnv.append(V1EnvVar(name="OW_OFFLOAD_ACTION_LOG_FILE", value=ACTION_LOG_FILE))
 
             affinity = None
             if req.placement.get('action-antiaffinity', 'false') == 'true':
@@ -727,10 +1840,14 @@ class Offloader:
                 affinity=affinity, invoker_image=self.invoker_image,
                 action_image=req.image, invokerEnv=invokerEnv, actionEnv=actionEnv,
                 params=req.params, action_timelimit=self.action_timelimit,
-                security_context=None)
+                security_context=None,
+                image_pull_policy=req.image_pull_policy,
+                values_config_map=values_name)
 
-            self.batch_api.create_namespaced_job(
+            job = self.batch_api.create_namespaced_job(
                 namespace=self.kube_namespace, body=v1Job)
+            if values:
+                self._storeValues(values_name, values, job)
             def _asynch_work():
                 try:
                     _wait_until_running(jobId)
@@ -751,11 +1868,9 @@ class Offloader:
     # @param jobId key to identify job to get logs from
     def getLogs(self, jobId):
         sys.stdout.write('Requesting logs for job '+jobId+'\n')
-        podList = self.core_api.list_namespaced_pod(namespace=self.kube_namespace,
-                                                    label_selector='jobId='+jobId)
         actionLogs = ''
         invokerLogs = ''
-        for pod in podList.items:
+        for pod in self._listPods('jobId', jobId):
             actionLogs += self.core_api.read_namespaced_pod_log(namespace=self.kube_namespace,
                                                                 name=pod.metadata.name,
                                                                 container='ow-action',
@@ -774,14 +1889,11 @@ class Offloader:
         logger.debug('Requesting pod for ro_vim_vm_name '+ro_vim_vm_name+'\n')
         service_dict = {}
 
-        podList = self.core_api.list_namespaced_pod(
-            namespace=self.kube_namespace, label_selector='ro_vim_vm_name='+ro_vim_vm_name)
-        # logger.debug('getPod: podList: %s' % podList)
-        if podList and len(podList.items) > 0:
+        pods = self._listPods('ro_vim_vm_name', ro_vim_vm_name)
+        # logger.debug('getPod: pods: %s' % pods)
+        if len(pods) > 0:
             records = []
-            for i in podList.items:
-                pod = self.core_api.read_namespaced_pod(
-                    namespace=self.kube_namespace, name=i.metadata.name)
+            for pod in pods:
                 flowId = pod.metadata.labels['flowId']
                 vim_id = pod.metadata.labels['vim_id']
                 sys.stdout.write('flowId: '+flowId+'\n')
@@ -789,9 +1901,7 @@ class Offloader:
 #                 if terminated:
 #                     raise Exception('POD action container terminated [flowId: %s]' % flowId)
     
-                serviceList = self.core_api.list_namespaced_service(
-                    namespace=self.kube_namespace, label_selector='flowId='+flowId)
-                for service in serviceList.items:
+                for service in self._listServices(flowId):
                     service_dict = _from_service(service)
                     break
     
@@ -816,28 +1926,21 @@ class Offloader:
         logger.debug('Requesting pod for flow '+flowId+'\n')
         service_dict = {}
 
-        serviceList = self.core_api.list_namespaced_service(
-            namespace=self.kube_namespace, label_selector='flowId='+flowId)
-        for service in serviceList.items:
+        for service in self._listServices(flowId):
             service_dict = _from_service(service)
             break
 
-        podList = self.core_api.list_namespaced_pod(
-            namespace=self.kube_namespace, label_selector='flowId='+flowId)
-        # logger.debug('getPod: podList: %s' % podList)
-        if podList and len(podList.items) > 0:
+        pods = self._listPods('flowId', flowId)
+        # logger.debug('getPod: pods: %s' % pods)
+        if len(pods) > 0:
             # return the first in running state or pick up the first
             my_pod = None
-            for i in podList.items:
-                pod = self.core_api.read_namespaced_pod(
-                    namespace=self.kube_namespace, name=i.metadata.name)
+            for pod in pods:
                 if pod.status.phase == 'Running':
                     my_pod = pod
                     break
             if not my_pod:
-                my_pod = self.core_api.read_namespaced_pod(
-                    namespace=self.kube_namespace,
-                    name=podList.items[0].metadata.name)
+                my_pod = pods[0]
             #logger.debug('getPod: pod: %s' % my_pod)
             action, terminated = _action_from_pod(my_pod)
             if terminated:
@@ -854,9 +1957,198 @@ class Offloader:
                 'service': service_dict
             }
         else:
+            record = self._pendingRecord(flowId)
+            if record:
+                return record
             raise Exception('POD not found for flowId: %s' % flowId)
 
 
+    def getPods(self, flowIds, ro_vim_vm_names):
+        """
+        Bulk version of getPod and getPodFromRo.
+
+        Retrieves all offload pods and services with a single list call each
+        and joins them in memory, so that the number of kubernetes API calls
+        does not depend on the number of flowIds/ro_vim_vm_names asked for.
+
+        :param flowIds: flowIds to return getPod records for
+        :type flowIds: ``list``
+
+        :param ro_vim_vm_names: ro_vim_vm_names to return getPodFromRo
+                                records for
+        :type ro_vim_vm_names: ``list``
+
+        :return: dictionary with 'pods' keyed by flowId (record or error)
+                 and 'records' keyed by ro_vim_vm_name
+        """
+        sys.stdout.write('Requesting pods for %d flows and %d ro names\n' %
+                         (len(flowIds), len(ro_vim_vm_names)))
+        if self.pod_cache.synced.is_set():
+            podItems = self.pod_cache.list()
+        else:
+            podItems = self.core_api.list_namespaced_pod(
+                namespace=self.kube_namespace,
+                label_selector=OFFLOAD_JOB_SELECTOR).items
+        if self.service_cache.synced.is_set():
+            serviceItems = self.service_cache.list()
+        else:
+            # services are only labeled with flowId
+            serviceItems = self.core_api.list_namespaced_service(
+                namespace=self.kube_namespace, label_selector='flowId').items
+
+        services = {}
+        for service in serviceItems:
+            services.setdefault(service.metadata.labels['flowId'],
+                                _from_service(service))
+        by_flow = {}
+        by_ro = {}
+        for pod in podItems:
+            labels = pod.metadata.labels or {}
+            by_flow.setdefault(labels.get('flowId'), []).append(pod)
+            by_ro.setdefault(labels.get('ro_vim_vm_name'), []).append(pod)
+
+        pods = {}
+        for flowId in flowIds:
+            flow_pods = by_flow.get(flowId)
+            if not flow_pods:
+                try:
+                    pods[flowId] = self._pendingRecord(flowId) or \
+                        {'error': 'POD not found for flowId: %s' % flowId}
+                except Exception as e:
+                    pods[flowId] = {'error': str(e)}
+                continue
+            # return the first in running state or pick up the first
+            my_pod = find(flow_pods, lambda p: p.status.phase == 'Running') \
+                or flow_pods[0]
+            action, terminated = _action_from_pod(my_pod)
+            if terminated:
+                pods[flowId] = {'error': 'POD action container terminated '
+                                '[flowId: %s]' % flowId}
+                continue
+            pods[flowId] = {
+                'action': action or '',
+                'flowId': flowId,
+                # vim-id: Importatnat to be same name as in VDUr
+                'vim-id': my_pod.metadata.labels['vim_id'],
+                'pod_ip' : my_pod.status.pod_ip,
+                'host_ip': my_pod.status.host_ip,
+                'phase' : my_pod.status.phase,
+                'service': services.get(flowId, {})
+            }
+
+        records = {}
+        for ro_vim_vm_name in ro_vim_vm_names:
+            ro_pods = by_ro.get(ro_vim_vm_name)
+            if not ro_pods:
+                records[ro_vim_vm_name] = {'_exists': 'false'}
+                continue
+            ro_records = []
+            for pod in ro_pods:
+                flowId = pod.metadata.labels['flowId']
+                action, terminated = _action_from_pod(pod)
+                ro_records.append({
+                    'action': action or '',
+                    'event_uuid': pod.metadata.labels['event_uuid'],
+                    'flowId': flowId,
+                    # vim-id: Importatnat to be same name as in VDUr
+                    'vim-id': pod.metadata.labels['vim_id'],
+                    'pod_ip' : pod.status.pod_ip,
+                    'host_ip': pod.status.host_ip,
+                    'phase' : 'Terminated' if terminated else pod.status.phase,
+                    'service': services.get(flowId, {})
+                })
+            records[ro_vim_vm_name] = {'_exists': 'true', 'records': ro_records}
+
+        return {'pods': pods, 'records': records}
+
+
+    def _deleteResources(self, label_name, values, services=True,
+                         secrets=True):
+        """
+        Delete the jobs, pods and optionally the secrets and services of all
+        the given label values.
+
+        A single set-based label selector (e.g. flowId in (a,b)) is used per
+        collection and all the deletes are issued in parallel. Services do
+        not support delete collection, thus are deleted one by one (still in
+        parallel) and only when label_name is flowId.
+        """
+        selector = '%s in (%s)' % (label_name, ','.join(values))
+        sys.stdout.write('** Deleting resources of '+selector+'** \n')
+        if label_name == 'flowId':
+            with self.offloads_lock:
+                for flowId in values:
+                    status = self.offloads.pop(flowId, None)
+                    # still queued or being created: its worker skips or
+                    # deletes the creation
+                    if status is not None and status['status'] == 'pending':
+                        self.cancelled_offloads.add(flowId)
+        calls = [self.batch_api.delete_collection_namespaced_job,
+                 self.core_api.delete_collection_namespaced_pod]
+        if secrets:
+            calls.append(self.core_api.delete_collection_namespaced_secret)
+        futures = [self.delete_executor.submit(
+            c, namespace=self.kube_namespace, label_selector=selector)
+            for c in calls]
+        if services and label_name == 'flowId':
+            for flowId in values:
+                for s in self._listServices(flowId):
+                    sys.stdout.write('Deleting service ' + s.metadata.name +
+                                     ' of ' + flowId +'\n')
+                    futures.append(self.delete_executor.submit(
+                        self.core_api.delete_namespaced_service,
+                        namespace=self.kube_namespace, name=s.metadata.name))
+        if VALUE_DELIVERY == 'volume':
+            # values of jobs deleted by former cleanups; not waited for
+            self.delete_executor.submit(self._sweepValues)
+        # wait for all, then report the first failure if any
+        errors = [f.exception() for f in futures]
+        errors = [e for e in errors if e is not None]
+        if errors:
+            raise errors[0]
+
+    def submitCleanup(self, func, *args):
+        """
+        Run the given cleanup in the background.
+
+        :return: cleanupId handle to query the cleanup status with
+        """
+        cleanupId = str(uuid.uuid4()).replace('-','')
+        with self.cleanups_lock:
+            while len(self.cleanups) >= MAX_CLEANUP_HANDLES:
+                self.cleanups.popitem(last=False)
+            self.cleanups[cleanupId] = {'status': 'running'}
+
+        def _work():
+            try:
+                func(*args)
+                status = {'status': 'completed'}
+            except Exception as e:
+                logger.error('Cleanup %s failed: %s' % (cleanupId, e))
+                status = {'status': 'failed', 'error': str(e)}
+            with self.cleanups_lock:
+                self.cleanups[cleanupId] = status
+
+        self.cleanup_executor.submit(_work)
+        return cleanupId
+
+    def getCleanup(self, cleanupId):
+        with self.cleanups_lock:
+            status = self.cleanups.get(cleanupId)
+        if status is None:
+            raise Exception('Cleanup not found: %s' % cleanupId)
+        return status
+
+    def cleanupJobs(self, flowIds):
+        """
+        Delete all resources of the given flowIds, batching up to
+        CLEANUP_BATCH_SIZE flowIds per label selector.
+        """
+        flowIds = sorted(set(flowIds))
+        for index in range(0, len(flowIds), CLEANUP_BATCH_SIZE):
+            self._deleteResources('flowId',
+                                  flowIds[index:index+CLEANUP_BATCH_SIZE])
+
 #   def cleanupJobFromLabel(self, ro_vim_vm_name):
     def cleanupJobFromLabel(self, label_name, label_value):
         """
@@ -865,34 +2157,12 @@ class Offloader:
         """
         sys.stdout.write('Deleting job(s) "%s" "%s" \n' % (label_name, label_value))
 
-        jobList = self.batch_api.list_namespaced_job(
-            namespace=self.kube_namespace,
-            label_selector=label_name+'='+label_value)
-        for j in jobList.items:
-            flowId = j.metadata.labels['flowId']
-            sys.stdout.write('Deleting job/service with flowId: %s\n' %flowId)
-            serviceList = self.core_api.list_namespaced_service(
-                namespace=self.kube_namespace,
-                label_selector='flowId='+flowId)
-            for s in serviceList.items:
-                sys.stdout.write('** Deleting service ' + s.metadata.name +'** \n')
-                self.core_api.delete_namespaced_service(
-                    namespace=self.kube_namespace, name=s.metadata.name)
-
-            sys.stdout.write('** Deleting jobs of '+flowId+'** \n')
-            self.batch_api.delete_collection_namespaced_job(
-                namespace=self.kube_namespace,
-                label_selector='flowId='+flowId)
-
-            sys.stdout.write('** Deleting pods of '+flowId+'** \n')
-            self.core_api.delete_collection_namespaced_pod(
-                namespace=self.kube_namespace,
-                label_selector='flowId='+flowId)
-
-            sys.stdout.write('** Deleting secrets of '+flowId+'** \n')
-            self.core_api.delete_collection_namespaced_secret(
-                namespace=self.kube_namespace,
-                label_selector='flowId='+flowId)
+        # pods bound from the warm pool have no job
+        flowIds = [o.metadata.labels['flowId']
+                   for o in self._listJobs(label_name, label_value) +
+                   self._listPods(label_name, label_value)]
+        sys.stdout.write('Deleting job/service with flowIds: %s\n' % flowIds)
+        self.cleanupJobs(flowIds)
 
 
     # cleanup resources for a completed job
@@ -916,51 +2186,14 @@ class Offloader:
         if statusString == 'delete' or  \
             statusString == 'completed' \
             or statusString == 'failed':
-
-            selector = 'flowId'
-            serviceList = self.core_api.list_namespaced_service(
-                namespace=self.kube_namespace,
-                label_selector=selector+'='+identifier)
-
-            for s in serviceList.items:
-                sys.stdout.write('Deleting service ' + s.metadata.name +
-                                 ' of ' + identifier +'\n')
-                self.core_api.delete_namespaced_service(
-                    namespace=self.kube_namespace, name=s.metadata.name)
-
-            sys.stdout.write('** Deleting jobs of '+identifier+'** \n')
-            self.batch_api.delete_collection_namespaced_job(
-                namespace=self.kube_namespace,
-                label_selector=selector+'='+identifier)
-
-            sys.stdout.write('** Deleting pods of '+identifier+'** \n')
-
-            self.core_api.delete_collection_namespaced_pod(
-                namespace=self.kube_namespace,
-                label_selector=selector+'='+identifier)
-
-            sys.stdout.write('** Deleting secrets of '+identifier+'** \n')
-
-            self.core_api.delete_collection_namespaced_secret(
-                namespace=self.kube_namespace,
-                label_selector=selector+'='+identifier)
+            self._deleteResources('flowId', [identifier])
 
         elif statusString == 'reconfigure':
             # handle both cases:
             # 1. shadow failed - thus we want to delete it
             # 2. part of reconfigure flow - thus delete former job
-            selector = 'jobId'
-
-            sys.stdout.write('** Deleting jobs of '+identifier+'** \n')
-            self.batch_api.delete_collection_namespaced_job(
-                namespace=self.kube_namespace,
-                label_selector=selector+'='+identifier)
-
-            sys.stdout.write('** Deleting pods of '+identifier+'** \n')
-
-            self.core_api.delete_collection_namespaced_pod(
-                namespace=self.kube_namespace,
-                label_selector=selector+'='+identifier)
+            self._deleteResources('jobId', [identifier], services=False,
+                                  secrets=False)
 
 
 
@@ -1011,9 +2244,13 @@ def offload():
         logger.debug('Before offloadrequest')
         req = OffloadRequest(getMessagePayload())
         logger.debug('after offloadrequest')
-        actionDef = req.requestAction()
-        logger.debug('actionDef: %s' % actionDef)
-        req.decodeAction(actionDef)
+        req.requestAction()
+        logger.debug('action image: %s placement: %s' %
+                     (req.image, req.placement))
+        if req.async_offload:
+            response = flask.jsonify(offloader.submitAction(req))
+            response.status_code = 202
+            return response
         response = flask.jsonify(offloader.executeAction(req))
         response.status_code = 200
         return response
@@ -1038,9 +2275,9 @@ def reconfigure():
     sys.stdout.write('Received reconfigure request\n')
     try:
         req = OffloadRequest(getMessagePayload())
-        actionDef = req.requestAction()
-        logger.debug('actionDef: %s' % actionDef)
-        req.decodeAction(actionDef)
+        req.requestAction()
+        logger.debug('action image: %s placement: %s' %
+                     (req.image, req.placement))
         offloader.reconfigureAction(req)
     except HTTPException as e:
         logger.debug('Exit /reconfigure %s', str(e))
@@ -1094,6 +2331,12 @@ def successfulJob():
         response.status_code = 400
         return response
 
+    # per completion endpoint outcomes as reported by the invoker
+    for endpoint, outcome in value.get('endpoints', {}).items():
+        if outcome.get('status') != 'ok':
+            sys.stdout.write('Job %s failed to post to completion endpoint '
+                             '%s: %s\n' % (flowId, endpoint, outcome.get('error')))
+
     try:
         offloader.cleanupJob(flowId, 'completed')
     except HTTPException as e:
@@ -1120,6 +2363,8 @@ def failedJob():
         return response
 
     sys.stdout.write('Job '+flowId+' failed, but OW_OFFLOAD_KEEP_FAILED_JOBS not set -- therefore still deleting job resources.\n')
+    if value.get('missingValue'):
+        offloader.forgetValue(value['missingValue'])
     try:
         offloader.cleanupJob(flowId, 'failed')
     except HTTPException as e:
@@ -1157,6 +2402,32 @@ def getPod():
         return response
 
 
+# Get the pods of many offloaded jobs at once
+@proxy.route("/getPods",  methods=['POST'])
+def getPods():
+    value = getMessagePayload()
+
+    flowIds = value.get('flowIds', [])
+    ro_vim_vm_names = value.get('ro_vim_vm_names', [])
+
+    if not isinstance(flowIds, list) or not isinstance(ro_vim_vm_names, list):
+        response = flask.jsonify({'error': 'flowIds and ro_vim_vm_names must be lists for /getPods route.'})
+        response.status_code = 400
+        return response
+
+    try:
+        pods_json = offloader.getPods(flowIds, ro_vim_vm_names)
+        response = flask.jsonify(pods_json)
+        response.status_code = 200
+        return response
+    except HTTPException as e:
+        return e
+    except Exception as e:
+        response = flask.jsonify({'error': 'Internal error. {}'.format(e)})
+        response.status_code = 500
+        return response
+
+
 @proxy.route("/getPodFromRoLabel",  methods=['POST'])
 def getPodFromRo():
     value = getMessagePayload()
@@ -1200,6 +2471,12 @@ def deleteJobFromRoLabel():
 
     sys.stdout.write('Deleting Job(s) ' + label_name + ' ' + label_value + ' \n')
     try:
+        if value.get('async', False):
+            cleanupId = offloader.submitCleanup(offloader.cleanupJobFromLabel,
+                                                label_name, label_value)
+            response = flask.jsonify({'cleanupId': cleanupId})
+            response.status_code = 202
+            return response
         offloader.cleanupJobFromLabel(label_name=label_name,
                                       label_value=label_value)
     except HTTPException as e:
@@ -1217,15 +2494,22 @@ def deleteJob():
     value = getMessagePayload()
 
     flowId = value.get('flowId', None)
+    # many flowIds can be deleted at once
+    flowIds = value.get('flowIds', [flowId] if flowId else None)
 
-    if flowId is None:
-        response = flask.jsonify({'error': 'Did not receive flowId for /deleteJob route.'})
+    if not flowIds or not isinstance(flowIds, list):
+        response = flask.jsonify({'error': 'Did not receive flowId or flowIds for /deleteJob route.'})
         response.status_code = 400
         return response
 
-    sys.stdout.write('Deleting Job(s) '+flowId+'\n')
+    sys.stdout.write('Deleting Job(s) '+','.join(flowIds)+'\n')
     try:
-        offloader.cleanupJob(flowId, 'delete')
+        if value.get('async', False):
+            cleanupId = offloader.submitCleanup(offloader.cleanupJobs, flowIds)
+            response = flask.jsonify({'cleanupId': cleanupId})
+            response.status_code = 202
+            return response
+        offloader.cleanupJobs(flowIds)
     except HTTPException as e:
         return e
     except Exception as e:
@@ -1236,6 +2520,30 @@ def deleteJob():
     return ('OK', 200)
 
 
+# Get the status of a background (async) cleanup
+@proxy.route("/getCleanup",  methods=['POST'])
+def getCleanup():
+    value = getMessagePayload()
+
+    cleanupId = value.get('cleanupId', None)
+
+    if cleanupId is None:
+        response = flask.jsonify({'error': 'Did not receive cleanupId for /getCleanup route.'})
+        response.status_code = 400
+        return response
+
+    try:
+        response = flask.jsonify(offloader.getCleanup(cleanupId))
+        response.status_code = 200
+        return response
+    except HTTPException as e:
+        return e
+    except Exception as e:
+        response = flask.jsonify({'error': 'Internal error. {}'.format(e)})
+        response.status_code = 404
+        return response
+
+
 @proxy.route("/conf/<ipaddress>",  methods=['POST'])
 def conf(ipaddress):
     value = getMessagePayload()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import conf
+
+
+class ApplyParamsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        patcher = mock.patch.object(conf, 'CONF_DIR', self.dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self, name):
+        with open(os.path.join(self.dir, name)) as f:
+            return f.read()
+
+    def generations(self):
+        return [n for n in os.listdir(self.dir)
+                if n.startswith(conf.TMP_PREFIX)]
+
+    def test_applied(self):
+        conf.applyParams({'a': 1, 'b': 2})
+        conf.applyParams({'b': 3, 'c': 4})
+        self.assertEqual([self.read(n) for n in 'abc'], ['1', '3', '4'])
+        current = os.path.realpath(os.path.join(self.dir, conf.CURRENT_LINK))
+        self.assertEqual(sorted(os.listdir(current)), ['a', 'b', 'c'])
+
+    def test_switched_at_once(self):
+        conf.applyParams({'a': 1, 'b': 1})
+        before = os.path.realpath(os.path.join(self.dir, conf.CURRENT_LINK))
+        conf.applyParams({'a': 2, 'b': 2})
+        # every parameter links through the current generation
+        for name in 'ab':
+            self.assertEqual(os.readlink(os.path.join(self.dir, name)),
+                             os.path.join(conf.CURRENT_LINK, name))
+        # readers of the former generation still see a consistent set
+        with open(os.path.join(before, 'a')) as f:
+            self.assertEqual(f.read(), '1')
+
+    def test_older_generations_removed(self):
+        for i in range(5):
+            conf.applyParams({'a': i})
+        self.assertEqual(len(self.generations()), 2)
+
+    def test_failure_applies_nothing(self):
+        conf.applyParams({'a': 1})
+
+        class Unprintable(object):
+            def __str__(self):
+                raise ValueError('unprintable')
+        with self.assertRaises(ValueError):
+            conf.applyParams({'a': 2, 'b': Unprintable()})
+        self.assertEqual(self.read('a'), '1')
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'b')))
+        self.assertEqual(len(self.generations()), 1)
+
+    def test_files_of_older_sidecars_replaced(self):
+        with open(os.path.join(self.dir, 'a'), 'w') as f:
+            f.write('0')
+        with open(os.path.join(self.dir, '.ow_action.log'), 'w') as f:
+            f.write('log')
+        conf.applyParams({'a': 1})
+        self.assertEqual(self.read('a'), '1')
+        self.assertTrue(os.path.islink(os.path.join(self.dir, 'a')))
+        self.assertEqual(self.read('.ow_action.log'), 'log')
+
+
+class ValidNameTest(unittest.TestCase):
+
+    def test_valid(self):
+        for name in ('param', '.ow_params'):
+            self.assertTrue(conf.validName(name), name)
+
+    def test_invalid(self):
+        for name in ('', '.', '..', 'a/b', 'a\0', conf.CURRENT_LINK,
+                     conf.TMP_PREFIX + 'x'):
+            self.assertFalse(conf.validName(name), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
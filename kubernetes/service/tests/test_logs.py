@@ -0,0 +1,68 @@
+import base64
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import invoker
+
+SENTINEL = invoker.LOG_SENTINEL
+
+
+class CollectLogsTest(unittest.TestCase):
+
+    def setUp(self):
+        d = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, d)
+        self.log = os.path.join(d, '.ow_action.log')
+        for name, value in (('ACTION_LOG_FILE', self.log), ('LOG_WAIT', 0.2)):
+            patcher = mock.patch.object(invoker, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write(self, lines):
+        with open(self.log, 'w') as f:
+            f.write(''.join(l + '\n' for l in lines))
+
+    def test_sentinels_dropped(self):
+        self.write(['out', SENTINEL, 'err', SENTINEL])
+        self.assertEqual(invoker.collectLogs(),
+                         {'invokerLogs': [], 'actionLogs': ['out', 'err']})
+
+    def test_missing_sentinel_waits_until_deadline(self):
+        self.write(['out', SENTINEL])
+        with mock.patch.object(invoker.time, 'sleep') as sleep:
+            logs = invoker.collectLogs()
+        self.assertTrue(sleep.called)
+        self.assertEqual(logs['actionLogs'], ['out'])
+
+    def test_missing_file(self):
+        with mock.patch.object(invoker.time, 'sleep'):
+            self.assertEqual(invoker.collectLogs()['actionLogs'], [])
+
+    def test_tail_kept(self):
+        self.write(['a' * 10, 'b' * 10, SENTINEL, SENTINEL])
+        size = 11 + 2 * (len(SENTINEL) + 1)
+        with mock.patch.object(invoker, 'MAX_LOG_SIZE', size):
+            logs = invoker.collectLogs()
+        self.assertTrue(logs['truncated'])
+        self.assertEqual(logs['actionLogs'], ['b' * 10])
+
+    def test_compressed(self):
+        self.write(['out', SENTINEL, 'err', SENTINEL])
+        with mock.patch.object(invoker, 'LOG_COMPRESS', True):
+            logs = invoker.collectLogs()
+        self.assertNotIn('actionLogs', logs)
+        self.assertEqual(
+            gzip.decompress(base64.b64decode(logs['actionLogsGzip'])),
+            b'out\nerr')
+
+
+if __name__ == '__main__':
+    unittest.main()
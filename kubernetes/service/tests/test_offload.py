@@ -0,0 +1,86 @@
+import collections
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import server
+
+
+class Request:
+    activationId = 'activation'
+
+
+class CancelTest(unittest.TestCase):
+
+    def setUp(self):
+        o = server.Offloader.__new__(server.Offloader)
+        o.offloads = collections.OrderedDict()
+        o.offloads_lock = threading.Lock()
+        o.pending_offloads = 0
+        o.cancelled_offloads = set()
+        o.offload_executor = ThreadPoolExecutor(max_workers=1)
+        o.delete_executor = ThreadPoolExecutor(max_workers=2)
+        o.kube_namespace = 'ns'
+        o.batch_api = mock.Mock()
+        o.core_api = mock.Mock()
+        o._listServices = lambda flowId: []
+        o._notifyError = mock.Mock()
+        # creations block until released
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.created = []
+
+        def createAction(req, flowId, jobId):
+            self.started.set()
+            self.release.wait(5)
+            self.created.append(flowId)
+        o._createAction = createAction
+        self.o = o
+
+    def deleted(self):
+        return [c[1]['label_selector'] for c in
+                self.o.core_api.delete_collection_namespaced_pod.call_args_list]
+
+    def drain(self):
+        self.release.set()
+        self.o.offload_executor.shutdown(wait=True)
+
+    def test_created(self):
+        flowId = self.o.submitAction(Request())['flowId']
+        self.drain()
+        self.assertEqual(self.created, [flowId])
+        self.assertEqual(self.o.offloads[flowId]['status'], 'created')
+        self.assertEqual(self.deleted(), [])
+        self.assertEqual(self.o.pending_offloads, 0)
+
+    def test_queued_offload_not_created(self):
+        first = self.o.submitAction(Request())['flowId']
+        queued = self.o.submitAction(Request())['flowId']
+        self.started.wait(5)
+        self.o._deleteResources('flowId', [queued])
+        self.drain()
+        self.assertEqual(self.created, [first])
+        self.assertNotIn(queued, self.o.offloads)
+        self.assertEqual(self.o.cancelled_offloads, set())
+        self.assertEqual(self.o.pending_offloads, 0)
+
+    def test_offload_deleted_while_created(self):
+        flowId = self.o.submitAction(Request())['flowId']
+        self.started.wait(5)
+        self.o._deleteResources('flowId', [flowId])
+        self.drain()
+        self.assertEqual(self.created, [flowId])
+        # deleted again once created
+        self.assertEqual(self.deleted(), ['flowId in (%s)' % flowId] * 2)
+        self.assertNotIn(flowId, self.o.offloads)
+        self.assertEqual(self.o.cancelled_offloads, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import invoker
+
+
+class Response:
+    def raise_for_status(self):
+        pass
+
+
+class ActionReadyTest(unittest.TestCase):
+
+    def test_port(self):
+        s = socket.socket()
+        s.bind(('127.0.0.1', 0))
+        s.listen(1)
+        port = s.getsockname()[1]
+        self.assertTrue(invoker.actionReady('127.0.0.1', port))
+        s.close()
+        self.assertFalse(invoker.actionReady('127.0.0.1', port))
+
+    def test_ready_file(self):
+        d = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, d)
+        ready = os.path.join(d, '.ow_ready')
+        with mock.patch.object(invoker, 'READY_FILE', ready):
+            self.assertFalse(invoker.actionReady('127.0.0.1', 1))
+            open(ready, 'w').close()
+            self.assertTrue(invoker.actionReady('127.0.0.1', 1))
+
+
+@mock.patch.object(invoker, 'INIT_BACKOFF_MIN', 0.1)
+@mock.patch.object(invoker, 'INIT_BACKOFF_MAX', 0.4)
+class InitActionTest(unittest.TestCase):
+
+    def setUp(self):
+        sleep = mock.patch.object(invoker.time, 'sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def test_probes_with_backoff(self):
+        probes = iter([False] * 5 + [True])
+        with mock.patch.object(invoker, 'actionReady',
+                               side_effect=lambda h, p: next(probes)) as ready, \
+                mock.patch.object(invoker.requests, 'post',
+                                  return_value=Response()) as post:
+            invoker.initAction('http://10.0.0.1:8080', {'code': 'x'}, {})
+        self.assertEqual(ready.call_args[0], ('10.0.0.1', 8080))
+        self.assertEqual(post.call_count, 1)
+        self.assertEqual(post.call_args[0][0], 'http://10.0.0.1:8080/init')
+        delays = [c[0][0] for c in self.sleep.call_args_list]
+        self.assertEqual(len(delays), 5)
+        for attempt, delay in enumerate(delays):
+            bound = min(0.4, 0.1 * 2 ** attempt)
+            self.assertTrue(bound / 2 <= delay <= bound, (attempt, delay))
+
+    def test_deadline(self):
+        with mock.patch.object(invoker, 'INIT_DEADLINE', 0), \
+                mock.patch.object(invoker, 'actionReady', return_value=False):
+            with self.assertRaises(Exception) as cm:
+                invoker.initAction('http://localhost:8080', {}, {})
+        self.assertIn('not ready', str(cm.exception))
+
+    def test_init_error_raised_at_deadline(self):
+        error = Exception('HTTP 502')
+        with mock.patch.object(invoker, 'INIT_DEADLINE', 0), \
+                mock.patch.object(invoker, 'actionReady', return_value=True), \
+                mock.patch.object(invoker.requests, 'post', side_effect=error):
+            with self.assertRaises(Exception) as cm:
+                invoker.initAction('http://localhost:8080', {}, {})
+        self.assertIs(cm.exception, error)
+
+
+if __name__ == '__main__':
+    unittest.main()
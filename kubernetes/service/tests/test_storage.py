@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import invoker
+import server
+
+
+class Response:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception('HTTP %d' % self.status_code)
+
+    def json(self):
+        return self.body
+
+
+def offloader():
+    o = server.Offloader.__new__(server.Offloader)
+    o.storage_host = 'storage'
+    o.storage_port = '8080'
+    o.stored_values = server.collections.OrderedDict()
+    o.stored_values_lock = threading.Lock()
+    return o
+
+
+class StoreValueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.keys = iter('k%d' % i for i in range(100))
+        patcher = mock.patch.object(
+            server.requests, 'post',
+            side_effect=lambda *a, **kw: Response({'key': next(self.keys)}))
+        self.post = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_uploads_once(self):
+        o = offloader()
+        key, digest = o.storeValue('value')
+        self.assertEqual(digest, hashlib.sha256(b'value').hexdigest())
+        self.assertEqual(o.storeValue('value'), (key, digest))
+        self.assertEqual(self.post.call_count, 1)
+        o.storeValue('other')
+        self.assertEqual(self.post.call_count, 2)
+
+    def test_forgotten_value_uploaded_again(self):
+        o = offloader()
+        key, digest = o.storeValue('value')
+        o.forgetValue(digest)
+        self.assertNotEqual(o.storeValue('value'), (key, digest))
+        self.assertEqual(self.post.call_count, 2)
+
+    def test_bounded(self):
+        o = offloader()
+        with mock.patch.object(server, 'MAX_STORED_VALUES', 2):
+            for value in ('a', 'b', 'a', 'c'):
+                o.storeValue(value)
+        self.assertEqual(list(o.stored_values),
+                         [hashlib.sha256(v).hexdigest() for v in (b'a', b'c')])
+
+
+class GetValueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.value = json.dumps({'a': 1})
+        self.digest = hashlib.sha256(self.value.encode()).hexdigest()
+        env = mock.patch.dict(os.environ, {
+            'OW_STORAGESERVICE_SERVICE_HOST': 'storage',
+            'OW_STORAGESERVICE_SERVICE_PORT': '8080'})
+        env.start()
+        self.addCleanup(env.stop)
+        self.cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache)
+        cache = mock.patch.object(invoker, 'CACHE_DIR', self.cache)
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    def getValue(self, response):
+        with mock.patch.object(invoker.requests, 'post',
+                               return_value=response) as post:
+            value = invoker.getValue(None, 'k1', self.digest)
+        self.assertEqual(post.call_args[1]['json'], {'key': 'k1'})
+        return value
+
+    def test_verified_and_cached(self):
+        self.assertEqual(self.getValue(Response({'value': self.value})),
+                         {'a': 1})
+        with mock.patch.object(invoker.requests, 'post') as post:
+            self.assertEqual(invoker.getValue(None, 'k1', self.digest),
+                             {'a': 1})
+        self.assertFalse(post.called)
+
+    def test_other_value(self):
+        with self.assertRaises(invoker.MissingValue) as cm:
+            self.getValue(Response({'value': json.dumps({'a': 2})}))
+        self.assertEqual(cm.exception.digest, self.digest)
+        self.assertEqual(os.listdir(self.cache), [])
+
+    def test_missing_key(self):
+        with self.assertRaises(invoker.MissingValue):
+            self.getValue(Response({}, status_code=404))
+        with self.assertRaises(invoker.MissingValue):
+            self.getValue(Response({}))
+
+    def test_server_error_is_not_a_miss(self):
+        with self.assertRaises(Exception) as cm:
+            self.getValue(Response({}, status_code=500))
+        self.assertNotIsInstance(cm.exception, invoker.MissingValue)
+
+    def test_local(self):
+        self.assertEqual(invoker.getValue(self.value, None), {'a': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import json
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import server
+
+
+class Request:
+    def __init__(self, params, code=None, binary=False):
+        self.params = params
+        self.code = code
+        self.binary = binary
+
+
+class Response:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def offloader(storage_host='storage'):
+    o = server.Offloader.__new__(server.Offloader)
+    o.storage_host = storage_host
+    o.storage_port = '8080'
+    o.stored_values = server.collections.OrderedDict()
+    o.stored_values_lock = threading.Lock()
+    return o
+
+
+def env(invokerEnv):
+    return dict((e.name, e.value) for e in invokerEnv)
+
+
+class ValuesNameTest(unittest.TestCase):
+
+    def test_content_addressed(self):
+        name = server.Offloader._valuesName({'args': '{}', 'code': '"x"'})
+        self.assertTrue(name.startswith('offload-values-'))
+        self.assertEqual(len(name), len('offload-values-') + 32)
+        self.assertEqual(
+            name, server.Offloader._valuesName({'code': '"x"', 'args': '{}'}))
+        self.assertNotEqual(
+            name, server.Offloader._valuesName({'args': '{}', 'code': '"y"'}))
+
+    def test_unambiguous(self):
+        self.assertNotEqual(server.Offloader._valuesName({'a': 'bc'}),
+                            server.Offloader._valuesName({'ab': 'c'}))
+
+
+@mock.patch.object(server, 'VALUE_DELIVERY', 'volume')
+class VolumeDeliveryTest(unittest.TestCase):
+
+    def test_volume(self):
+        invokerEnv = []
+        values = offloader()._invokerValues(
+            Request({'a': 1}, code='print(1)'), invokerEnv)
+        self.assertEqual(values, {'args': json.dumps({'a': 1}),
+                                  'code': json.dumps('print(1)')})
+        e = env(invokerEnv)
+        self.assertEqual(e['OW_OFFLOAD_ARGS_PATH'],
+                         server.VALUES_MOUNT_PATH + '/args')
+        self.assertEqual(e['OW_OFFLOAD_CODE_PATH'],
+                         server.VALUES_MOUNT_PATH + '/code')
+        self.assertNotIn('OW_OFFLOAD_ARGS', e)
+
+    def test_oversize_goes_through_storage(self):
+        params = {'a': 'x' * server.MAX_VALUES_SIZE}
+        invokerEnv = []
+        with mock.patch.object(server.requests, 'post',
+                               return_value=Response({'key': 'k1'})) as post:
+            values = offloader()._invokerValues(Request(params), invokerEnv)
+        self.assertIsNone(values)
+        self.assertTrue(post.call_args[0][0].endswith('/storeValue'))
+        self.assertEqual(post.call_args[1]['json'],
+                         {'value': json.dumps(params)})
+        e = env(invokerEnv)
+        self.assertEqual(e['OW_OFFLOAD_ARGS_FILE'], 'k1')
+        self.assertIn('OW_OFFLOAD_ARGS_HASH', e)
+        self.assertNotIn('OW_OFFLOAD_ARGS_PATH', e)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import datetime
+import os
+import sys
+import time
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import server
+
+NOW = datetime.datetime.now(datetime.timezone.utc)
+
+
+def pod(name, key, age):
+    return types.SimpleNamespace(metadata=types.SimpleNamespace(
+        name=name, labels={'warm-pool': key} if key else {},
+        deletion_timestamp=None, resource_version='1',
+        creation_timestamp=NOW - datetime.timedelta(seconds=age)))
+
+
+class ReapTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(server, 'WARM_POOL_IDLE', 3600)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.core_api = mock.Mock()
+        self.core_api.list_namespaced_pod.return_value = \
+            types.SimpleNamespace(items=[
+                pod('orphan', 'k0', 7200), pod('young', 'k0', 10),
+                pod('claimed', None, 9999), pod('active', 'k1', 7200),
+                pod('unused', 'k2', 7200)])
+        offloader = types.SimpleNamespace(core_api=self.core_api,
+                                          kube_namespace='ns')
+        self.pool = server.WarmPool(offloader)
+        self.refilled = []
+        self.pool.refill = lambda req, selector, delay=0: \
+            self.refilled.append(req)
+
+    def deleted(self):
+        return [c[1]['name'] for c in
+                self.core_api.delete_namespaced_pod.call_args_list]
+
+    def test_reap(self):
+        self.pool.pools = {'k1': ('req1', {}), 'k2': ('req2', {})}
+        self.pool.used = {'k1': time.time(), 'k2': time.time() - 7200}
+        self.assertEqual(self.pool._reap(), 4)
+        # idle pods of unknown pools, left over by a former run, are reaped
+        self.assertEqual(self.deleted(), ['orphan', 'active', 'unused'])
+        # pods are unlabelled before being deleted
+        self.assertEqual(
+            [c[1]['name'] for c in
+             self.core_api.patch_namespaced_pod.call_args_list],
+            ['orphan', 'active', 'unused'])
+        self.assertEqual(self.refilled, ['req1'])
+        self.assertEqual(self.pool.pools, {'k1': ('req1', {})})
+        self.assertNotIn('k2', self.pool.used)
+
+    def test_conflict(self):
+        def delete(name, namespace, body):
+            if name == 'orphan':
+                raise server.ApiException(status=404)
+        self.core_api.delete_namespaced_pod.side_effect = delete
+        self.pool._reap()
+        self.assertEqual(self.deleted(), ['orphan', 'active', 'unused'])
+
+    def test_disabled(self):
+        with mock.patch.object(server, 'WARM_POOL_IDLE', 0), \
+                mock.patch.object(server._thread, 'start_new_thread') as start:
+            self.pool.start()
+            self.assertTrue(self.pool._inUse('k2'))
+        start.assert_not_called()
+        self.assertFalse(self.pool.reaping)
+
+    def test_start(self):
+        with mock.patch.object(server._thread, 'start_new_thread') as start:
+            self.pool.start()
+            self.pool.start()
+        start.assert_called_once_with(self.pool._reaper, ())
+        # the pod cache waits for the first pool
+        self.assertFalse(self.pool.cache_started)
+
+
+if __name__ == '__main__':
+    unittest.main()
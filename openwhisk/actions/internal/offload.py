@@ -38,6 +38,9 @@ An action to offload another action to an external OpenWhisk Offload Service.
                          result of the offloaded action (Optional)
 :param completionTrigger: the name of an OpenWhisk trigger to invoke with the
                           result of the offloaded action (Optional)
+:param async: return flowId/jobId as soon as the request is validated and
+              let the offload service create the job in the background;
+              the pod status is then retrieved with get_pod (Optional)
 :prarm coe_action_params: the parameters to pass to the offload service
                                service_type: ``str``
                                service_ports: array of ``int``
@@ -97,6 +100,9 @@ def main(args):
     if event_uuid:
         payload['event_uuid'] = event_uuid
 
+    if args.get('async', False):
+        payload['async'] = True
+
     r = requests.post(offloadService+'/offload',
                       headers=headers, json={ 'value' : payload })
 
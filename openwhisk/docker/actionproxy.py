@@ -35,14 +35,38 @@ import codecs
 import flask
 from gevent.wsgi import WSGIServer
 import zipfile
-import io
 import base64
+import select
+import threading
+import hashlib
+import tempfile
+import time
 
 
 class ActionRunner:
     """ActionRunner."""
     LOG_SENTINEL = 'XXX_THE_END_OF_A_WHISK_ACTIVATION_XXX'
 
+    # Opt-in persistent mode: the binary is started once after <init> and
+    # serves all the activations of the container (see startWorker)
+    PERSISTENT = os.getenv('OW_ACTION_PERSISTENT', 'false').lower() == 'true'
+    # Time (in seconds) a persistent binary is given to acknowledge the
+    # protocol before falling back to one process per activation
+    PERSISTENT_TIMEOUT = float(os.getenv('OW_ACTION_PERSISTENT_TIMEOUT', '5'))
+    # File descriptor on which a persistent binary writes its results
+    RESULT_FD = 3
+    # Maximum size (in bytes) of the result line of an action
+    MAX_RESULT_SIZE = int(os.getenv('OW_ACTION_MAX_RESULT_SIZE', str(1024 * 1024)))
+
+    # Directory where zip archives are kept by content hash, and number of
+    # archives kept there
+    ZIP_CACHE = os.getenv('OW_ACTION_ZIP_CACHE', '/tmp/ow-zip-cache')
+    ZIP_CACHE_ENTRIES = int(os.getenv('OW_ACTION_ZIP_CACHE_ENTRIES', '2'))
+    # Hash of the archive last extracted into <zipdest>
+    ZIP_MARKER = '.ow_zip_sha256'
+    # Number of base64 characters decoded at a time
+    B64_CHUNK = 4 * 1024 * 1024
+
     # initializes the runner
     # @param source the path where the source code will be located (if any)
     # @param binary the path where the binary will be located (may be the
@@ -52,6 +76,10 @@ class ActionRunner:
         self.source = source if source else defaultBinary
         self.binary = binary if binary else defaultBinary
         self.zipdest = zipdest if zipdest else os.path.dirname(self.source)
+        self.persistent = self.PERSISTENT
+        self.worker = None
+        self.results = None
+        self.lock = threading.Lock()
 
     def preinit(self):
         return
@@ -87,7 +115,13 @@ class ActionRunner:
             except Exception:
                 return False
         # verify the binary exists and is executable
-        return self.verify()
+        if not self.verify():
+            return False
+        if self.persistent:
+            # (re)start the binary with the new code
+            self.stopWorker()
+            self.startWorker()
+        return True
 
     # optionally appends source to the loaded code during <init>
     def epilogue(self, init_arguments):
@@ -114,6 +148,91 @@ class ActionRunner:
                 env['__OW_%s' % p.upper()] = message[p]
         return env
 
+    # starts the binary in persistent mode: it is run with __OW_PERSISTENT=1
+    # in its environment and RESULT_FD open for writing. It then:
+    #  - writes a line to RESULT_FD once ready (e.g. {"ok": true})
+    #  - for each activation, reads a line from stdin holding a JSON object
+    #    with the action input under 'value' and the activation environment
+    #    (__OW_* variables) under 'env', and writes the stringified JSON
+    #    result as one line to RESULT_FD
+    # Logs go to stdout/stderr as usual. Binaries that do not acknowledge
+    # the protocol in time are stopped, and every activation runs in its
+    # own process instead. As the binary is started without input to find
+    # out, only enable persistent mode for binaries that support it.
+    # @return True iff the binary acknowledged the protocol
+    def startWorker(self):
+        r, w = os.pipe()
+        env = dict(os.environ)
+        env['__OW_PERSISTENT'] = '1'
+        try:
+            p = subprocess.Popen(
+                [self.binary],
+                stdin=subprocess.PIPE,
+                env=env,
+                close_fds=False,
+                preexec_fn=lambda: os.dup2(w, self.RESULT_FD))
+        except Exception as e:
+            sys.stdout.write('persistent mode failed to start: %s\n' % e)
+            os.close(r)
+            os.close(w)
+            self.persistent = False
+            return False
+        os.close(w)
+        results = os.fdopen(r, 'rb')
+        ready, _, _ = select.select([results], [], [], self.PERSISTENT_TIMEOUT)
+        if not ready or not results.readline():
+            sys.stdout.write('binary does not support persistent mode; '
+                             'running one process per activation\n')
+            self.kill(p)
+            results.close()
+            self.persistent = False
+            return False
+        self.worker = p
+        self.results = results
+        return True
+
+    def stopWorker(self):
+        if self.worker is not None:
+            self.kill(self.worker)
+            self.results.close()
+        self.worker = None
+        self.results = None
+
+    @staticmethod
+    def kill(p):
+        try:
+            p.kill()
+            p.wait()
+        except Exception:
+            pass
+
+    # runs an activation on the persistent binary
+    def runWorker(self, args, env, error):
+        activation = {
+            'value': args,
+            'env': dict((k, v) for k, v in env.items() if k.startswith('__OW_'))
+        }
+        try:
+            self.worker.stdin.write((json.dumps(activation) + '\n').encode('utf-8'))
+            self.worker.stdin.flush()
+            line = self.results.readline()
+        except Exception as e:
+            self.stopWorker()
+            return error(e)
+        if not line:
+            # restarted upon next activation
+            self.stopWorker()
+            return error('The action exited')
+        line = line.decode('utf-8').strip()
+        try:
+            json_output = json.loads(line)
+            if isinstance(json_output, dict):
+                return (200, json_output)
+            else:
+                return error(line)
+        except Exception:
+            return error(line)
+
     # runs the action, called iff self.verify() is True.
     # @param args is a JSON object representing the input to the action
     # @param env is the environment for the action to run in (defined edge
@@ -126,6 +245,14 @@ class ActionRunner:
             sys.stdout.write('%s\n' % msg)
             return (502, {'error': 'The action did not return a dictionary.'})
 
+        if self.persistent:
+            with self.lock:
+                if self.worker is not None and self.worker.poll() is not None:
+                    # exited since the last activation
+                    self.stopWorker()
+                if self.worker is not None or self.startWorker():
+                    return self.runWorker(args, env, error)
+
         try:
             input = json.dumps(args)
             if len(input) > 131071:             # MAX_ARG_STRLEN (131071) linux/binfmts.h
@@ -144,34 +271,20 @@ class ActionRunner:
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
                     env=env)
-            # run the process and wait until it completes.
-            # stdout/stderr will always be set because we passed PIPEs to Popen
-            (o, e) = p.communicate(input=input.encode())
+            # feed stdin from its own thread so that a large input does not
+            # block reading the output
+            feeder = threading.Thread(target=self.feed, args=(p, input.encode()))
+            feeder.daemon = True
+            feeder.start()
+            lastLine, overflow = self.stream(p)
+            feeder.join()
+            p.wait()
 
         except Exception as e:
             return error(e)
 
-        # stdout/stderr may be either text or bytes, depending on Python
-        # version, so if bytes, decode to text. Note that in Python 2
-        # a string will match both types; so also skip decoding in that case
-        if isinstance(o, bytes) and not isinstance(o, str):
-            o = o.decode('utf-8')
-        if isinstance(e, bytes) and not isinstance(e, str):
-            e = e.decode('utf-8')
-
-        # get the last line of stdout, even if empty
-        lastNewLine = o.rfind('\n', 0, len(o)-1)
-        if lastNewLine != -1:
-            # this is the result string to JSON parse
-            lastLine = o[lastNewLine+1:].strip()
-            # emit the rest as logs to stdout (including last new line)
-            sys.stdout.write(o[:lastNewLine+1])
-        else:
-            # either o is empty or it is the result string
-            lastLine = o.strip()
-
-        if e:
-            sys.stderr.write(e)
+        if overflow:
+            return error('The action result exceeds %d bytes' % self.MAX_RESULT_SIZE)
 
         try:
             json_output = json.loads(lastLine)
@@ -182,29 +295,164 @@ class ActionRunner:
         except Exception:
             return error(lastLine)
 
+    @staticmethod
+    def feed(p, input):
+        try:
+            p.stdin.write(input)
+            p.stdin.close()
+        except (IOError, OSError):
+            # the action does not read its stdin
+            pass
+
+    # forwards stdout/stderr of the action process to ours as it arrives
+    # and returns its last stdout line (the result), keeping at most
+    # MAX_RESULT_SIZE bytes of it in memory
+    # @return tuple of last line (text) and whether it exceeded the limit
+    def stream(self, p):
+        decoders = {
+            p.stdout.fileno(): (codecs.getincrementaldecoder('utf-8')('replace'), sys.stdout),
+            p.stderr.fileno(): (codecs.getincrementaldecoder('utf-8')('replace'), sys.stderr)
+        }
+
+        def forward(fd, data, final=False):
+            decoder, stream = decoders[fd]
+            # Python 2 streams take the bytes as is
+            text = data if str is bytes else decoder.decode(data, final)
+            if text:
+                stream.write(text)
+                stream.flush()
+
+        outfd = p.stdout.fileno()
+        last = b''
+        overflow = False
+        fds = list(decoders)
+        while fds:
+            ready, _, _ = select.select(fds, [], [])
+            for fd in ready:
+                data = os.read(fd, 65536)
+                if not data:
+                    fds.remove(fd)
+                    continue
+                if fd != outfd:
+                    forward(fd, data)
+                    continue
+                last += data
+                # emit all but the last line (even if empty) as logs
+                lastNewLine = last.rfind(b'\n', 0, len(last)-1)
+                if lastNewLine != -1:
+                    forward(fd, last[:lastNewLine+1])
+                    last = last[lastNewLine+1:]
+                    overflow = False
+                if len(last) > self.MAX_RESULT_SIZE:
+                    forward(fd, last)
+                    last = b''
+                    overflow = True
+        forward(p.stderr.fileno(), b'', True)
+        return last.decode('utf-8', 'replace').strip(), overflow
+
     # initialize code from inlined string
     def initCodeFromString(self, message):
         with codecs.open(self.source, 'w', 'utf-8') as fp:
             fp.write(message['code'])
         return True
 
-    # initialize code from base64 encoded archive
+    # initialize code from base64 encoded archive. The archive is decoded to
+    # a file of the zip cache (named after its content hash) and extracted
+    # from there; initializing again with the same archive is a no-op
     def initCodeFromZip(self, message):
         try:
-            bytes = base64.b64decode(message['code'])
-            bytes = io.BytesIO(bytes)
-            archive = zipfile.ZipFile(bytes)
+            code = message['code']
+            digest = self.digest(code)
+            marker = os.path.join(self.zipdest, self.ZIP_MARKER)
+            if self.readMarker(marker) == digest and self.verify():
+                sys.stdout.write('archive %s already extracted\n' % digest)
+                return True
+            if not os.path.isdir(self.ZIP_CACHE):
+                os.makedirs(self.ZIP_CACHE)
+            path = os.path.join(self.ZIP_CACHE, digest + '.zip')
+            if os.path.isfile(path):
+                os.utime(path, None)
+            else:
+                self.decodeToFile(code, path)
+                self.evictZips()
+            archive = zipfile.ZipFile(path)
             archive.extractall(self.zipdest)
             archive.close()
+            with open(marker, 'w') as fp:
+                fp.write(digest)
             return True
         except Exception as e:
             print('err', str(e))
             return False
 
+    def chunks(self, code):
+        for i in range(0, len(code), self.B64_CHUNK):
+            chunk = code[i:i+self.B64_CHUNK]
+            yield chunk if isinstance(chunk, bytes) else chunk.encode('ascii')
+
+    def digest(self, code):
+        h = hashlib.sha256()
+        for chunk in self.chunks(code):
+            h.update(chunk)
+        return h.hexdigest()
+
+    @staticmethod
+    def readMarker(marker):
+        try:
+            with open(marker) as fp:
+                return fp.read().strip()
+        except (IOError, OSError):
+            return None
+
+    # decodes the base64 code chunk by chunk into the given file
+    def decodeToFile(self, code, path):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                rest = b''
+                for chunk in self.chunks(code):
+                    # decode whole quanta only (whitespaces aside)
+                    chunk = rest + b''.join(chunk.split())
+                    n = len(chunk) // 4 * 4
+                    fp.write(base64.b64decode(chunk[:n]))
+                    rest = chunk[n:]
+                if rest:
+                    fp.write(base64.b64decode(rest))
+            os.rename(tmp, path)
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    def evictZips(self):
+        archives = []
+        for name in os.listdir(self.ZIP_CACHE):
+            if name.endswith('.zip'):
+                path = os.path.join(self.ZIP_CACHE, name)
+                archives.append((os.path.getmtime(path), path))
+        archives.sort()
+        for _, path in archives[:-max(self.ZIP_CACHE_ENTRIES, 1)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
 proxy = flask.Flask(__name__)
 proxy.debug = False
 runner = None
 
+# File our stdout/stderr (and those of the action processes) are teed into,
+# truncated upon each /run, for the offload invoker to collect the logs of
+# an activation locally
+LOG_FILE = os.getenv('OW_ACTION_LOG_FILE')
+logFile = None
+logLock = threading.Lock()
+# Written into stdout and stderr by truncateLog: the tee threads truncate the
+# file once both reached it, i.e. once the output preceding it got written
+LOG_TRUNCATE_MARKER = b'\0__OW_TRUNCATE_LOG__\0'
+logTruncated = threading.Condition(logLock)
+# tee threads which reached the marker, truncations done
+logTruncate = {'arrived': 0, 'generation': 0}
+
 
 def setRunner(r):
     global runner
@@ -251,6 +499,7 @@ def run():
             return error()
 
     if runner.verify():
+        truncateLog()
         try:
             code, result = runner.run(args, runner.env(message or {}))
             response = flask.jsonify(result)
@@ -264,6 +513,80 @@ def run():
     return complete(response)
 
 
+def teeOutput(path):
+    global logFile
+    logFile = open(path, 'ab', 0)
+    for fd in (1, 2):
+        r, w = os.pipe()
+        out = os.dup(fd)
+        os.dup2(w, fd)
+        os.close(w)
+        t = threading.Thread(target=tee, args=(r, out, 2))
+        t.daemon = True
+        t.start()
+
+
+def tee(r, out, streams):
+    def forward(data):
+        view = data
+        while view:
+            view = view[os.write(out, view):]
+        with logLock:
+            logFile.write(data)
+
+    buf = b''
+    while True:
+        data = os.read(r, 65536)
+        if not data:
+            break
+        buf += data
+        i = buf.find(LOG_TRUNCATE_MARKER)
+        while i >= 0:
+            forward(buf[:i])
+            buf = buf[i+len(LOG_TRUNCATE_MARKER):]
+            with logTruncated:
+                logTruncate['arrived'] += 1
+                if logTruncate['arrived'] == streams:
+                    logFile.truncate(0)
+                    logTruncate['arrived'] = 0
+                    logTruncate['generation'] += 1
+                    logTruncated.notify_all()
+                else:
+                    # the other stream may still write output to drop
+                    generation = logTruncate['generation']
+                    while logTruncate['generation'] == generation:
+                        logTruncated.wait()
+            i = buf.find(LOG_TRUNCATE_MARKER)
+        # hold back what may be the beginning of a marker
+        keep = len(LOG_TRUNCATE_MARKER) - 1
+        while keep and not LOG_TRUNCATE_MARKER.startswith(buf[-keep:]):
+            keep -= 1
+        if len(buf) > keep:
+            forward(buf[:len(buf)-keep])
+            buf = buf[len(buf)-keep:]
+    if buf:
+        forward(buf)
+
+
+def truncateLog():
+    """
+    Truncate the log file, dropping all the output written so far. Returns
+    once the tee threads did it.
+    """
+    if logFile is not None:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        with logTruncated:
+            generation = logTruncate['generation']
+        for fd in (1, 2):
+            os.write(fd, LOG_TRUNCATE_MARKER)
+        deadline = time.time() + 5
+        with logTruncated:
+            while logTruncate['generation'] == generation and \
+                    time.time() < deadline:
+                logTruncated.wait(deadline - time.time())
+
+
 def complete(response):
     # Add sentinel to stdout/stderr
     sys.stdout.write('%s\n' % ActionRunner.LOG_SENTINEL)
@@ -275,7 +598,14 @@ def complete(response):
 
 def main():
     port = int(os.getenv('FLASK_PROXY_PORT', 8080))
+    if LOG_FILE:
+        teeOutput(LOG_FILE)
     server = WSGIServer(('0.0.0.0', port), proxy, log=None)
+    server.start()
+    # readiness signal for the offload invoker (e.g. /conf/.ow_ready)
+    ready = os.getenv('OW_ACTION_READY_FILE')
+    if ready:
+        open(ready, 'w').close()
     server.serve_forever()
 
 if __name__ == '__main__':
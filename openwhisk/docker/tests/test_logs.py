@@ -0,0 +1,92 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+import actionproxy
+
+# tees its output into the given file and truncates it halfway
+TRUNCATE = '''
+import os, sys, threading
+import actionproxy
+actionproxy.teeOutput(sys.argv[1])
+sys.stdout.write('before\\n')
+sys.stderr.write('before err\\n')
+actionproxy.truncateLog()
+sys.stdout.write('after\\n')
+sys.stderr.write('after err\\n')
+sys.stdout.flush()
+sys.stderr.flush()
+os.close(1)
+os.close(2)
+for t in threading.enumerate():
+    if t is not threading.current_thread():
+        t.join(5)
+'''
+
+
+class TruncateLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.log = os.path.join(self.dir, 'action.log')
+
+    def read(self):
+        with open(self.log, 'rb') as f:
+            return f.read()
+
+    def test_truncate_log(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [os.path.join(HERE, '..')] + [p for p in sys.path if p])
+        p = subprocess.Popen([sys.executable, '-c', TRUNCATE, self.log],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             env=env)
+        out, err = p.communicate()
+        self.assertEqual(p.returncode, 0, err)
+        # output still forwarded, the markers aside
+        self.assertEqual(out, b'before\nafter\n')
+        self.assertEqual(err, b'before err\nafter err\n')
+        self.assertEqual(sorted(self.read().splitlines()),
+                         [b'after', b'after err'])
+
+    def test_split_marker(self):
+        marker = actionproxy.LOG_TRUNCATE_MARKER
+        actionproxy.logFile = open(self.log, 'ab', 0)
+        self.addCleanup(setattr, actionproxy, 'logFile', None)
+        self.addCleanup(actionproxy.logFile.close)
+        streams = []
+        for chunks in ([b'a1' + marker[:5], marker[5:] + b'b1'],
+                       [b'a2', marker + b'b2']):
+            r, w = os.pipe()
+            out_r, out_w = os.pipe()
+            t = threading.Thread(target=actionproxy.tee, args=(r, out_w, 2))
+            t.daemon = True
+            t.start()
+            streams.append((chunks, w, out_r, out_w, t))
+        for chunks, w, _, _, _ in streams:
+            os.write(w, chunks[0])
+        for chunks, w, _, _, _ in streams:
+            os.write(w, chunks[1])
+            os.close(w)
+        outputs = []
+        for chunks, _, out_r, out_w, t in streams:
+            t.join(5)
+            self.assertFalse(t.is_alive())
+            os.close(out_w)
+            outputs.append(os.read(out_r, 1024))
+            os.close(out_r)
+        self.assertEqual(outputs, [b'a1b1', b'a2b2'])
+        self.assertEqual(sorted([self.read()[:2], self.read()[2:]]),
+                         [b'b1', b'b2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import actionproxy
+
+# logs to both streams, echoes its input (read from stdin) as the result
+ECHO = '''
+import json, sys
+for i in range(%(lines)d):
+    sys.stdout.write('out %%d %%s\\n' %% (i, 'x' * 100))
+    sys.stderr.write('err %%d\\n' %% i)
+value = json.loads(sys.stdin.read())
+sys.stdout.write(json.dumps({'size': len(json.dumps(value))}))
+'''
+
+
+class Capture(object):
+    def __init__(self):
+        self.data = []
+
+    def write(self, text):
+        self.data.append(text)
+
+    def flush(self):
+        pass
+
+    def text(self):
+        return ''.join(self.data)
+
+
+class StreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.stdout, self.stderr = Capture(), Capture()
+        saved = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = self.stdout, self.stderr
+
+        def restore():
+            sys.stdout, sys.stderr = saved
+        self.addCleanup(restore)
+
+    def runner(self, lines):
+        binary = os.path.join(self.dir, 'exec')
+        with open(binary, 'w') as f:
+            f.write('#!%s\n%s' % (sys.executable, ECHO % {'lines': lines}))
+        os.chmod(binary, os.stat(binary).st_mode | stat.S_IEXEC)
+        runner = actionproxy.ActionRunner(source=binary, binary=binary)
+        runner.persistent = False
+        return runner
+
+    def test_logs_forwarded(self):
+        code, result = self.runner(3).run({'a': 1}, dict(os.environ))
+        self.assertEqual((code, result), (200, {'size': len('{"a": 1}')}))
+        self.assertEqual(self.stdout.text().splitlines(),
+                         ['out %d %s' % (i, 'x' * 100) for i in range(3)])
+        self.assertEqual(self.stderr.text().splitlines(),
+                         ['err %d' % i for i in range(3)])
+
+    def test_large_input_and_output(self):
+        # input over MAX_ARG_STRLEN and logs over the pipe buffers
+        args = {'a': 'y' * 200000}
+        code, result = self.runner(2000).run(args, dict(os.environ))
+        self.assertEqual((code, result),
+                         (200, {'size': len(json.dumps(args))}))
+        self.assertEqual(len(self.stdout.text().splitlines()), 2000)
+
+    def test_result_too_large(self):
+        runner = self.runner(0)
+        runner.MAX_RESULT_SIZE = 4
+        code, result = runner.run({}, dict(os.environ))
+        self.assertEqual(code, 502)
+        self.assertIn('exceeds 4 bytes', self.stdout.text())
+
+
+if __name__ == '__main__':
+    unittest.main()
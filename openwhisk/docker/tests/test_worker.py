@@ -0,0 +1,95 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import actionproxy
+
+# answers with its arguments when spawned, serves activations over stdin
+# and the result fd in persistent mode
+WORKER = '''
+import json, os, sys
+if os.environ.get('__OW_PERSISTENT') != '1':
+    print(json.dumps({'mode': 'spawn', 'value': json.loads(sys.argv[1])}))
+    sys.exit(0)
+results = os.fdopen(3, 'w')
+results.write('{"ok": true}\\n')
+results.flush()
+n = 0
+for line in iter(sys.stdin.readline, ''):
+    n += 1
+    activation = json.loads(line)
+    print('log of activation %d' % n)
+    sys.stdout.flush()
+    results.write(json.dumps({'mode': 'persistent', 'n': n,
+                              'pid': os.getpid(),
+                              'value': activation['value'],
+                              'id': activation['env']['__OW_ACTIVATION_ID']}))
+    results.write('\\n')
+    results.flush()
+'''
+
+# ignores the persistent protocol
+PLAIN = '''
+import json, sys
+print(json.dumps({'mode': 'spawn', 'value': json.loads(sys.argv[1])}))
+'''
+
+
+class PersistentWorkerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.env = dict(os.environ)
+        self.env['__OW_ACTIVATION_ID'] = 'a1'
+
+    def runner(self, script):
+        binary = os.path.join(self.dir, 'exec')
+        with open(binary, 'w') as f:
+            f.write('#!%s\n%s' % (sys.executable, script))
+        os.chmod(binary, os.stat(binary).st_mode | stat.S_IEXEC)
+        runner = actionproxy.ActionRunner(source=binary, binary=binary)
+        runner.persistent = True
+        runner.PERSISTENT_TIMEOUT = 2
+        self.addCleanup(runner.stopWorker)
+        return runner
+
+    def test_activations_share_the_worker(self):
+        runner = self.runner(WORKER)
+        self.assertTrue(runner.init({}))
+        code, first = runner.run({'x': 1}, self.env)
+        self.assertEqual(code, 200)
+        self.assertEqual(first['mode'], 'persistent')
+        self.assertEqual(first['value'], {'x': 1})
+        self.assertEqual(first['id'], 'a1')
+        code, second = runner.run({'x': 2}, self.env)
+        self.assertEqual((second['n'], second['pid']), (2, first['pid']))
+
+    def test_exited_worker_restarted(self):
+        runner = self.runner(WORKER)
+        self.assertTrue(runner.init({}))
+        _, first = runner.run({}, self.env)
+        runner.worker.kill()
+        runner.worker.wait()
+        code, result = runner.run({}, self.env)
+        self.assertEqual(code, 200)
+        self.assertEqual(result['n'], 1)
+        self.assertNotEqual(result['pid'], first['pid'])
+
+    def test_fallback_to_process_per_activation(self):
+        runner = self.runner(PLAIN)
+        self.assertTrue(runner.init({}))
+        self.assertFalse(runner.persistent)
+        self.assertIsNone(runner.worker)
+        self.assertEqual(runner.run({'x': 1}, self.env),
+                         (200, {'mode': 'spawn', 'value': {'x': 1}}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import base64
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import actionproxy
+
+
+def archive(files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as z:
+        for name, content in files.items():
+            z.writestr(name, content)
+    return base64.b64encode(buf.getvalue()).decode('ascii')
+
+
+class ZipCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.dest = os.path.join(self.dir, 'action')
+        os.makedirs(self.dest)
+        self.runner = actionproxy.ActionRunner(
+            source=os.path.join(self.dest, 'exec'),
+            binary=os.path.join(self.dest, 'exec'))
+        self.runner.ZIP_CACHE = os.path.join(self.dir, 'cache')
+
+    def cached(self):
+        return sorted(os.listdir(self.runner.ZIP_CACHE))
+
+    def test_digest(self):
+        code = archive({'exec': 'x'})
+        self.runner.B64_CHUNK = 8
+        self.assertEqual(self.runner.digest(code),
+                         hashlib.sha256(code.encode('ascii')).hexdigest())
+        self.assertEqual(self.runner.digest(code.encode('ascii')),
+                         self.runner.digest(code))
+
+    def test_decode_in_chunks(self):
+        content = os.urandom(1000)
+        # line wrapped, as some clients send it
+        code = base64.encodestring(content) if str is bytes else \
+            base64.encodebytes(content)
+        for size in (4, 7, 64, 4096):
+            self.runner.B64_CHUNK = size
+            path = os.path.join(self.dir, 'out%d' % size)
+            self.runner.decodeToFile(code, path)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), content)
+        self.assertEqual([n for n in os.listdir(self.dir)
+                          if n.startswith('.tmp')], [])
+
+    def test_extracted_once(self):
+        code = archive({'exec': '#!/bin/sh\n', 'data': 'd'})
+        digest = self.runner.digest(code)
+        self.assertTrue(self.runner.initCodeFromZip({'code': code}))
+        self.assertEqual(self.cached(), [digest + '.zip'])
+        with open(os.path.join(self.dest, 'data')) as f:
+            self.assertEqual(f.read(), 'd')
+        os.chmod(self.runner.binary, 0o755)
+        os.remove(os.path.join(self.dest, 'data'))
+        # same archive: nothing extracted again
+        self.assertTrue(self.runner.initCodeFromZip({'code': code}))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, 'data')))
+        # another one: extracted
+        self.assertTrue(self.runner.initCodeFromZip(
+            {'code': archive({'exec': '#!/bin/sh\n', 'data': 'e'})}))
+        with open(os.path.join(self.dest, 'data')) as f:
+            self.assertEqual(f.read(), 'e')
+
+    def test_eviction(self):
+        self.runner.ZIP_CACHE_ENTRIES = 2
+        digests = []
+        for i in range(3):
+            code = archive({'exec': str(i)})
+            self.assertTrue(self.runner.initCodeFromZip({'code': code}))
+            digests.append(self.runner.digest(code))
+            # oldest first, whatever the file system time resolution
+            t = time.time() - 100 + i
+            os.utime(os.path.join(self.runner.ZIP_CACHE, digests[-1] + '.zip'),
+                     (t, t))
+        self.assertTrue(self.runner.initCodeFromZip(
+            {'code': archive({'exec': '3'})}))
+        self.assertEqual(len(self.cached()), 2)
+        self.assertIn(digests[2] + '.zip', self.cached())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,10 +15,15 @@
     
 import base64
 import json
+from multiprocessing.pool import ThreadPool
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
+import sqlite3
 import sys
+import threading
+import time
 from gevent.wsgi import WSGIServer
 
 import flask
@@ -39,6 +44,14 @@ FAAS_VERSION = "v2.0.3"
 mano_host = os.getenv('OSM_RO_HOSTNAME', None)
 mano_port = os.getenv('OPENMANO_PORT',"9090")
 conf_port = os.getenv('CONF_PORT', "5001")
+# sqlite database persisting the configuration; in memory only when empty
+conf_db = os.getenv('CONF_DB', '/var/lib/faas-configuration/conf.db')
+# seconds RO tenant, instance and datacenter lookups are cached for
+resolver_ttl = float(os.getenv('RESOLVER_CACHE_TTL', "60"))
+# number of network services retrieved concurrently by instances_all
+instances_workers = int(os.getenv('INSTANCES_WORKERS', "8"))
+# seconds instances_all results are cached for; 0 disables the cache
+instances_ttl = float(os.getenv('INSTANCES_CACHE_TTL', "0"))
 
 """
 {
@@ -114,15 +127,138 @@ def _from_nsr_to_result(r):
     return result
 
 
-ns_configuration = {}
-c_ns_configuration = {}
+class MemoryStore(object):
+    """
+    Configuration store of entries indexed by (ns, vnf, idx), kept as a
+    tree: {ns: {vnf: {idx: entry}}}
+
+    Read-modify-write sequences must hold lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tree = {}
+
+    def all(self):
+        return self.tree
+
+    def get_ns(self, ns):
+        """
+        :raises KeyError: if there is no entry for ns
+        """
+        return self.tree[ns]
+
+    def get(self, ns, vnf, idx):
+        """
+        :raises KeyError: if there is no such entry
+        """
+        return self.tree[ns][vnf][idx]
+
+    def put(self, ns, vnf, idx, entry):
+        with self.lock:
+            self.tree.setdefault(ns, {}).setdefault(vnf, {})[idx] = entry
+
+    def delete(self, ns, vnf, idx):
+        """
+        :raises KeyError: if there is no such entry
+        """
+        with self.lock:
+            vnfs = self.tree[ns]
+            del vnfs[vnf][idx]
+            if not vnfs[vnf]:
+                del vnfs[vnf]
+            if not vnfs:
+                del self.tree[ns]
+
+    def delete_ns(self, ns):
+        """
+        :raises KeyError: if there is no entry for ns
+        """
+        with self.lock:
+            del self.tree[ns]
+
+
+class SqliteStore(MemoryStore):
+    """
+    MemoryStore written through to a sqlite table (write-ahead log
+    journal), loaded back at start-up. Reads are served from memory.
+    """
+
+    def __init__(self, db, table):
+        super(SqliteStore, self).__init__()
+        self.db = db
+        self.table = table
+        with self.lock:
+            self.db.execute('CREATE TABLE IF NOT EXISTS %s ('
+                            'ns TEXT, vnf TEXT, idx TEXT, entry TEXT, '
+                            'PRIMARY KEY (ns, vnf, idx))' % table)
+            for ns, vnf, idx, entry in self.db.execute(
+                'SELECT ns, vnf, idx, entry FROM %s' % table):
+                MemoryStore.put(self, ns, vnf, idx, json.loads(entry))
+
+    def put(self, ns, vnf, idx, entry):
+        with self.lock:
+            with self.db:
+                self.db.execute('INSERT OR REPLACE INTO %s VALUES (?, ?, ?, ?)'
+                                % self.table, (ns, vnf, idx, json.dumps(entry)))
+            MemoryStore.put(self, ns, vnf, idx, entry)
+
+    def delete(self, ns, vnf, idx):
+        with self.lock:
+            self.get(ns, vnf, idx)
+            with self.db:
+                self.db.execute('DELETE FROM %s WHERE ns = ? AND vnf = ? AND '
+                                'idx = ?' % self.table, (ns, vnf, idx))
+            MemoryStore.delete(self, ns, vnf, idx)
+
+    def delete_ns(self, ns):
+        with self.lock:
+            self.get_ns(ns)
+            with self.db:
+                self.db.execute('DELETE FROM %s WHERE ns = ?' % self.table,
+                                (ns,))
+            MemoryStore.delete_ns(self, ns)
+
+
+def _open_stores(path):
+    """
+    Open the (day 0, current) configuration stores. Falls back to in memory
+    stores if the database can not be opened (e.g. read-only path)
+
+    :param path: sqlite database file path. In memory stores if empty
+    :type path: ``str``
+    """
+    if not path:
+        return MemoryStore(), MemoryStore()
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        return (SqliteStore(db, 'ns_configuration'),
+                SqliteStore(db, 'c_ns_configuration'))
+    except (OSError, IOError, sqlite3.Error) as e:
+        sys.stdout.write('Failed to open configuration database %s: %s. '
+                         'Configuration is kept in memory only\n'
+                         % (path, str(e)))
+        return MemoryStore(), MemoryStore()
+
+
+# day 0 configuration and current (day 1) configuration
+ns_configuration, c_ns_configuration = _open_stores(conf_db)
+
+# keep-alive connections to the RO, shared by the instances_all workers
+ro_session = requests.Session()
+ro_session.mount('http://', HTTPAdapter(pool_maxsize=instances_workers))
+instances_pool = ThreadPool(instances_workers)
 
 
 def _tenants_get():
     """
     Common helper to retrieve tenants
     """
-    r = requests.get(
+    r = ro_session.get(
         'http://%(mano_host)s:%(mano_port)s/openmano/tenants' %
         {
             'mano_host': mano_host,
@@ -139,7 +275,7 @@ def _datacenter_get(tenant_id, datacenter_id):
     """
     Common helper to retrieve VIM account info from a given id
     """
-    r = requests.get(
+    r = ro_session.get(
         'http://%(mano_host)s:%(mano_port)s/openmano/%(tenant_id)s/datacenters/%(datacenter_id)s' %
         {
             'mano_host': mano_host,
@@ -158,7 +294,7 @@ def _instances_get(tenant_id):
     """
     Common helper to retrieve network services
     """
-    r = requests.get(
+    r = ro_session.get(
         'http://%(mano_host)s:%(mano_port)s/openmano/%(tenant_id)s/instances' %
         {
             'mano_host': mano_host,
@@ -176,7 +312,7 @@ def _instance_get(tenant_id, instance_id):
     """
     Common helper to retrieve network service from a given id
     """
-    r = requests.get(
+    r = ro_session.get(
         'http://%(mano_host)s:%(mano_port)s/openmano/%(tenant_id)s/instances/%(instance_id)s' %
         {
             'mano_host': mano_host,
@@ -191,6 +327,105 @@ def _instance_get(tenant_id, instance_id):
     return r
 
 
+class ResolverCache(object):
+    """
+    Time bounded cache of RO lookups keyed by tuples, e.g.
+    ('tenant', tenant_name)
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, key, resolve):
+        """
+        Return the value of key, resolving it if missing or expired
+
+        :param resolve: resolves the value. None (not found) is not cached
+        :type resolve: ``callable``
+        """
+        value = self.lookup(key)
+        if value is None:
+            value = resolve()
+            self.put(key, value)
+        return value
+
+    def lookup(self, key):
+        """
+        Return the value of key. None if missing or expired
+        """
+        with self.lock:
+            e = self.entries.get(key)
+        if e and e[1] > time.time():
+            return e[0]
+        return None
+
+    def put(self, key, value):
+        if value is not None and self.ttl > 0:
+            with self.lock:
+                self.entries[key] = (value, time.time() + self.ttl)
+
+    def invalidate(self, *prefix):
+        """
+        Drop the entries whose key starts with prefix, all if empty
+        """
+        with self.lock:
+            for key in [k for k in self.entries if k[:len(prefix)] == prefix]:
+                del self.entries[key]
+
+
+resolver_cache = ResolverCache(resolver_ttl)
+instances_cache = ResolverCache(instances_ttl)
+
+
+def _tenant_resolve(tenant_name):
+    """
+    Resolve tenant by its name. None if not found
+    """
+    return resolver_cache.get(
+        ('tenant', tenant_name),
+        lambda: find(_tenants_get().json()['tenants'],
+                     lambda t: t['name'] == tenant_name))
+
+
+def _instance_resolve(tenant_id, instance_name):
+    """
+    Resolve network service by its name. None if not found
+    """
+    return resolver_cache.get(
+        ('instance', instance_name, tenant_id),
+        lambda: find(_instances_get(tenant_id).json()['instances'],
+                     lambda i: i['name'] == instance_name))
+
+
+def _datacenter_resolve(tenant_id, datacenter_id):
+    """
+    Resolve VIM account (including its config) by its id
+    """
+    return resolver_cache.get(
+        ('datacenter', datacenter_id, tenant_id),
+        lambda: _datacenter_get(tenant_id, datacenter_id).json().get(
+            'datacenter', {}))
+
+
+def _instance_get_by_name(tenant_id, instance_name):
+    """
+    Retrieve network service by its name, re-resolving its id once if a
+    cached one is stale (e.g. the instance was re-created). None if not found
+    """
+    for attempt in range(2):
+        i = _instance_resolve(tenant_id, instance_name)
+        if not i:
+            return None
+        try:
+            return _instance_get(tenant_id, i['uuid'])
+        except HTTPError as e:
+            if attempt or e.response.status_code != 404:
+                raise
+            resolver_cache.invalidate('instance', instance_name)
+
+
 @proxy.route('/ping', methods=['GET'])
 def ping():
     sys.stdout.write('Ping called/n')
@@ -201,7 +436,7 @@ def ping():
 
 @proxy.route('/conf', methods=['GET'])
 def get_config_all():
-    response = flask.jsonify(ns_configuration)
+    response = flask.jsonify(ns_configuration.all())
     response.status_code = 200
  
     return response
@@ -216,19 +451,20 @@ def set_current_entry(ns, vnf, idx, params):
     idx: vnf index inside network service descriptor
     message: dict of key, value pair(s)
     """
-    global c_ns_configuration
-    vnfs = c_ns_configuration.setdefault(ns, {})
-    idxes = vnfs.setdefault(vnf, {})
-    # actual update
-    e = idxes.setdefault(idx, {})
-    e.setdefault('action_params', {}).update(params)
+    with c_ns_configuration.lock:
+        try:
+            e = dict(c_ns_configuration.get(ns, vnf, idx))
+        except KeyError:
+            e = {}
+        # actual update
+        e['action_params'] = dict(e.get('action_params', {}), **params)
+        c_ns_configuration.put(ns, vnf, idx, e)
 
 
 @proxy.route('/current_conf/<ns>/<vnf>/<idx>', methods=['DELETE'])
 def delete_current_vnf_idx_entry(ns, vnf, idx):
-    global c_ns_configuration
     try:
-        del c_ns_configuration[ns][vnf][idx]
+        c_ns_configuration.delete(ns, vnf, idx)
     except:
         pass
 
@@ -238,7 +474,7 @@ def delete_current_vnf_idx_entry(ns, vnf, idx):
             'ns': ns,
             'vnf': vnf,
             'idx': idx,
-            'current_dict': c_ns_configuration,
+            'current_dict': c_ns_configuration.all(),
             })
     return ('OK', 200)
 
@@ -254,12 +490,9 @@ def create_config_entry(ns, vnf, idx):
             raise Exception('data payload is not a dictionary')
 
         params = dict(message)
-        vnf_params = {idx: params}
-        global ns_configuration
-        vnfs = ns_configuration.setdefault(ns, {})
-        vnfs.setdefault(vnf, {}).update(vnf_params)
+        ns_configuration.put(ns, vnf, idx, params)
     
-        print(ns_configuration)
+        print(ns_configuration.all())
         return ('OK', 200)
 
     except Exception as e:
@@ -273,7 +506,7 @@ def create_config_entry(ns, vnf, idx):
 @proxy.route('/conf/<ns>/<vnf>/<idx>', methods=['GET'])
 def get_config_entry(ns, vnf, idx):
     try:
-        params = ns_configuration[ns][vnf][idx]
+        params = ns_configuration.get(ns, vnf, idx)
         response = flask.jsonify(params)
         response.status_code = 200
 
@@ -292,7 +525,7 @@ def get_config_entry(ns, vnf, idx):
 @proxy.route('/conf/<ns>', methods=['GET'])
 def get_config_ns(ns):
     try:
-        data = ns_configuration[ns]
+        data = ns_configuration.get_ns(ns)
         response = flask.jsonify(data)
         response.status_code = 200
 
@@ -310,9 +543,9 @@ def get_config_ns(ns):
 
 @proxy.route('/conf/<ns>', methods=['DELETE'])
 def delete_config_ns(ns):
-    global ns_configuration
+    resolver_cache.invalidate('instance', ns)
     try:
-        del ns_configuration[ns]
+        ns_configuration.delete_ns(ns)
         return ('OK', 200)
 
     except KeyError as e:
@@ -358,19 +591,16 @@ def reconfigure(tenant_name, instance_name, vnf_name):
             response.status_code = code
             return response
 
-        r = _tenants_get()
-        t = find(r.json()['tenants'], lambda t: t['name'] == tenant_name)
+        t = _tenant_resolve(tenant_name)
         if not t:
             return _error_response(
                 'tenant_name %s does not exist' %
                 str(tenant_name))
 
-        r = _instances_get(t['uuid'])
-        i = find(r.json()['instances'], lambda i: i['name'] == instance_name)
-        if not i:
+        r = _instance_get_by_name(t['uuid'], instance_name)
+        if r is None:
             return _error_response(
                 'instance_name %s does not exist' % str(instance_name))            
-        r = _instance_get(t['uuid'], i['uuid'])
         vnfr = find(r.json()['vnfs'], lambda v: v['vnf_name'] == vnf_name)
 
         if not vnfr:
@@ -401,8 +631,7 @@ def reconfigure(tenant_name, instance_name, vnf_name):
         flowId = vim_info['flowId']
         activationId = vnfr_vm[RO_LABEL_VIM_VM_ID]
 
-        r = _datacenter_get(t['uuid'], datacenter_id)
-        datacenter = r.json().get('datacenter', {})
+        datacenter = _datacenter_resolve(t['uuid'], datacenter_id)
         owAPIHost = datacenter.get('vim_url')
         if not owAPIHost:
             return _error_response(
@@ -431,7 +660,7 @@ def reconfigure(tenant_name, instance_name, vnf_name):
 
             print('Applying VIM configuration...\n')
             try:
-                p = ns_configuration[instance_name][vnf_name_base][idx]['action_params']
+                p = ns_configuration.get(instance_name, vnf_name_base, idx)['action_params']
             except Exception as e:
                 p = {}
                 print('Unable to retrieve persisted day0 parameters for '
@@ -444,14 +673,14 @@ def reconfigure(tenant_name, instance_name, vnf_name):
             '''
             set_current_entry(instance_name, vnf_name_base, idx, params)
             print ('Successfully update current entry: %s\n' %
-                   c_ns_configuration[instance_name][vnf_name_base][idx])
+                   c_ns_configuration.get(instance_name, vnf_name_base, idx))
 
 
             add_p = dict((k, p[k]) for k, v in p.iteritems() if k not in params)
             params.update(add_p)
             # update with current overriding any exiting key
             try:
-                c_p = c_ns_configuration[instance_name][vnf_name_base][idx]['action_params']
+                c_p = c_ns_configuration.get(instance_name, vnf_name_base, idx)['action_params']
             except Exception as e:
                 c_p= {}
                 print('Unable to retrieve current parameters for '
@@ -478,20 +707,27 @@ def reconfigure(tenant_name, instance_name, vnf_name):
         else:
             host_ip = vim_info['host_ip']
             port = vim_info['service']['service_ports'][VNF_CONF_PORT]
-            url = 'http://'+host_ip+':'+str(port)+'/conf/'
+            url = 'http://'+host_ip+':'+str(port)+'/conf'
 
             print('Applying day 1 configuration to url %s...' % url)
             params = coe_action_params.get('action_params', {})
-            for k in params:
-                print('Push: \'%s\', \'%s\'' % (k, params[k]))
-                r = requests.post('%s%s' % (url, k),
-                    headers=headers, json={'value' : params[k]})
-                if 400 <= r.status_code < 600:
-                    raise Exception(r.text)
+            print('Push: %s' % params)
+            # all parameters in one go, applied atomically
+            r = requests.post(url, headers=headers, json={'value' : params})
+            if r.status_code in (404, 405):
+                # conf service of older action pods
+                for k in params:
+                    print('Push: \'%s\', \'%s\'' % (k, params[k]))
+                    r = requests.post('%s/%s' % (url, k),
+                        headers=headers, json={'value' : params[k]})
+                    if 400 <= r.status_code < 600:
+                        raise Exception(r.text)
+            elif 400 <= r.status_code < 600:
+                raise Exception(r.text)
             print('Applying Done\n')
             set_current_entry(instance_name, vnf_name_base, idx, params)
             print ('Successfully update current entry: %s\n' %
-                   c_ns_configuration[instance_name][vnf_name_base][idx])
+                   c_ns_configuration.get(instance_name, vnf_name_base, idx))
 
         return ('OK', 200)
 
@@ -677,54 +913,54 @@ def instance_get_single(tenant_name, instance_name):
     return response
 
 
+def _instance_result(tenant_id, instance_id):
+    """
+    Retrieve network service and convert it into instances_all result.
+    If it could not be retrieved (e.g. deleted meanwhile), the result is an
+    error entry: {'uuid': <instance_id>, 'error': <reason>}
+    """
+    try:
+        return _from_nsr_to_result(_instance_get(tenant_id, instance_id))
+    except Exception as e:
+        print('Unable to retrieve instance %s: %s' % (instance_id, str(e)))
+        return {'uuid': instance_id, 'error': str(e)}
+
+
 @proxy.route('/<tenant_name>/instances_all', methods=['GET'])
 def vnf_instances_all(tenant_name):
-    results = []
-    r = requests.get(
-        'http://%(mano_host)s:%(mano_port)s/openmano/tenants' %
-        {
-            'mano_host': mano_host,
-            'mano_port': mano_port,
-        }, verify=False)
-
-    print("requestAction: Received: %s" % r.text)
+    results = instances_cache.lookup(('instances_all', tenant_name))
+    if results is not None:
+        response = flask.jsonify(results)
+        response.status_code = 200
+        return response
 
-    r.raise_for_status()
-    t = find(r.json()['tenants'], lambda t: t['name'] == tenant_name)
+    t = _tenant_resolve(tenant_name)
     if not t:
         response = flask.jsonify({'error': 'tenant_name %s does not exist'
                                   % str(tenant_name)})
         response.status_code = 404
         return response
 
-    r = requests.get(
-        'http://%(mano_host)s:%(mano_port)s/openmano/%(tenant_id)s/instances' %
-        {
-            'mano_host': mano_host,
-            'mano_port': mano_port,
-            'tenant_id': t['uuid'],
-        }, verify=False)
-
-    print("requestAction: Received: %s" % r.text)
-    r.raise_for_status()
-
-    for instance in r.json()['instances']:
-        r = requests.get(
-            'http://%(mano_host)s:%(mano_port)s/openmano/%(tenant_id)s/instances/%(instance_id)s' %
-            {
-                'mano_host': mano_host,
-                'mano_port': mano_port,
-                'tenant_id': t['uuid'],
-                'instance_id': instance['uuid']
-            }, verify=False)
-        print("requestAction: Received: %s" % r.text)
-        r.raise_for_status()
-        result = _from_nsr_to_result(r)
-        results.append(result)
-
-    response = flask.jsonify(results)
-    response.status_code = 200
-    return response
+    r = _instances_get(t['uuid'])
+    instances = r.json()['instances']
+
+    def generate():
+        """
+        Stream the results array, an instance as soon as it is retrieved
+        """
+        results = []
+        yield '['
+        for result in instances_pool.imap_unordered(
+                lambda i: _instance_result(t['uuid'], i['uuid']), instances):
+            yield (',' if results else '') + json.dumps(result)
+            results.append(result)
+        yield ']'
+        # only cache complete results
+        if not any('error' in r for r in results):
+            instances_cache.put(('instances_all', tenant_name), results)
+
+    return flask.Response(generate(), status=200,
+                          mimetype='application/json')
 
 #############  WORKAROUND FOR RETRIEVING FAAS VNFR DATA END ###############
 
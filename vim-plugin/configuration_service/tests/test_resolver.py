@@ -0,0 +1,127 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+# in memory stores
+os.environ['CONF_DB'] = ''
+
+import faas_configuration_service as service
+
+
+class Response(object):
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def json(self):
+        return self.body
+
+
+def not_found():
+    e = service.HTTPError('404 Client Error')
+    e.response = Response({}, 404)
+    return e
+
+
+class ResolverCacheTest(unittest.TestCase):
+
+    def test_resolved_once(self):
+        cache = service.ResolverCache(60)
+        calls = []
+
+        def resolve():
+            calls.append(1)
+            return 'v'
+        self.assertEqual(cache.get(('tenant', 't'), resolve), 'v')
+        self.assertEqual(cache.get(('tenant', 't'), resolve), 'v')
+        self.assertEqual(len(calls), 1)
+
+    def test_not_found_not_cached(self):
+        cache = service.ResolverCache(60)
+        self.assertIsNone(cache.get(('tenant', 't'), lambda: None))
+        self.assertEqual(cache.get(('tenant', 't'), lambda: 'v'), 'v')
+
+    def test_expiry(self):
+        cache = service.ResolverCache(60)
+        cache.put(('tenant', 't'), 'old')
+        value, expiry = cache.entries[('tenant', 't')]
+        cache.entries[('tenant', 't')] = (value, time.time() - 1)
+        self.assertIsNone(cache.lookup(('tenant', 't')))
+        self.assertEqual(cache.get(('tenant', 't'), lambda: 'new'), 'new')
+
+    def test_disabled(self):
+        cache = service.ResolverCache(0)
+        cache.put(('tenant', 't'), 'v')
+        self.assertIsNone(cache.lookup(('tenant', 't')))
+
+    def test_invalidate(self):
+        cache = service.ResolverCache(60)
+        for key in (('instance', 'a', 't1'), ('instance', 'a', 't2'),
+                    ('instance', 'b', 't1'), ('tenant', 'a')):
+            cache.put(key, 'v')
+        cache.invalidate('instance', 'a')
+        self.assertEqual(sorted(cache.entries),
+                         [('instance', 'b', 't1'), ('tenant', 'a')])
+        cache.invalidate()
+        self.assertEqual(cache.entries, {})
+
+
+class InstanceGetByNameTest(unittest.TestCase):
+
+    def setUp(self):
+        saved = dict((name, getattr(service, name)) for name in
+                     ('_instances_get', '_instance_get', 'resolver_cache'))
+
+        def restore():
+            for name, value in saved.items():
+                setattr(service, name, value)
+        self.addCleanup(restore)
+        service.resolver_cache = service.ResolverCache(60)
+        # the RO state: instance name -> uuid
+        self.instances = {'ns': 'uuid1'}
+        self.listed = 0
+        self.fetched = []
+
+        def instances_get(tenant_id):
+            self.listed += 1
+            return Response({'instances': [
+                {'name': name, 'uuid': uuid}
+                for name, uuid in self.instances.items()]})
+
+        def instance_get(tenant_id, uuid):
+            self.fetched.append(uuid)
+            if uuid not in self.instances.values():
+                raise not_found()
+            return Response({'uuid': uuid})
+        service._instances_get = instances_get
+        service._instance_get = instance_get
+
+    def test_cached(self):
+        for _ in range(2):
+            r = service._instance_get_by_name('t', 'ns')
+            self.assertEqual(r.json(), {'uuid': 'uuid1'})
+        self.assertEqual(self.listed, 1)
+
+    def test_re_resolved_when_stale(self):
+        service._instance_get_by_name('t', 'ns')
+        # re-created under the same name
+        self.instances['ns'] = 'uuid2'
+        r = service._instance_get_by_name('t', 'ns')
+        self.assertEqual(r.json(), {'uuid': 'uuid2'})
+        self.assertEqual(self.fetched, ['uuid1', 'uuid1', 'uuid2'])
+        self.assertEqual(self.listed, 2)
+
+    def test_deleted(self):
+        service._instance_get_by_name('t', 'ns')
+        del self.instances['ns']
+        self.assertIsNone(service._instance_get_by_name('t', 'ns'))
+
+    def test_not_found(self):
+        self.assertIsNone(service._instance_get_by_name('t', 'other'))
+
+
+if __name__ == '__main__':
+    unittest.main()
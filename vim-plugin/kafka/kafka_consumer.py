@@ -13,20 +13,32 @@
  #  limitations under the License.
 
 
+import collections
 import json
+from multiprocessing.pool import ThreadPool
 import requests
+from requests.adapters import HTTPAdapter
+import time
 
 from kafka import KafkaConsumer, KafkaProducer
 from kafka.errors import KafkaError
 
 from kafka_settings import KAFKA_SERVER, KAFKA_CONFIGURATION_TOPIC, \
-    KAFKA_CLIENT_ID, KAFKA_API_VERSION, KAFKA_GROUP_ID
+    KAFKA_CLIENT_ID, KAFKA_API_VERSION, KAFKA_GROUP_ID, \
+    KAFKA_MAX_POLL_RECORDS, RECONFIGURE_WORKERS, RECONFIGURE_ATTEMPTS, \
+    RECONFIGURE_BACKOFF, RECONFIGURE_WINDOW, KAFKA_DEAD_LETTER_TOPIC
 
 
 OSM_VERSION = "v5.0.5"
 FAAS_VERSION = "v2.0.2"
 LOG_PREFIX = ">>>>>>>>> " + OSM_VERSION + " " + FAAS_VERSION
 
+# message keys replacing the whole placement of a previous message
+PLACEMENT_KEYS = ('invoker-selector', 'action-antiaffinity')
+
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_maxsize=RECONFIGURE_WORKERS))
+
 
 def _to_reconfigure_payload(**kwargs):
     """
@@ -81,7 +93,7 @@ def reconfigure(osm_ip_address, ns_name, vnf_name, vnf_index, payload=None):
                 })
 
     headers = {'Content-Type': 'application/json'}
-    r = requests.post(
+    r = session.post(
         'http://%(osm_ip_address)s/osm/reconfigure/%(ns_name)s/%(vnf_name)s.%(vnf_index)s' %
         {
             'osm_ip_address': osm_ip_address,
@@ -96,6 +108,139 @@ def reconfigure(osm_ip_address, ns_name, vnf_name, vnf_index, payload=None):
     return r
 
 
+def _coalesce(message, update):
+    """
+    Merge a configuration message superseded by update into the message
+    equivalent to applying both in order: action parameters are merged,
+    update overriding, and the latest placement is kept.
+
+    :param message: earlier message. None if there is none
+    :type message: ``dict``
+
+    :param update: later message of the same ns/vnf/index
+    :type update: ``dict``
+    """
+    if message is None:
+        return update
+    merged = dict(message)
+    if update.get('invoker-selector'):
+        for k in PLACEMENT_KEYS:
+            merged.pop(k, None)
+    merged.update(update)
+    action_params = dict(message.get('action_params', {}))
+    action_params.update(update.get('action_params', {}))
+    merged['action_params'] = action_params
+    return merged
+
+
+def _batch_messages(records, messages, offsets=None):
+    """
+    Decode the FaaS messages of a polled batch, coalesced per ns/vnf/index
+
+    :param records: records polled, by topic partition
+    :type records: ``dict``
+
+    :param messages: message by (ns_name, vnf_name, vnf_index), in arrival
+                     order, to add the decoded messages to
+    :type messages: ``collections.OrderedDict``
+
+    :param offsets: if given, offset of the first record coalesced into each
+                    message, by topic partition, to add the batch to
+    :type offsets: ``dict``
+    """
+    for tp in records:
+        for msg in records[tp]:
+            try:
+                key = msg.key.decode('utf-8')
+                message = json.loads(msg.value.decode('utf-8'))
+                print(LOG_PREFIX + ' key: {} has value {}'.format(key, message))
+                if key == '"faas"':
+                    k = (message['ns_name'], message['vnf_name'],
+                         message['vnf_index'])
+                    messages[k] = _coalesce(messages.get(k), message)
+                    if offsets is not None:
+                        offsets.setdefault(k, {}).setdefault(tp, msg.offset)
+                else:
+                    print (LOG_PREFIX + 'Not FaaS message. Ignoring ...')
+            except Exception as e:
+                print (LOG_PREFIX + 'Exception: %s' % str(e))
+
+
+def _apply(message):
+    """
+    Reconfigure the VNF of the given message, retrying server and connection
+    errors.
+
+    :return: the last error if it still fails with such an error after
+             RECONFIGURE_ATTEMPTS, None otherwise (client errors are logged
+             and dropped)
+    """
+    error = None
+    for attempt in range(RECONFIGURE_ATTEMPTS):
+        if attempt:
+            time.sleep(RECONFIGURE_BACKOFF * 2 ** (attempt - 1))
+        try:
+            payload = _to_reconfigure_payload(**message)
+            reconfigure('127.0.0.1:5001', ns_name=message['ns_name'],
+                        vnf_name=message['vnf_name'],
+                        vnf_index=message['vnf_index'],
+                        payload=payload)
+            return None
+        except requests.exceptions.RequestException as e:
+            print (LOG_PREFIX + 'Exception: %s' % str(e))
+            if e.response is not None and e.response.status_code < 500:
+                return None
+            error = e
+        except Exception as e:
+            print (LOG_PREFIX + 'Exception: %s' % str(e))
+            return None
+    return error
+
+
+def _dead_letter(producer, message, error):
+    """
+    Give up on a message: log it and send it to the dead letter topic along
+    with its error
+    """
+    print (LOG_PREFIX + 'Giving up on message %s: %s' % (message, str(error)))
+    try:
+        producer.send(KAFKA_DEAD_LETTER_TOPIC, key='faas',
+                      value={'message': message, 'error': str(error)})
+    except KafkaError as e:
+        print (LOG_PREFIX + 'Dead letter failed: %s' % str(e))
+
+
+def _handle_failures(consumer, producer, messages, offsets, errors):
+    """
+    Dead letter the messages of a batch which failed, so that they do not
+    hold back the others. Without dead letter producer, rewind the consumer
+    to the first of them per topic partition instead: the next commit does
+    not go past them and they are polled again, along with the ones after
+    them.
+
+    :param messages: messages of the batch, see _batch_messages
+    :param offsets: their offsets, see _batch_messages
+    :param errors: error (None if applied) of each of the messages, in order
+    :type errors: ``list``
+    """
+    rewind = {}
+    for k, error in zip(messages, errors):
+        if error is None:
+            continue
+        if producer is not None:
+            _dead_letter(producer, messages[k], error)
+            continue
+        print (LOG_PREFIX + 'Retrying message %s: %s'
+               % (messages[k], str(error)))
+        for tp, offset in offsets[k].items():
+            rewind[tp] = min(offset, rewind.get(tp, offset))
+    if producer is not None:
+        producer.flush()
+    # commit() commits the consumed positions, the rewound ones included
+    for tp, offset in rewind.items():
+        consumer.seek(tp, offset)
+
+
 def main():
     print ('\n\n-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-=-')
     print ("Starting Configuration Kafka bridge...\n\n"
@@ -109,27 +254,43 @@ def main():
     consumer = KafkaConsumer(
         bootstrap_servers=KAFKA_SERVER,
         client_id=KAFKA_CLIENT_ID,
-        enable_auto_commit=True,
+        enable_auto_commit=False,
+        max_poll_records=KAFKA_MAX_POLL_RECORDS,
         api_version=KAFKA_API_VERSION,
         group_id=KAFKA_GROUP_ID)
 
     consumer.subscribe(pattern=KAFKA_CONFIGURATION_TOPIC)
+    pool = ThreadPool(RECONFIGURE_WORKERS)
+    producer = None
+    if KAFKA_DEAD_LETTER_TOPIC:
+        producer = KafkaProducer(
+            bootstrap_servers=KAFKA_SERVER,
+            api_version=KAFKA_API_VERSION,
+            value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+            key_serializer=lambda v: json.dumps(v).encode('utf-8'))
+
+    while True:
+        records = consumer.poll(timeout_ms=1000)
+        if not records:
+            continue
+        # collect the window, a VNF appears once per batch and batches are
+        # applied one after the other, which keeps the order of its messages
+        messages = collections.OrderedDict()
+        offsets = {}
+        deadline = time.time() + RECONFIGURE_WINDOW
+        while records:
+            _batch_messages(records, messages, offsets)
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            records = consumer.poll(timeout_ms=int(timeout * 1000))
 
-    for msg in consumer:
+        errors = pool.map(_apply, messages.values())
+        _handle_failures(consumer, producer, messages, offsets, errors)
         try:
-            key = msg.key.decode('utf-8')
-            message = json.loads(msg.value.decode('utf-8'))
-            print(LOG_PREFIX + ' key: {} has value {}'.format(key, message))
-            if key == '"faas"':
-                payload = _to_reconfigure_payload(**message)
-                reconfigure('127.0.0.1:5001', ns_name=message['ns_name'],
-                            vnf_name=message['vnf_name'],
-                            vnf_index=message['vnf_index'],
-                            payload=payload)
-            else:
-                print (LOG_PREFIX + 'Not FaaS message. Ignoring ...')
-        except Exception as e:
-            print (LOG_PREFIX + 'Exception: %s' % str(e))
+            consumer.commit()
+        except KafkaError as e:
+            print (LOG_PREFIX + 'Commit failed: %s' % str(e))
 
 
 if __name__ == '__main__':
@@ -6,3 +6,17 @@ KAFKA_CONFIGURATION_TOPIC = 'ns.instances.conf'
 KAFKA_CLIENT_ID = 'faas_vim_conf'
 KAFKA_API_VERSION = (1, 1, 0)
 KAFKA_GROUP_ID = 'FAAS_CONFIGURATION_CG'
+# max number of messages handled per batch
+KAFKA_MAX_POLL_RECORDS = int(os.environ.get("KAFKA_MAX_POLL_RECORDS", "100"))
+# seconds messages are collected for before being applied, so that those of
+# the same VNF are coalesced into one reconfigure
+RECONFIGURE_WINDOW = float(os.environ.get("RECONFIGURE_WINDOW", "0"))
+
+# number of VNFs reconfigured concurrently
+RECONFIGURE_WORKERS = int(os.environ.get("RECONFIGURE_WORKERS", "8"))
+# attempts of a reconfigure failing with a server/connection error
+RECONFIGURE_ATTEMPTS = int(os.environ.get("RECONFIGURE_ATTEMPTS", "3"))
+RECONFIGURE_BACKOFF = float(os.environ.get("RECONFIGURE_BACKOFF", "1"))
+# topic messages still failing after RECONFIGURE_ATTEMPTS are sent to. If
+# empty, offsets are not committed past them and they are polled again
+KAFKA_DEAD_LETTER_TOPIC = os.environ.get("KAFKA_DEAD_LETTER_TOPIC", "")
@@ -0,0 +1,94 @@
+import collections
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import kafka_consumer
+from kafka_consumer import _coalesce
+
+
+class Record(object):
+    def __init__(self, value, key='"faas"', offset=0):
+        self.offset = offset
+        self.key = key.encode('utf-8')
+        self.value = value if isinstance(value, bytes) else \
+            json.dumps(value).encode('utf-8')
+
+
+def message(ns='ns', **kwargs):
+    return dict(ns_name=ns, vnf_name='vnf', vnf_index='1', **kwargs)
+
+
+class CoalesceTest(unittest.TestCase):
+
+    def test_first(self):
+        m = message(action_params={'a': 1})
+        self.assertIs(_coalesce(None, m), m)
+
+    def test_action_params_merged(self):
+        merged = _coalesce(message(action_params={'a': 1, 'b': 1}),
+                           message(action_params={'b': 2, 'c': 2}))
+        self.assertEqual(merged['action_params'], {'a': 1, 'b': 2, 'c': 2})
+
+    def test_placement_kept(self):
+        merged = _coalesce(message(**{'invoker-selector': 'gpu',
+                                      'action-antiaffinity': 'true'}),
+                           message(action_params={'a': 1}))
+        self.assertEqual(merged['invoker-selector'], 'gpu')
+        self.assertEqual(merged['action-antiaffinity'], 'true')
+        self.assertEqual(merged['action_params'], {'a': 1})
+
+    def test_placement_replaced(self):
+        # a new placement without anti-affinity drops the former one
+        merged = _coalesce(message(**{'invoker-selector': 'gpu',
+                                      'action-antiaffinity': 'true'}),
+                           message(**{'invoker-selector': 'cpu'}))
+        self.assertEqual(merged['invoker-selector'], 'cpu')
+        self.assertNotIn('action-antiaffinity', merged)
+
+    def test_inputs_untouched(self):
+        first = message(action_params={'a': 1})
+        _coalesce(first, message(action_params={'a': 2}))
+        self.assertEqual(first, message(action_params={'a': 1}))
+
+    def test_same_as_applying_in_order(self):
+        payload = kafka_consumer._to_reconfigure_payload(**_coalesce(
+            message(action_params={'a': 1}, **{'invoker-selector': 'gpu'}),
+            message(action_params={'b': 2})))
+        self.assertEqual(
+            payload['coe_action_params']['action_params'], {'a': 1, 'b': 2})
+        self.assertEqual(
+            payload['coe_action_params']['annotations'][0]['value']
+            ['invoker-selector'], {'processor': 'gpu'})
+
+
+class BatchMessagesTest(unittest.TestCase):
+
+    def test_coalesced_per_vnf_in_order(self):
+        messages = collections.OrderedDict()
+        kafka_consumer._batch_messages({'tp0': [
+            Record(message('b', action_params={'x': 1})),
+            Record(message('a', action_params={'x': 1})),
+            Record(message('b', action_params={'x': 2})),
+        ]}, messages)
+        self.assertEqual(list(messages),
+                         [('b', 'vnf', '1'), ('a', 'vnf', '1')])
+        self.assertEqual(messages[('b', 'vnf', '1')]['action_params'],
+                         {'x': 2})
+
+    def test_ignored(self):
+        messages = collections.OrderedDict()
+        kafka_consumer._batch_messages({'tp0': [
+            Record(message(), key='"other"'),
+            Record(b'not json'),
+            Record({'ns_name': 'ns'}),
+        ]}, messages)
+        self.assertEqual(messages, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import collections
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+import requests
+
+import kafka_consumer
+
+
+class Response(object):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def http_error(status_code):
+    e = requests.exceptions.HTTPError('HTTP %d' % status_code)
+    e.response = Response(status_code)
+    return e
+
+
+class Record(object):
+    def __init__(self, offset, value, key='"faas"'):
+        self.offset = offset
+        self.key = key.encode('utf-8')
+        self.value = json.dumps(value).encode('utf-8')
+
+
+class Consumer(object):
+    def __init__(self):
+        self.seeks = {}
+
+    def seek(self, tp, offset):
+        self.seeks[tp] = offset
+
+
+class Producer(object):
+    def __init__(self):
+        self.sent = []
+        self.flushed = False
+
+    def send(self, topic, key=None, value=None):
+        self.sent.append((topic, value))
+
+    def flush(self):
+        self.flushed = True
+
+
+def message(ns, **kwargs):
+    return dict(ns_name=ns, vnf_name='vnf', vnf_index='1', **kwargs)
+
+
+class ApplyTest(unittest.TestCase):
+
+    def setUp(self):
+        saved = kafka_consumer.reconfigure, kafka_consumer.RECONFIGURE_BACKOFF
+
+        def restore():
+            kafka_consumer.reconfigure, kafka_consumer.RECONFIGURE_BACKOFF = saved
+        self.addCleanup(restore)
+        kafka_consumer.RECONFIGURE_BACKOFF = 0
+        self.calls = 0
+
+    def failing(self, *errors):
+        errors = list(errors)
+
+        def reconfigure(*args, **kwargs):
+            self.calls += 1
+            if errors:
+                raise errors.pop(0)
+        kafka_consumer.reconfigure = reconfigure
+
+    def test_applied(self):
+        self.failing()
+        self.assertIsNone(kafka_consumer._apply(message('ns')))
+        self.assertEqual(self.calls, 1)
+
+    def test_retried(self):
+        self.failing(http_error(503),
+                     requests.exceptions.ConnectionError('refused'))
+        self.assertIsNone(kafka_consumer._apply(message('ns')))
+        self.assertEqual(self.calls, 3)
+
+    def test_gives_up(self):
+        error = http_error(500)
+        self.failing(*[error] * kafka_consumer.RECONFIGURE_ATTEMPTS)
+        self.assertIs(kafka_consumer._apply(message('ns')), error)
+        self.assertEqual(self.calls, kafka_consumer.RECONFIGURE_ATTEMPTS)
+
+    def test_client_error_dropped(self):
+        self.failing(http_error(404))
+        self.assertIsNone(kafka_consumer._apply(message('ns')))
+        self.assertEqual(self.calls, 1)
+
+
+class HandleFailuresTest(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = collections.OrderedDict()
+        self.offsets = {}
+        kafka_consumer._batch_messages({
+            'tp0': [Record(5, message('a')), Record(6, message('b')),
+                    Record(7, message('a')), Record(8, message('c'))],
+            'tp1': [Record(3, message('c')), Record(4, message('b'))]
+        }, self.messages, self.offsets)
+        self.consumer = Consumer()
+
+    def errors(self, failed):
+        return [Exception('boom') if k[0] in failed else None
+                for k in self.messages]
+
+    def test_offsets(self):
+        self.assertEqual(self.offsets[('a', 'vnf', '1')], {'tp0': 5})
+        self.assertEqual(self.offsets[('b', 'vnf', '1')],
+                         {'tp0': 6, 'tp1': 4})
+
+    def test_dead_lettered(self):
+        producer = Producer()
+        kafka_consumer._handle_failures(self.consumer, producer,
+                                        self.messages, self.offsets,
+                                        self.errors(['b']))
+        self.assertEqual(producer.sent, [(kafka_consumer.KAFKA_DEAD_LETTER_TOPIC,
+                                          {'message': message(
+                                              'b', action_params={}),
+                                           'error': 'boom'})])
+        self.assertTrue(producer.flushed)
+        self.assertEqual(self.consumer.seeks, {})
+
+    def test_rewound_without_dead_letter_topic(self):
+        kafka_consumer._handle_failures(self.consumer, None, self.messages,
+                                        self.offsets, self.errors(['b', 'c']))
+        self.assertEqual(self.consumer.seeks, {'tp0': 6, 'tp1': 3})
+
+    def test_all_applied(self):
+        kafka_consumer._handle_failures(self.consumer, None, self.messages,
+                                        self.offsets, self.errors([]))
+        self.assertEqual(self.consumer.seeks, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,11 +16,15 @@
 import base64
 import json
 import logging
+from multiprocessing.pool import ThreadPool
 import os
 import re
 import requests
+import threading
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError
 import vimconn
+import time
 import urllib
 import uuid
 
@@ -36,6 +40,18 @@ ANNOTATION_PLACEMENT = 'placement'
 URL_NOPORT_REGEX = re.compile('https?:\/\/[^:\/]+')
 
 
+# Defaults for the pooled HTTP sessions kept by vimconnector. Can be
+# overridden through the VIM config
+HTTP_POOL_CONNECTIONS = 4
+HTTP_POOL_MAXSIZE = 16
+# None means wait forever (requests default)
+HTTP_TIMEOUT = None
+
+# Defaults for the concurrent refresh_vms_status sweep
+REFRESH_VMS_WORKERS = 8
+REFRESH_VMS_TIMEOUT = 60
+
+
 actionStatus2manoFormat = {
     'not found': 'ACTIVE',
     'success': 'INACTIVE',
@@ -45,6 +61,34 @@ actionStatus2manoFormat = {
 }
 
 
+def _http(session):
+    """
+    Return the given pooled session, falling back to the requests module
+    (i.e. a new connection per call) when no session supplied
+    """
+    return session if session is not None else requests
+
+
+def _build_session(pool_connections, pool_maxsize):
+    """
+    Build a keep-alive session whose connection pools are shared by all
+    requests issued against the same host
+
+    :param pool_connections: Number of per-host connection pools to cache
+    :type pool_connections: ``int``
+
+    :param pool_maxsize: Maximum number of connections kept alive per host
+    :type pool_maxsize: ``int``
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.verify = False
+    return session
+
+
 def _raise_if_api_exception(resp):
     if 400 <= resp.status_code < 500 or 500 <= resp.status_code < 600:
         try:
@@ -108,7 +152,8 @@ def validate_action_name(action_name):
             action_name)
 
 
-def clearCurrentParameters(logger, configAPIHost, name):
+def clearCurrentParameters(logger, configAPIHost, name, session=None,
+                           timeout=None):
     """
     Clear current dynamic parameters for vnf denoted by the name parameter
 
@@ -132,6 +177,12 @@ def clearCurrentParameters(logger, configAPIHost, name):
                 Example: star_balls-2-5G MEDIA vTranscoder VM-1
     :type name: ``str``
 
+    :param session: Pooled session to issue the request on (optional)
+    :type session: ``requests.Session``
+
+    :param timeout: Request timeout in seconds (optional)
+    :type timeout: ``float``
+
     """
     parts = name.split('-')
     if len(parts) != 4:
@@ -150,14 +201,14 @@ def clearCurrentParameters(logger, configAPIHost, name):
                     'vdu_name': vdu_name,
                     'idx': idx
                 })
-    r = requests.delete(
+    r = _http(session).delete(
         '%(configAPIHost)s/current_conf/%(ns_name)s/%(vdu_name)s/%(idx)s' %
         {
             'configAPIHost': configAPIHost,
             'ns_name': ns_name,
             'vdu_name': urllib.quote(vdu_name),
             'idx': idx,
-        }, verify=False)
+        }, verify=False, timeout=timeout)
 
     logger.info(LOG_PREFIX + "clearCurrentParameters: Received: %s" % r.text)
     _raise_if_api_exception(r)
@@ -166,7 +217,8 @@ def clearCurrentParameters(logger, configAPIHost, name):
     return r
 
 
-def requestParameters(logger, configAPIHost, name):
+def requestParameters(logger, configAPIHost, name, session=None,
+                      timeout=None):
     """
     Get parameters for vnf denoted by the name parameter
 
@@ -190,6 +242,12 @@ def requestParameters(logger, configAPIHost, name):
                 Example: star_balls-2-5G MEDIA vTranscoder VM-1
     :type name: ``str``
 
+    :param session: Pooled session to issue the request on (optional)
+    :type session: ``requests.Session``
+
+    :param timeout: Request timeout in seconds (optional)
+    :type timeout: ``float``
+
     """
     parts = name.split('-')
     if len(parts) != 4:
@@ -208,14 +266,14 @@ def requestParameters(logger, configAPIHost, name):
                     'vdu_name': vdu_name,
                     'idx': idx
                 })
-    r = requests.get(
+    r = _http(session).get(
         '%(configAPIHost)s/conf/%(ns_name)s/%(vdu_name)s/%(idx)s' %
         {
             'configAPIHost': configAPIHost,
             'ns_name': ns_name,
             'vdu_name': urllib.quote(vdu_name),
             'idx': idx,
-        }, verify=False)
+        }, verify=False, timeout=timeout)
 
     logger.info(LOG_PREFIX + "requestParameters: Received: %s" % r.text)
     _raise_if_api_exception(r)
@@ -224,7 +282,8 @@ def requestParameters(logger, configAPIHost, name):
     return r
 
 
-def requestAction(logger, owAPIHost, owb64APIKey, action_name):
+def requestAction(logger, owAPIHost, owb64APIKey, action_name, session=None,
+                  timeout=None):
     """
     Get the given action from openwhisk service denoted by owAPIHost
 
@@ -239,6 +298,12 @@ def requestAction(logger, owAPIHost, owb64APIKey, action_name):
     :param action_name: Fully qualified action name (e.g. /namespace/pkg/action)
     :type action_name: ``str``
 
+    :param session: Pooled session to issue the request on (optional)
+    :type session: ``requests.Session``
+
+    :param timeout: Request timeout in seconds (optional)
+    :type timeout: ``float``
+
     """
     logger.debug(LOG_PREFIX + "requestAction: '%(owAPIHost)s' '%(owb64APIKey)s' "
                  "'%(action_name)s'" %
@@ -256,7 +321,7 @@ def requestAction(logger, owAPIHost, owb64APIKey, action_name):
             action_name)
 
     headers = {'Authorization' : 'Basic %s' % owb64APIKey}
-    r = requests.get(
+    r = _http(session).get(
         '%(owAPIHost)s/api/v1/namespaces/%(namespace)s/actions/'
         '%(package)s/%(action)s' %
         {
@@ -264,7 +329,7 @@ def requestAction(logger, owAPIHost, owb64APIKey, action_name):
             'namespace': parts[1],
             'package': parts[2],
             'action': parts[3],
-        }, headers=headers, verify=False)
+        }, headers=headers, verify=False, timeout=timeout)
 
     logger.info(LOG_PREFIX + "requestAction: Received: %s" % r.text)
     _raise_if_api_exception(r)
@@ -274,7 +339,7 @@ def requestAction(logger, owAPIHost, owb64APIKey, action_name):
 
 
 def invokeAction(logger, owAPIHost, owb64APIKey, action_name, blocking=False,
-                 payload=None):
+                 payload=None, session=None, timeout=None):
     """
     Invoke the given action on openwhisk service denoted by owAPIHost.
     Invocation is done asynch
@@ -295,6 +360,12 @@ def invokeAction(logger, owAPIHost, owb64APIKey, action_name, blocking=False,
     :param payload: Data payload for key value action parameters (optional)
     :type payload: ``dict``
 
+    :param session: Pooled session to issue the request on (optional)
+    :type session: ``requests.Session``
+
+    :param timeout: Request timeout in seconds (optional)
+    :type timeout: ``float``
+
     :return: Request result containing code and text in json format
     """
     logger.debug(LOG_PREFIX + "invokeAction: '%(owAPIHost)s' '%(owb64APIKey)s' "
@@ -314,7 +385,7 @@ def invokeAction(logger, owAPIHost, owb64APIKey, action_name, blocking=False,
 
     headers = {'Content-Type' : 'application/json',
                'Authorization' : 'Basic %s' % owb64APIKey }
-    r = requests.post(
+    r = _http(session).post(
         '%(owAPIHost)s/api/v1/namespaces/%(namespace)s/actions/'
         '%(package)s/%(action)s?blocking=%(blocking)s&result=false' %
         {
@@ -323,7 +394,8 @@ def invokeAction(logger, owAPIHost, owb64APIKey, action_name, blocking=False,
             'package': parts[2],
             'action': parts[3],
             'blocking': 'true' if blocking else 'false'
-        }, headers=headers, json=payload, verify=False)
+        }, headers=headers, json=payload, verify=False,
+        timeout=timeout)
 
     logger.info(LOG_PREFIX + "invokeAction: Received: %s" % r.text)
     _raise_if_api_exception(r)
@@ -336,7 +408,8 @@ COMPLETION_TRIGGER = 'offloadComplete'
 
 
 def invokeOffloadAction(logger, owAPIHost, owb64APIKey, action_name, ro_vim_vm_name,
-                        offload_host, action_name_offloaded, payload=None):
+                        offload_host, action_name_offloaded, payload=None,
+                        session=None, timeout=None):
     """
     Invoke the given action on kubernetes by having openwhisk to offloaf it.
     Invocation is done asynch
@@ -365,6 +438,12 @@ def invokeOffloadAction(logger, owAPIHost, owb64APIKey, action_name, ro_vim_vm_n
                     action_params (optional) - actual action parameters
     :type payload: ``dict``
 
+    :param session: Pooled session to issue the request on (optional)
+    :type session: ``requests.Session``
+
+    :param timeout: Request timeout in seconds (optional)
+    :type timeout: ``float``
+
     :return: Request result containing code and text in json format
     """
     logger.debug(LOG_PREFIX + "invokeOffloadAction: '%(owAPIHost)s' "
@@ -399,7 +478,7 @@ def invokeOffloadAction(logger, owAPIHost, owb64APIKey, action_name, ro_vim_vm_n
     logger.debug(LOG_PREFIX + "invokeOffloadAction: payload_full:%s" %
                  payload_full)
 
-    r = requests.post(
+    r = _http(session).post(
         '%(owAPIHost)s/api/v1/namespaces/%(namespace)s/actions/'
         '%(package)s/%(action)s?blocking=false&result=false' %
         {
@@ -407,7 +486,8 @@ def invokeOffloadAction(logger, owAPIHost, owb64APIKey, action_name, ro_vim_vm_n
             'namespace': parts[1],
             'package': parts[2],
             'action': parts[3],
-        }, headers=headers, json=payload_full, verify=False)
+        }, headers=headers, json=payload_full, verify=False,
+        timeout=timeout)
 
     logger.info(LOG_PREFIX + "invokeOffloadAction: Received: %s" % r.text)
     _raise_if_api_exception(r)
@@ -416,7 +496,8 @@ def invokeOffloadAction(logger, owAPIHost, owb64APIKey, action_name, ro_vim_vm_n
     return r
 
 
-def requestActivation(logger, owAPIHost, owb64APIKey, activation_id):
+def requestActivation(logger, owAPIHost, owb64APIKey, activation_id,
+                      session=None, timeout=None):
     logger.debug(LOG_PREFIX + "requestActivation: '%(owAPIHost)s' '%(owb64APIKey)s' "
                  "'%(activation_id)s'" %
                 {
@@ -427,12 +508,12 @@ def requestActivation(logger, owAPIHost, owb64APIKey, activation_id):
 
     headers = {'Authorization' : 'Basic %s' % owb64APIKey}
 
-    r = requests.get(
+    r = _http(session).get(
         '%(owAPIHost)s/api/v1/namespaces/_/activations/%(activation_id)s' %
         {
             'owAPIHost': owAPIHost,
             'activation_id': activation_id
-        }, headers=headers, verify=False)
+        }, headers=headers, verify=False, timeout=timeout)
 
     logger.info(LOG_PREFIX + "requestActivation: Received: %s" % r.text)
     _raise_if_api_exception(r)
@@ -442,7 +523,7 @@ def requestActivation(logger, owAPIHost, owb64APIKey, activation_id):
 
 
 def requestAnnotatedAction(logger, owAPIHost, owb64APIKey, offload_action,
-                           annotation_key):
+                           annotation_key, session=None, timeout=None):
     """
     Return the fully qualified action name as denoted by the annotation key
     (i.e. get_pod, delete_pod, ..) out from the internal offload action.
@@ -460,12 +541,19 @@ def requestAnnotatedAction(logger, owAPIHost, owb64APIKey, offload_action,
     :param annotation_key: The annotation key to retrieve
     :type annotation_key: ``str``
 
+    :param session: Pooled session to issue the request on (optional)
+    :type session: ``requests.Session``
+
+    :param timeout: Request timeout in seconds (optional)
+    :type timeout: ``float``
+
     """
     logger.debug(LOG_PREFIX + "requestAnnotatedAction: '%s' '%s'" %
                       (offload_action, annotation_key))    
 
     r = requestAction(logger=logger, owAPIHost=owAPIHost,
-                      owb64APIKey=owb64APIKey, action_name=offload_action)
+                      owb64APIKey=owb64APIKey, action_name=offload_action,
+                      session=session, timeout=timeout)
     r_json = r.json()
     namespace = r_json['namespace']
 
@@ -488,7 +576,7 @@ def requestAnnotatedAction(logger, owAPIHost, owb64APIKey, offload_action,
     return actionFQN
 
 
-def requestActions(logger, owAPIHost, owb64APIKey):
+def requestActions(logger, owAPIHost, owb64APIKey, session=None, timeout=None):
     """
     List actions per given authentication key which implies namespace
 
@@ -498,6 +586,12 @@ def requestActions(logger, owAPIHost, owb64APIKey):
     :param owb64APIKey: Authentication key in base64 format
     :type owb64APIKey: ``str``
 
+    :param session: Pooled session to issue the request on (optional)
+    :type session: ``requests.Session``
+
+    :param timeout: Request timeout in seconds (optional)
+    :type timeout: ``float``
+
     """
     logger.debug(LOG_PREFIX + "requestActions: '%(owAPIHost)s' '%(owb64APIKey)s'"
                  %
@@ -508,11 +602,11 @@ def requestActions(logger, owAPIHost, owb64APIKey):
 
     headers = {'Authorization' : 'Basic %s' % owb64APIKey}
 
-    r = requests.get(
+    r = _http(session).get(
         '%(owAPIHost)s/api/v1/namespaces/_/actions?limit=100&skip=0' %
         {
             'owAPIHost': owAPIHost
-        }, headers=headers, verify=False)
+        }, headers=headers, verify=False, timeout=timeout)
 
     logger.info(LOG_PREFIX + "requestActions: Received: %s" % r.text)
     _raise_if_api_exception(r)
@@ -522,7 +616,8 @@ def requestActions(logger, owAPIHost, owb64APIKey):
 
 
 def updateActionAnnotation(logger, owAPIHost, owb64APIKey, action_name,
-                           annotation_key, annotation_value):
+                           annotation_key, annotation_value, session=None,
+                           timeout=None):
     """
     Updates a given action with provided annotation.
 
@@ -542,6 +637,12 @@ def updateActionAnnotation(logger, owAPIHost, owb64APIKey, action_name,
     :param annotation_value: The annotation value
     :type annotation_value: ``str``
 
+    :param session: Pooled session to issue the request on (optional)
+    :type session: ``requests.Session``
+
+    :param timeout: Request timeout in seconds (optional)
+    :type timeout: ``float``
+
     """
     logger.debug(LOG_PREFIX + "updateActionAnnotation: '%(owAPIHost)s' "
                  "'%(owb64APIKey)s' '%(action_name)s' '%(annotation_key)s' "
@@ -560,7 +661,8 @@ def updateActionAnnotation(logger, owAPIHost, owb64APIKey, action_name,
         raise Exception ("Action name in wrong format."
                          " Should be fully qualified [action_name: %s]" %
                          action_name)
-    r = requestAction(logger, owAPIHost, owb64APIKey, action_name)
+    r = requestAction(logger, owAPIHost, owb64APIKey, action_name,
+                      session=session, timeout=timeout)
     r_json = r.json()
     annotations = [{
         'key': annotation_key,
@@ -584,7 +686,7 @@ def updateActionAnnotation(logger, owAPIHost, owb64APIKey, action_name,
                'Authorization' : 'Basic %s' % owb64APIKey }
     # REMOVE...
     # [PUT]   https://172.15.0.50/api/v1/namespaces/guest/actions/5g-media/action_ping?overwrite=true
-    r = requests.put(
+    r = _http(session).put(
         '%(owAPIHost)s/api/v1/namespaces/%(namespace)s/actions/'
         '%(package)s/%(action)s?overwrite=true' %
         {
@@ -592,7 +694,8 @@ def updateActionAnnotation(logger, owAPIHost, owb64APIKey, action_name,
             'namespace': namespace,
             'package': package,
             'action': action
-        }, headers=headers, json=payload, verify=False)
+        }, headers=headers, json=payload, verify=False,
+        timeout=timeout)
 
     logger.info(LOG_PREFIX + "updateActionAnnotation: Received: %s" % r.text)
     _raise_if_api_exception(r)
@@ -667,6 +770,27 @@ class vimconnector(vimconn.vimconnector):
         self.owb64APIKey = base64.b64encode(owAPIKey.encode()).decode()
         self.owAPIHost = url
 
+        # keep-alive sessions re-used by all helpers (one per remote host)
+        pool_connections = int(self.config.get('http_pool_connections',
+                                               HTTP_POOL_CONNECTIONS))
+        pool_maxsize = int(self.config.get('http_pool_maxsize',
+                                           HTTP_POOL_MAXSIZE))
+        self.http_timeout = self.config.get('http_timeout', HTTP_TIMEOUT)
+        if self.http_timeout is not None:
+            self.http_timeout = float(self.http_timeout)
+        self.ow_session = _build_session(pool_connections, pool_maxsize)
+        self.conf_session = _build_session(pool_connections, pool_maxsize)
+
+        self.refresh_vms_workers = int(self.config.get('refresh_vms_workers',
+                                                       REFRESH_VMS_WORKERS))
+        self.refresh_vms_timeout = float(self.config.get('refresh_vms_timeout',
+                                                         REFRESH_VMS_TIMEOUT))
+        # refresh requests never wait forever so that the workers of a
+        # timed out refresh_vms_status sweep eventually return
+        self.refresh_http_timeout = self.http_timeout
+        if self.refresh_http_timeout is None:
+            self.refresh_http_timeout = self.refresh_vms_timeout
+
         self.offload_host = self.config.get('offload-service-url')
         if not self.offload_host:
             raise vimconn.vimconnException("Offload-service is not specified")
@@ -695,27 +819,32 @@ class vimconnector(vimconn.vimconnector):
                 self.logger, self.owAPIHost,
                 self.owb64APIKey,
                 offload_action_name,
-                'delete_pod')
+                'delete_pod', session=self.ow_session,
+                timeout=self.http_timeout)
             delete_action_event = requestAnnotatedAction(
                 self.logger, self.owAPIHost,
                 self.owb64APIKey,
                 offload_action_name,
-                'delete_pod_event')
+                'delete_pod_event', session=self.ow_session,
+                timeout=self.http_timeout)
             get_action = requestAnnotatedAction(
                 self.logger, self.owAPIHost,
                 self.owb64APIKey,
                 offload_action_name,
-                'get_pod')
+                'get_pod', session=self.ow_session,
+                timeout=self.http_timeout)
             nop_action = requestAnnotatedAction(
                 self.logger, self.owAPIHost,
                 self.owb64APIKey,
                 offload_action_name,
-                'nop')
+                'nop', session=self.ow_session,
+                timeout=self.http_timeout)
             event_action = requestAnnotatedAction(
                 self.logger, self.owAPIHost,
                 self.owb64APIKey,
                 offload_action_name,
-                'get_pod_event')
+                'get_pod_event', session=self.ow_session,
+                timeout=self.http_timeout)
         except Exception as e:
             raise vimconn.vimconnException("Error validating action %s: %s" %
                                            (offload_action_name, str(e)))
@@ -761,7 +890,8 @@ class vimconnector(vimconn.vimconnector):
         try:
             validate_action_name(action_name)
             r = requestAction(self.logger, self.owAPIHost, self.owb64APIKey,
-                              action_name)
+                              action_name, session=self.ow_session,
+                              timeout=self.http_timeout)
             r_json = r.json()
         except HTTPError as http_error:
             if http_error.response.status_code == 404:
@@ -792,7 +922,8 @@ class vimconnector(vimconn.vimconnector):
             )
             updateActionAnnotation(
                 self.logger, self.owAPIHost, self.owb64APIKey, action_name,
-                image_annotation_key, image_id)
+                image_annotation_key, image_id, session=self.ow_session,
+                timeout=self.http_timeout)
 
         return image_id
 
@@ -828,7 +959,8 @@ class vimconnector(vimconn.vimconnector):
 
         try:
             requestAction(self.logger, self.owAPIHost, self.owb64APIKey,
-                          action_name)
+                          action_name, session=self.ow_session,
+                          timeout=self.http_timeout)
         except Exception as e:
             self.logger.error(
                 LOG_PREFIX + "Error occurred during action retrieval: %s" %
@@ -967,7 +1099,9 @@ class vimconnector(vimconn.vimconnector):
                 net['mac_address'] = None
                 net["ip"] = '1.2.3.4'
 
-            r = requestActions(self.logger, self.owAPIHost, self.owb64APIKey)
+            r = requestActions(self.logger, self.owAPIHost, self.owb64APIKey,
+                               session=self.ow_session,
+                               timeout=self.http_timeout)
             r_json = r.json()
             found_id = False
             for ac in r_json:
@@ -996,7 +1130,8 @@ class vimconnector(vimconn.vimconnector):
             params = {}
             try:
                 r = requestParameters(logger=self.logger, configAPIHost=self.config_host,
-                                      name=name)
+                                      name=name, session=self.conf_session,
+                                      timeout=self.http_timeout)
                 params = r.json()
             except Exception as e:
                 self.logger.error("Failed to retireve action parameters for %s. "
@@ -1004,7 +1139,8 @@ class vimconnector(vimconn.vimconnector):
                                   (name, str(e)))
 
             clearCurrentParameters(
-                logger=self.logger, configAPIHost=self.config_host, name=name)
+                logger=self.logger, configAPIHost=self.config_host, name=name,
+                session=self.conf_session, timeout=self.http_timeout)
             ud['action_params'] = params.get('action_params', {})
             ud['service_ports'] = params.get('service_ports', [])
 
@@ -1029,7 +1165,8 @@ class vimconnector(vimconn.vimconnector):
                             # ok to split. Validation occurd before
                             payload={'ns_name': name.split('-')[0],
                                      'operation': 'create',
-                                     'proxierUrl': self.proxierUrl})
+                                     'proxierUrl': self.proxierUrl},
+                            session=self.ow_session, timeout=self.http_timeout)
                     else:
                         r = invokeOffloadAction(
                             logger=self.logger, owAPIHost=self.owAPIHost,
@@ -1038,11 +1175,13 @@ class vimconnector(vimconn.vimconnector):
                             ro_vim_vm_name=name,
                             offload_host=self.offload_host,
                             action_name_offloaded=action_name,
-                            payload=ud)
+                            payload=ud, session=self.ow_session,
+                            timeout=self.http_timeout)
                 else:
                     r = invokeAction(self.logger, self.owAPIHost, self.owb64APIKey,
                         action_name=self.offload['nop_action'],
-                        blocking=False, payload={'ro_vim_vm_name': name, '_start': 'false'})
+                        blocking=False, payload={'ro_vim_vm_name': name, '_start': 'false'},
+                        session=self.ow_session, timeout=self.http_timeout)
 
                 r_json = r.json()
                 activation_id = r_json['activationId']
@@ -1060,139 +1199,230 @@ class vimconnector(vimconn.vimconnector):
                 'Error occurred during action invocation. %s: ' % str(e))
 
     def refresh_vms_status(self, vm_list):
+        """
+        Refresh the status of the given FaaS VNFs (i.e. activation ids).
+
+        VMs are refreshed concurrently on a bounded pool of
+        `refresh_vms_workers` threads (VIM config). A VM whose status could
+        not be retrieved within `refresh_vms_timeout` seconds since its
+        refresh started is reported as VIM_ERROR while the statuses of all
+        other VMs are still returned. So are the VMs left waiting once every
+        worker is stuck on a timed out VM.
+        Unless `http_timeout` is set, every request of a refresh times out
+        after `refresh_vms_timeout` seconds as well, so no worker is stuck
+        forever.
+        Setting `refresh_vms_workers` to 1 restores the serial sweep.
+        """
         self.logger.debug(LOG_PREFIX + "refresh_vms status: %s" % vm_list)
         net_id = self.persistent_info['network'].setdefault(
             'vim_network_id', generate_unicode_uuid())
 
         vm_dict={}
 
-        # TODO: currently its all or nothing
-        for vm_id in vm_list:
-            vm = {}
-            activation_id = vm_id
-            status = 'not found' # mapped to active
-            mac_address = '00:00:00:00:00:00' # see if pod has mac
-            pod_ip = '0.0.0.0'
-            vim_info = dict()
-            ports = {}
+        workers = min(self.refresh_vms_workers, len(vm_list))
+        if workers <= 1:
+            for vm_id in vm_list:
+                vm_dict[vm_id] = self._refresh_vm_status(vm_id, net_id)
+            return vm_dict
+
+        timeout = self.refresh_vms_timeout
+        # guards started/done, notified whenever a VM refresh completes
+        cond = threading.Condition()
+        started = {}
+        done = {}
+
+        def refresh(vm_id):
+            with cond:
+                started[vm_id] = time.time()
+                cond.notify_all()
+            try:
+                vm = self._refresh_vm_status(vm_id, net_id)
+            except Exception as e:
+                vm = {'status': 'VIM_ERROR', 'error_msg': str(e)}
+            with cond:
+                done[vm_id] = vm
+                cond.notify_all()
+
+        def timed_out(vm_id):
+            self.logger.error(LOG_PREFIX + "Timeout getting vm status: %s"
+                              % vm_id)
+            vm_dict[vm_id] = {
+                'status': 'VIM_ERROR',
+                'error_msg': 'Timeout refreshing status of vm %s' % vm_id
+            }
+
+        pool = ThreadPool(processes=workers)
+        try:
+            for vm_id in vm_list:
+                pool.apply_async(refresh, (vm_id,))
+
+            pending = list(vm_list)
+            # timed out VMs whose worker is still busy
+            stuck = set()
+            with cond:
+                while pending:
+                    now = time.time()
+                    wait = timeout
+                    for vm_id in list(pending):
+                        if vm_id in done:
+                            vm_dict[vm_id] = done[vm_id]
+                            pending.remove(vm_id)
+                        elif vm_id in started:
+                            left = started[vm_id] + timeout - now
+                            if left <= 0:
+                                timed_out(vm_id)
+                                pending.remove(vm_id)
+                                stuck.add(vm_id)
+                            else:
+                                wait = min(wait, left)
+                    stuck = set(vm_id for vm_id in stuck if vm_id not in done)
+                    if pending and len(stuck) >= workers:
+                        # no worker left to refresh the waiting VMs
+                        for vm_id in pending:
+                            timed_out(vm_id)
+                        break
+                    if pending:
+                        cond.wait(wait)
+        finally:
+            # do not join: a stuck worker must not block the sweep
+            pool.terminate()
+
+        return vm_dict
+
+    def _refresh_vm_status(self, vm_id, net_id):
+        """
+        Build the RO status record of a single FaaS VNF. Errors are reported
+        in the record itself.
+        """
+        vm = {}
+        activation_id = vm_id
+        status = 'not found' # mapped to active
+        mac_address = '00:00:00:00:00:00' # see if pod has mac
+        pod_ip = '0.0.0.0'
+        vim_info = dict()
+        ports = {}
+        try:
             try:
-                try:
-                    r = requestActivation(self.logger, self.owAPIHost,
-                                          self.owb64APIKey, activation_id)
-                except HTTPError as http_error:
-                    if http_error.response.status_code == 404:
-                        self.logger.debug("Activation id '%s' not found. "
-                                          "Assuming action is running"
-                                          % activation_id)
-                        # no activation found means action still running
-                        vm['status'] = actionStatus2manoFormat[status]
-                # we have r in hand, proceed..
+                r = requestActivation(self.logger, self.owAPIHost,
+                                      self.owb64APIKey, activation_id,
+                                      session=self.ow_session,
+                                      timeout=self.refresh_http_timeout)
+            except HTTPError as http_error:
+                if http_error.response.status_code == 404:
+                    self.logger.debug("Activation id '%s' not found. "
+                                      "Assuming action is running"
+                                      % activation_id)
+                    # no activation found means action still running
+                    vm['status'] = actionStatus2manoFormat[status]
+            # we have r in hand, proceed..
+            else:
+                r_json = r.json()
+                if not r_json.get('response', {}).get('status'):
+                    raise Exception("Malformed activation result %s. Missing "
+                                    "'response' and/or 'status' key" %
+                                    r_json)
+
+                result = r_json['response']['result']
+                '''
+                In case of bootstrap activation record, retrieve ingress
+                URL of its gateway/sensor subsystem
+                '''
+                if result.get('_bootstrap', 'False').lower() in ['true'] and \
+                    result.get('IngressPort'):
+
+                    ingressPort = result.get('IngressPort')
+                    vim_info['IngressUrl'] = '%s:%s' % (
+                        URL_NOPORT_REGEX.match(self.offload_host).group(0),
+                        str(ingressPort))
                 else:
+                    '''
+                    It can either be normal activation record or event-based
+                    nop activation record with (start=false).
+                    In case of normal, retrieve flowId and pass it to get_pod action
+                    In case of event-based, retrieve full ro name and pass it
+                    to get_pod_event action
+                    '''
+                    flowId = None
+                    if result.get('detail', {}).get('flowId'):
+                        flowId = result['detail']['flowId']
+
+                        r = invokeAction(
+                                self.logger, self.owAPIHost,
+                                self.owb64APIKey,
+                                action_name=self.offload['get_action'],
+                                blocking=True,
+                                payload={
+                                    'offload-service-url': self.offload_host,
+                                    'flowId': flowId
+                                },
+                                session=self.ow_session,
+                                timeout=self.refresh_http_timeout
+                            )
+                    elif result.get('_start', 'True').lower() in ['false']:
+                        ro_vim_vm_name = result.get('ro_vim_vm_name')
+                        vim_info['_start'] = result.get('_start')
+                        r = invokeAction(
+                                self.logger, self.owAPIHost,
+                                self.owb64APIKey,
+                                action_name=self.offload['get_action_event'],
+                                blocking=True,
+                                payload={
+                                    'offload-service-url': self.offload_host,
+                                    'ro_vim_vm_name': ro_vim_vm_name
+                                },
+                                session=self.ow_session,
+                                timeout=self.refresh_http_timeout
+                            )
+
                     r_json = r.json()
                     if not r_json.get('response', {}).get('status'):
                         raise Exception("Malformed activation result %s. Missing "
                                         "'response' and/or 'status' key" %
                                         r_json)
-
-                    result = r_json['response']['result']
                     '''
-                    In case of bootstrap activation record, retrieve ingress
-                    URL of its gateway/sensor subsystem
+                    Common part for both record types
                     '''
-                    if result.get('_bootstrap', 'False').lower() in ['true'] and \
-                        result.get('IngressPort'):
-
-                        ingressPort = result.get('IngressPort')
-                        vim_info['IngressUrl'] = '%s:%s' % (
-                            URL_NOPORT_REGEX.match(self.offload_host).group(0),
-                            str(ingressPort))
-                    else:
-                        '''
-                        It can either be normal activation record or event-based
-                        nop activation record with (start=false).
-                        In case of normal, retrieve flowId and pass it to get_pod action
-                        In case of event-based, retrieve full ro name and pass it
-                        to get_pod_event action
-                        '''
-                        flowId = None
-                        if result.get('detail', {}).get('flowId'):
-                            flowId = result['detail']['flowId']
-
-                            r = invokeAction(
-                                    self.logger, self.owAPIHost,
-                                    self.owb64APIKey,
-                                    action_name=self.offload['get_action'],
-                                    blocking=True,
-                                    payload={
-                                        'offload-service-url': self.offload_host,
-                                        'flowId': flowId
-                                    }
-                                )
-                        elif result.get('_start', 'True').lower() in ['false']:
+                    result = r_json['response']['result']
+                    # add or to overcome none values
+                    if result.get('_exists', 'true') == 'true':
+                        if result.get('records'):
+                            vim_info['records'] = result['records']
+                        else:
+                            pod_ip = result.get('pod_ip', '0.0.0.0') or '0.0.0.0'
+                            vim_info['host_ip'] = result.get('host_ip', '0.0.0.0') \
+                                or '0.0.0.0'
+                            vim_info['pod_phase'] = result.get('phase', 'unknown') \
+                                or 'unknown'
+                            # flowId may not be set if we deal with nop activation, thus
+                            # take it from the get_action_event result
+                            vim_info['flowId'] = flowId if flowId else result.get('flowId', '')
+                            vim_info['vim-id'] = result.get('vim-id')
+                            vim_info['action'] = result.get('action', '')
+                            vim_info['service'] = result.get('service', {}) or {}
                             ro_vim_vm_name = result.get('ro_vim_vm_name')
-                            vim_info['_start'] = result.get('_start')
-                            r = invokeAction(
-                                    self.logger, self.owAPIHost,
-                                    self.owb64APIKey,
-                                    action_name=self.offload['get_action_event'],
-                                    blocking=True,
-                                    payload={
-                                        'offload-service-url': self.offload_host,
-                                        'ro_vim_vm_name': ro_vim_vm_name
-                                    }
-                                )
-
-                        r_json = r.json()
-                        if not r_json.get('response', {}).get('status'):
-                            raise Exception("Malformed activation result %s. Missing "
-                                            "'response' and/or 'status' key" %
-                                            r_json)
-                        '''
-                        Common part for both record types
-                        '''
-                        result = r_json['response']['result']
-                        # add or to overcome none values
-                        if result.get('_exists', 'true') == 'true':
-                            if result.get('records'):
-                                vim_info['records'] = result['records']
-                            else:
-                                pod_ip = result.get('pod_ip', '0.0.0.0') or '0.0.0.0'
-                                vim_info['host_ip'] = result.get('host_ip', '0.0.0.0') \
-                                    or '0.0.0.0'
-                                vim_info['pod_phase'] = result.get('phase', 'unknown') \
-                                    or 'unknown'
-                                # flowId may not be set if we deal with nop activation, thus
-                                # take it from the get_action_event result
-                                vim_info['flowId'] = flowId if flowId else result.get('flowId', '')
-                                vim_info['vim-id'] = result.get('vim-id')
-                                vim_info['action'] = result.get('action', '')
-                                vim_info['service'] = result.get('service', {}) or {}
-                                ro_vim_vm_name = result.get('ro_vim_vm_name')
-                                if ro_vim_vm_name:
-                                    vim_info['ro_vim_vm_name'] = ro_vim_vm_name
-
-                vim_info['pod_ip'] = pod_ip
-                vm['vim_info'] = json.dumps(vim_info)
-
-                vm['status'] = actionStatus2manoFormat[status]
-                ips = [pod_ip]
-                vm['interfaces'] = [
-                    {
-                        # 'vim_net_id': net_id,
-                        'vim_interface_id': net_id,
-                        'mac_address': mac_address,
-                        'ip_address': ";".join(ips)
-                    }
-                ]
+                            if ro_vim_vm_name:
+                                vim_info['ro_vim_vm_name'] = ro_vim_vm_name
 
-            except Exception as e:
-                self.logger.error("Exception getting vm status: %s", str(e))
-                vm['status'] = "VIM_ERROR"
-                vm['error_msg'] = str(e)
+            vim_info['pod_ip'] = pod_ip
+            vm['vim_info'] = json.dumps(vim_info)
 
-            vm_dict[vm_id] = vm
+            vm['status'] = actionStatus2manoFormat[status]
+            ips = [pod_ip]
+            vm['interfaces'] = [
+                {
+                    # 'vim_net_id': net_id,
+                    'vim_interface_id': net_id,
+                    'mac_address': mac_address,
+                    'ip_address': ";".join(ips)
+                }
+            ]
 
-        return vm_dict
+        except Exception as e:
+            self.logger.error("Exception getting vm status: %s", str(e))
+            vm['status'] = "VIM_ERROR"
+            vm['error_msg'] = str(e)
+
+        return vm
 
     def delete_vminstance(self, vm_id, created_items=None):
         """
@@ -1209,7 +1439,9 @@ class vimconnector(vimconn.vimconnector):
         # Swallow all errros. We do not want to fail delete.
         try:
             r = requestActivation(self.logger, self.owAPIHost,
-                                  self.owb64APIKey, activation_id)
+                                  self.owb64APIKey, activation_id,
+                                  session=self.ow_session,
+                                  timeout=self.http_timeout)
             r_json = r.json()
             if not r_json.get('response', {}).get('status'):
                 raise Exception("Malformed activation result %s. Missing "
@@ -1230,7 +1462,9 @@ class vimconnector(vimconn.vimconnector):
                     payload={
                         'offload-service-url': self.offload_host,
                         'flowId': flowId
-                    }
+                    },
+                    session=self.ow_session,
+                    timeout=self.http_timeout
                 )
 
             elif result.get('_bootstrap', 'False').lower() in ['true']:
@@ -1242,7 +1476,8 @@ class vimconnector(vimconn.vimconnector):
                              action_name=action_name, blocking=False,
                              payload={'ns_name': result['ns_name'],
                                      'operation': 'delete',
-                                     'proxierUrl': self.proxierUrl})
+                                     'proxierUrl': self.proxierUrl},
+                             session=self.ow_session, timeout=self.http_timeout)
 
             elif result.get('_start', 'True').lower() in ['false']:
                 '''
@@ -1259,7 +1494,9 @@ class vimconnector(vimconn.vimconnector):
                         'offload-service-url': self.offload_host,
                         'label_name': 'ro_vim_vm_name',
                         'label_value': ro_vim_vm_name
-                    }
+                    },
+                    session=self.ow_session,
+                    timeout=self.http_timeout
                 )
 
         except Exception as e: